@@ -196,11 +196,138 @@ WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
+# Collecte météo (WeatherCollectionEngine)
+WEATHER_API_BASE_URL = os.getenv("WEATHER_API_BASE_URL", "http://api.weatherapi.com/v1")
+WEATHER_COLLECTION = {
+    "MAX_WORKERS": 8,        # appels API simultanés
+    "RATE_PER_SECOND": 10,   # limite par hôte
+    "MAX_RETRIES": 3,
+    "BACKOFF": 0.5,          # secondes, doublé à chaque retry
+    "TIMEOUT": 10,
+    "BATCH_SIZE": 500,       # taille des bulk_create
+}
+# Prévisions partagées par cellule de grille (parcelles voisines)
+WEATHER_GRID_CACHE = {
+    "ENABLED": True,
+    "CELL_DEGREES": 0.01,    # ≈ 1,1 km
+    "TIMEOUT": 60 * 60,      # fenêtre de rafraîchissement (s)
+}
+
+# Propriétés du sol (0-5cm) partagées par cellule : quasi invariables, TTL long
+SOIL_CACHE = {
+    "ENABLED": True,
+    "CELL_DEGREES": 0.0025,                # ≈ 275 m (résolution SoilGrids 250 m)
+    "TIMEOUT": 60 * 60 * 24 * 180,         # 6 mois
+    "NEGATIVE_TIMEOUT": 60 * 60 * 24 * 30, # points sans données connues
+    "LOCK_TIMEOUT": 30,                    # appel amont en cours (entre workers)
+    "WAIT_TIMEOUT": 20,                    # attente max d'un appel coalescé (s)
+}
+
+# Tuiles SoilGrids locales (GeoTIFF/COG, <ROOT>/<propriété>_0-5cm_mean.tif),
+# prioritaires sur l'API dans l'emprise ; nécessite rasterio (optionnel)
+SOIL_RASTER = {
+    "ENABLED": os.getenv("SOIL_RASTER_ENABLED", "True") == "True",
+    "ROOT": os.getenv("SOIL_RASTER_ROOT", os.path.join(BASE_DIR, "data", "soilgrids")),
+    "BBOX": (-25.0, -12.0, 43.0, 51.0),    # Madagascar : lat_min, lat_max, lon_min, lon_max
+    "DEPTH": "0-5cm",
+}
+
+# Clients HTTP sortants partagés (keep-alive par hôte, voir services/http_clients.py)
+HTTP_CLIENTS = {
+    "DEFAULT": {
+        "CONNECT_TIMEOUT": 5,
+        "READ_TIMEOUT": 20,
+        "POOL_MAXSIZE": 10,  # connexions gardées ouvertes par hôte
+        "RETRIES": 2,        # 429 / 5xx (GET) et erreurs de connexion
+        "BACKOFF": 0.5,      # secondes, doublé à chaque retry
+        "HTTP2": True,       # clients httpx, si h2 est installé
+    },
+    "HOSTS": {
+        "rest.isric.org": {"READ_TIMEOUT": 10},
+        "openrouter.ai": {"READ_TIMEOUT": 60, "RETRIES": 1},
+        "api.mistral.ai": {"READ_TIMEOUT": 60, "RETRIES": 1},
+        "generativelanguage.googleapis.com": {"READ_TIMEOUT": 30, "RETRIES": 1},
+    },
+}
+
+# Course entre modèles LLM (services/llm_router.py)
+LLM_ROUTER = {
+    "HEDGE_DELAY": 4.0,         # s avant de lancer le modèle suivant en parallèle
+    "TIMEOUT": 60.0,            # délai total d'une question
+    "MAX_PARALLEL": 2,          # tentatives simultanées par question
+    "ATTEMPT_TIMEOUT": 20.0,    # délai max d'une tentative (borné par le temps restant)
+    "CONCURRENT_QUESTIONS": 8,  # threads du pool = MAX_PARALLEL × questions simultanées
+    "FAILURE_THRESHOLD": 3,     # échecs consécutifs avant mise à l'écart
+    "COOLDOWN": 120,            # s de mise à l'écart (circuit ouvert)
+    "RATE_LIMIT_COOLDOWN": 60,  # 429 sans en-tête Retry-After
+}
+
+# Cache des réponses de l'assistant (services/answer_cache.py)
+ANSWER_CACHE = {
+    "ENABLED": True,
+    "TIMEOUT": 60 * 60 * 24 * 7,  # 7 jours
+    "SEMANTIC": False,            # questions reformulées (mots vides, accents, ordre des mots), nombres identiques
+    "THRESHOLD": 0.95,            # similarité cosinus minimale du niveau approché
+    "MAX_ENTRIES": 2000,          # entrées du niveau approché par processus (LRU)
+}
+
+# Contexte de l'assistant (services/context_builder.py)
+CONTEXT_BUILDER = {
+    "PARALLEL": True,           # sol et météo calculés en parallèle
+    "MODULE_TIMEOUT": 6,        # secondes par module, au-delà : "indisponible"
+    "MODULE_TIMEOUTS": {"soil": 8},
+    "CACHE_TIMEOUT": 60 * 60,   # contexte rendu (clé : parcelle, modules, version des données)
+    "MAX_TOKENS": 1200,         # budget du contexte (≈ 4 caractères par token)
+}
+
+# Séries climatiques NASA POWER stockées par cellule (DailyObservation)
+CLIMATE_STORE = {
+    "CELL_DEGREES": 0.5,     # grille météo MERRA-2 de NASA POWER ≈ 0,5°
+    "CHUNK_DAYS": 366,       # taille max d'une requête amont
+    "MAX_WORKERS": 4,        # morceaux récupérés en parallèle
+    "UNPUBLISHED_RETRY": 60 * 60 * 6,  # s avant de redemander les jours non encore publiés
+}
+
+# Rétention des données externes (commande apply_retention / tâche hebdomadaire)
+DATA_RETENTION = {
+    "POLICIES": {
+        # KEEP_LATEST : lignes toujours conservées par parcelle ; MAX_AGE_DAYS : âge au-delà
+        "WeatherData": {"KEEP_LATEST": 5, "MAX_AGE_DAYS": 30, "PURGE_ERRORS": True, "DOWNSAMPLE": True},
+        "ClimateData": {"KEEP_LATEST": 3, "MAX_AGE_DAYS": 90, "PURGE_ERRORS": True, "DOWNSAMPLE": True},
+        "SoilData": {"KEEP_LATEST": 2, "MAX_AGE_DAYS": 180, "PURGE_ERRORS": True, "DOWNSAMPLE": False},
+    },
+    "BATCH_SIZE": 1000,       # lignes supprimées par transaction
+    "BATCH_PAUSE": 0.05,      # secondes entre deux lots
+    "ERROR_GRACE_HOURS": 1,   # une ligne d'erreur récente peut encore servir de fallback
+}
+
+# Blocs du dashboard : invalidés par signaux puis précalculés en arrière-plan
+# (Celery si un broker est configuré, sinon pool de threads local)
+DASHBOARD_CACHE = {
+    "PRECOMPUTE": True,
+    "PRECOMPUTE_BACKEND": "celery" if os.getenv("CELERY_BROKER_URL") else "thread",
+    "PRECOMPUTE_DELAY": 2,     # secondes, regroupe les écritures en rafale
+    "PARALLEL_BLOCKS": True,   # calcul concurrent des blocs manquants
+    "MAX_WORKERS": 8,
+    "PRECOMPUTE_WORKERS": 2,   # pool local des précalculs, séparé des blocs en direct
+    "BLOCK_TIMEOUT": 5,        # secondes, au-delà : marqueur stale/pending
+    "BLOCK_TIMEOUTS": {},      # délais spécifiques, ex: {"soil": 2}
+}
+
+# Résumé dashboard_stats des alertes (secondes, invalidé à chaque écriture)
+ALERT_STATS_CACHE_TIMEOUT = 30
+
 
 # Celery Configuration
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/0")
+CELERY_TASK_IGNORE_RESULT = True
 CELERY_BEAT_SCHEDULE = {
     'collect-weather-data-daily': {
-        'task': 'agriculture.tasks.collect_weather_data',
+        'task': 'SmartSaha.tasks.collect_weather_data',
         'schedule': crontab(hour=6, minute=0),
     },
+    'apply-data-retention-weekly': {
+        'task': 'SmartSaha.tasks.apply_data_retention',
+        'schedule': crontab(hour=3, minute=30, day_of_week=0),
+    },
 }
\ No newline at end of file
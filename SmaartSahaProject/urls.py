@@ -19,7 +19,8 @@ from SmartSaha.views import (
     ClimateDataView, DataViewSet, ParcelFullDataViewSet, AgronomyAssistantAPIView,
     YieldForecastView, YieldAnalyticsView, DashboardViewSet, dashboard, tasks_view,
     assistant_agronome_page, assistant_agronome_api, WeatherDataViewSet, WeatherCollectionViewSet,
-    AgriculturalAlertViewSet, AgriAssistantViewSet
+    AgriculturalAlertViewSet, AgriAssistantViewSet, OutboundHttpMetricsView,
+    LLMProviderStatsView
 )
 from SmartSaha.views.users import ForgotPasswordView, ResetPasswordView, GoogleLoginView
 
@@ -109,6 +110,8 @@ urlpatterns = [
     path("api/assistant-agronome/", assistant_agronome_api, name="assistant-agronome_api"),
     path("api/soil-data/", SoilDataView.as_view(), name="soil-data"),
     path("api/climate-data/", ClimateDataView.as_view(), name="climate-data"),
+    path("api/http-metrics/", OutboundHttpMetricsView.as_view(), name="http-metrics"),
+    path("api/llm-providers/", LLMProviderStatsView.as_view(), name="llm-providers"),
     path('forecast/<int:parcel_crop_id>/', YieldForecastView.as_view(), name='yield_forecast'),
     path("analytics/yields/", YieldAnalyticsView.as_view(), name="yield-analytics"),
 
@@ -1,2 +0,0 @@
-def ready(self):
-    import SmartSaha.signals.dashboard_cache
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SmartsahaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'SmartSaha'
+
+    def ready(self):
+        import SmartSaha.signals.dashboard_cache  # noqa: F401
+        import SmartSaha.signals.timeseries  # noqa: F401
+        import SmartSaha.signals.parcel_version  # noqa: F401
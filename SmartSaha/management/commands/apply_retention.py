@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from SmartSaha.services import RetentionService
+from SmartSaha.services.retention import MODELS
+
+
+class Command(BaseCommand):
+    help = "Purge et compacte WeatherData / ClimateData / SoilData selon DATA_RETENTION"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=sorted(MODELS), help='Limiter à un type (répétable)')
+        parser.add_argument('--dry-run', action='store_true', help='Compter sans supprimer')
+        parser.add_argument('--batch-size', type=int, help='Lignes supprimées par transaction')
+
+    def handle(self, *args, **options):
+        service = RetentionService(batch_size=options.get('batch_size'))
+        reports = service.apply(model_names=options.get('model'), dry_run=options['dry_run'])
+
+        prefix = "[simulation] " if options['dry_run'] else ""
+        total_rows, total_bytes = 0, 0
+        for name, report in reports.items():
+            deleted = sum(report['deleted'].values())
+            total_rows += deleted if not options['dry_run'] else report['error_rows'] + report['expired_rows']
+            total_bytes += report['bytes']
+            cascade = ", ".join(f"{label}: {count}" for label, count in sorted(report['deleted'].items()))
+            self.stdout.write(
+                f"{prefix}{name}: {report['error_rows']} erreur(s), {report['expired_rows']} expirée(s), "
+                f"{report['bytes'] / 1024:.0f} Ko de JSON, {report['downsampled']} valeur(s) journalière(s) "
+                f"en {report['duration_s']} s" + (f" [{cascade}]" if cascade else "")
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{total_rows} ligne(s) récupérée(s), {total_bytes / 1024 / 1024:.1f} Mo de payloads"
+        ))
@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from SmartSaha.services.alert_rules import (
+    AlertRuleEngine, RuleFrame, WEATHER_RULES, PEST_RULES, FORECAST_METRICS, SENSITIVE_CROPS
+)
+
+
+class Command(BaseCommand):
+    help = "Compare le moteur d'alertes vectorisé au chemin Python parcelle par parcelle"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parcels', type=int, default=2000, help='Nombre de parcelles simulées')
+        parser.add_argument('--days', type=int, default=7, help='Jours de prévision par parcelle')
+        parser.add_argument('--repeat', type=int, default=3, help='Nombre de mesures (meilleur temps retenu)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        entries = self._synthetic_entries(options['parcels'], options['days'], options['seed'])
+        engine = AlertRuleEngine(WEATHER_RULES + PEST_RULES)
+
+        python_time, python_alerts = self._best_of(options['repeat'], lambda: engine.evaluate_python(entries))
+        numpy_time, numpy_alerts = self._best_of(
+            options['repeat'], lambda: engine.evaluate(RuleFrame.from_days(entries))
+        )
+
+        python_count = sum(len(a) for a in python_alerts)
+        numpy_count = sum(len(a) for a in numpy_alerts)
+        same = python_alerts == numpy_alerts
+
+        self.stdout.write(f"Parcelles: {len(entries)} × {options['days']} jours × {len(FORECAST_METRICS)} métriques")
+        self.stdout.write(f"Python (par parcelle) : {python_time * 1000:.1f} ms, {python_count} alertes")
+        self.stdout.write(f"NumPy (un passage)    : {numpy_time * 1000:.1f} ms, {numpy_count} alertes")
+        style = self.style.SUCCESS if same else self.style.ERROR
+        self.stdout.write(style(
+            f"Accélération x{python_time / numpy_time:.1f} — résultats identiques: {'oui' if same else 'NON'}"
+        ))
+
+    @staticmethod
+    def _best_of(repeat, func):
+        best, result = None, None
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    @staticmethod
+    def _synthetic_entries(n_parcels, n_days, seed):
+        rng = np.random.default_rng(seed)
+        crops_pool = list(SENSITIVE_CROPS) + ['manioc', 'haricot', 'vanille']
+        entries = []
+        for p in range(n_parcels):
+            days = []
+            for d in range(n_days):
+                min_temp = round(float(rng.normal(14, 6)), 1)
+                days.append({
+                    'date': f"2025-01-{d + 1:02d}",
+                    'condition': '',
+                    'min_temp': min_temp,
+                    'max_temp': round(min_temp + float(rng.uniform(5, 20)), 1),
+                    'avg_temp': round(min_temp + float(rng.uniform(2, 8)), 1),
+                    'precip': round(float(rng.exponential(6)), 1),
+                    'wind': round(float(rng.uniform(0, 45)), 1),
+                    'humidity': int(rng.integers(40, 100)),
+                    'rain_chance': int(rng.integers(0, 100)),
+                })
+            crops = list(rng.choice(crops_pool, size=int(rng.integers(0, 3)), replace=False))
+            entries.append((p, days, crops))
+        return entries
@@ -0,0 +1,90 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from SmartSaha.models import Crop, Parcel, ParcelCrop, Task, TaskPriority, TaskStatus
+from SmartSaha.services.task_statistics import TaskStatisticsService
+
+
+class Command(BaseCommand):
+    help = "Compare les statistiques de tâches groupées aux comptages par parcelle (données jetables)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--parcels', type=int, default=500, help='Nombre de parcelles simulées')
+        parser.add_argument('--tasks', type=int, default=50, help='Tâches par parcelle')
+
+    def handle(self, *args, **options):
+        # Données créées puis annulées : la base n'est pas modifiée
+        with transaction.atomic():
+            user = self._seed(options['parcels'], options['tasks'])
+
+            legacy_time, legacy_queries, legacy = self._measure(lambda: self._legacy_summary(user))
+            grouped_time, grouped_queries, grouped = self._measure(
+                lambda: TaskStatisticsService.for_user(user).compute()
+            )
+            same = all(
+                legacy[parcel_id] == (stats["total"], stats["done_status"])
+                for parcel_id, stats in grouped["by_parcel"].items()
+            ) and len(legacy) == len(grouped["by_parcel"])
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Parcelles: {options['parcels']} × {options['tasks']} tâches")
+        self.stdout.write(f"Par parcelle : {legacy_time * 1000:.1f} ms, {legacy_queries} requêtes")
+        self.stdout.write(f"Groupé       : {grouped_time * 1000:.1f} ms, {grouped_queries} requête(s)")
+        style = self.style.SUCCESS if same else self.style.ERROR
+        self.stdout.write(style(f"Résultats identiques: {'oui' if same else 'NON'}"))
+
+    @staticmethod
+    def _measure(func):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries), result
+
+    @staticmethod
+    def _legacy_summary(user):
+        """Ancien DashboardService.get_task_summary : un aggregate par parcelle"""
+        summary = {}
+        for parcel in Parcel.objects.filter(owner=user):
+            agg = Task.objects.filter(parcelCrop__parcel=parcel).aggregate(
+                total=Count("id"), done=Count("id", filter=Q(status__name="Done"))
+            )
+            summary[parcel.pk] = (agg["total"], agg["done"])
+        return summary
+
+    @staticmethod
+    def _seed(n_parcels, n_tasks):
+        user = get_user_model().objects.create_user(
+            username=f"bench-{time.time_ns()}", email="bench@example.com", password=None
+        )
+        crop = Crop.objects.create(name="Riz")
+        statuses = [TaskStatus.objects.create(name=name, description="") for name in ("Todo", "Done")]
+        priorities = [TaskPriority.objects.create(name=name, description="") for name in ("HIGH", "MEDIUM", "LOW")]
+        today = timezone.now().date()
+
+        parcels = Parcel.objects.bulk_create(
+            [Parcel(owner=user, parcel_name=f"Bench {i}", points=[]) for i in range(n_parcels)]
+        )
+        parcel_crops = ParcelCrop.objects.bulk_create(
+            [ParcelCrop(parcel=parcel, crop=crop, planting_date=today, area=1.0) for parcel in parcels]
+        )
+        Task.objects.bulk_create(
+            [
+                Task(
+                    name=f"Tâche {j}", description="", parcelCrop=parcel_crop,
+                    due_date=today + timezone.timedelta(days=j % 10 - 5),
+                    status=statuses[j % 2], priority=priorities[j % 3],
+                    completed_at=timezone.now() if j % 2 else None
+                )
+                for parcel_crop in parcel_crops for j in range(n_tasks)
+            ],
+            batch_size=1000
+        )
+        return user
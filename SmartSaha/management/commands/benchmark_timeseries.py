@@ -0,0 +1,116 @@
+import datetime
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from SmartSaha.models import DailyObservation, Parcel, WeatherData
+from SmartSaha.services import TimeSeriesService
+
+
+class Command(BaseCommand):
+    help = "Compare l'historique météo lu depuis les JSON WeatherData et depuis DailyObservation (données jetables)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Jours d historique (un WeatherData par jour)')
+        parser.add_argument('--forecast-days', type=int, default=3, help='Jours de prévision par réponse')
+
+    def handle(self, *args, **options):
+        start = datetime.date(2024, 1, 1)
+        end = start + datetime.timedelta(days=options['days'] - 1)
+
+        # Données créées puis annulées : la base n'est pas modifiée
+        with transaction.atomic():
+            parcel = self._seed(start, options['days'], options['forecast_days'])
+            TimeSeriesService.load(WeatherData)
+
+            legacy_time, legacy_queries, legacy = self._measure(lambda: self._legacy_history(parcel, start, end))
+            series_time, series_queries, (_, series) = self._measure(
+                lambda: TimeSeriesService.parcel_arrays(parcel, start, end, variables=['max_temp_c', 'total_precip_mm'])
+            )
+            same = [round(v, 3) for v in series['max_temp_c']] == [round(v, 3) for v in legacy]
+            json_bytes, series_bytes = self._storage(parcel)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"Historique : {options['days']} jours ({options['forecast_days']} j de prévision par JSON)")
+        self.stdout.write(f"JSON WeatherData : {legacy_time * 1000:.1f} ms, {legacy_queries} requête(s), {json_bytes / 1024:.0f} Ko")
+        self.stdout.write(f"DailyObservation : {series_time * 1000:.1f} ms, {series_queries} requête(s), {series_bytes / 1024:.0f} Ko")
+        style = self.style.SUCCESS if same else self.style.ERROR
+        self.stdout.write(style(f"Résultats identiques: {'oui' if same else 'NON'}"))
+
+    @staticmethod
+    def _measure(func):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries), result
+
+    @staticmethod
+    def _legacy_history(parcel, start, end):
+        """Ancienne lecture : parcours des payloads, la prévision la plus récente l'emporte"""
+        by_day = {}
+        for weather in WeatherData.objects.filter(parcel=parcel).order_by('created_at', 'id'):
+            for day in weather.data.get('forecast', {}).get('forecastday', []):
+                by_day[datetime.date.fromisoformat(day['date'])] = day['day'].get('maxtemp_c')
+        days = (end - start).days + 1
+        return [by_day.get(start + datetime.timedelta(days=i), float('nan')) for i in range(days)]
+
+    @staticmethod
+    def _storage(parcel):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT COALESCE(SUM(pg_column_size(data)), 0) FROM {WeatherData._meta.db_table} WHERE parcel_id = %s",
+                    [parcel.pk]
+                )
+                json_bytes = cursor.fetchone()[0]
+                cursor.execute(f"SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {DailyObservation._meta.db_table} t")
+                return json_bytes, cursor.fetchone()[0]
+        # Estimation hors PostgreSQL : JSON sérialisé vs colonnes de la ligne
+        json_bytes = sum(len(json.dumps(data)) for data in WeatherData.objects.filter(parcel=parcel).values_list('data', flat=True))
+        series_bytes = sum(
+            len(source) + len(cell) + len(variable) + 8 + 8 + 8 + 8
+            for source, cell, variable in DailyObservation.objects.values_list('source', 'cell', 'variable')
+        )
+        return json_bytes, series_bytes
+
+    @staticmethod
+    def _seed(start, days, forecast_days):
+        user = get_user_model().objects.create_user(
+            username=f"bench-{time.time_ns()}", email="bench@example.com", password=None
+        )
+        parcel = Parcel.objects.create(owner=user, parcel_name="Bench", points=[{"lat": -18.91, "lng": 47.52}])
+        weather_rows = []
+        for i in range(days):
+            issued = start + datetime.timedelta(days=i)
+            forecast = []
+            for j in range(forecast_days):
+                date = issued + datetime.timedelta(days=j)
+                hours = [
+                    {"time": f"{date} {h:02d}:00", "temp_c": 18.0 + h % 10, "humidity": 70, "precip_mm": 0.1,
+                     "wind_kph": 10.0, "chance_of_rain": 20, "condition": {"text": "Partiellement nuageux", "code": 1003}}
+                    for h in range(24)
+                ]
+                forecast.append({
+                    "date": date.isoformat(),
+                    "day": {
+                        "maxtemp_c": 25.0 + (i + j) % 7, "mintemp_c": 15.0, "avgtemp_c": 20.0,
+                        "totalprecip_mm": float((i * j) % 5), "maxwind_kph": 12.0, "avghumidity": 70,
+                        "daily_chance_of_rain": 20, "condition": {"text": "Partiellement nuageux"},
+                    },
+                    "astro": {"sunrise": "05:30 AM", "sunset": "06:10 PM"},
+                    "hour": hours,
+                })
+            weather_rows.append(WeatherData(
+                parcel=parcel, data={"location": {"name": "Bench"}, "current": {"temp_c": 22.0},
+                                     "forecast": {"forecastday": forecast}},
+                start=issued, end=issued + datetime.timedelta(days=forecast_days - 1),
+            ))
+        # bulk_create : ni signaux ni ForecastDay, seul le JSON est écrit
+        WeatherData.objects.bulk_create(weather_rows, batch_size=500)
+        return parcel
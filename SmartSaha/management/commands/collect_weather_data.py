@@ -1,8 +1,7 @@
 # agriculture/management/commands/collect_weather_data.py
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 from SmartSaha.models import Parcel
-from SmartSaha.services import WeatherDataCollector
+from SmartSaha.services import WeatherCollectionEngine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,78 +13,55 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             '--parcel-id',
-            type=int,
-            help='ID spécifique d une parcelle à mettre à jour'
+            type=str,
+            help='UUID spécifique d une parcelle à mettre à jour'
+        )
+        parser.add_argument('--days', type=int, default=3, help='Nombre de jours de prévision')
+        parser.add_argument('--workers', type=int, help='Nombre d appels API simultanés')
+        parser.add_argument('--rate', type=float, help='Appels maximum par seconde vers l API')
+        parser.add_argument(
+            '--base-url',
+            type=str,
+            help='URL de base de l API météo (ex: stub local pour mesurer le débit)'
         )
 
     def handle(self, *args, **options):
         self.stdout.write('Début de la collecte des données météo...')
 
-        collector = WeatherDataCollector()
+        parcels = Parcel.objects.filter(points__isnull=False).exclude(points=[])
         parcel_id = options.get('parcel_id')
-
         if parcel_id:
-            # Collecte pour une parcelle spécifique
-            try:
-                parcel = Parcel.objects.get(id=parcel_id)
-                if parcel.latitude and parcel.longitude:
-                    result = collector.collect_and_save_weather_data(
-                        parcel, parcel.latitude, parcel.longitude
-                    )
-                    if result['success']:
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f'✅ Données collectées pour {parcel.name}: '
-                                f"{result['alerts_generated']} alertes"
-                            )
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.ERROR(
-                                f'❌ Erreur pour {parcel.name}: {result["error"]}'
-                            )
-                        )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'⚠️ Parcelle {parcel.name} sans coordonnées GPS'
-                        )
-                    )
-            except Parcel.DoesNotExist:
-                self.stdout.write(
-                    self.style.ERROR(f'Parcelle {parcel_id} non trouvée')
-                )
-        else:
-            # Collecte pour toutes les parcelles
-            parcels = Parcel.objects.filter(
-                latitude__isnull=False,
-                longitude__isnull=False
-            )
+            parcels = parcels.filter(uuid=parcel_id)
+            if not parcels.exists():
+                self.stdout.write(self.style.ERROR(f'Parcelle {parcel_id} non trouvée ou sans coordonnées GPS'))
+                return
 
-            total = parcels.count()
-            success_count = 0
+        engine = WeatherCollectionEngine(
+            max_workers=options.get('workers'),
+            rate_per_second=options.get('rate'),
+            base_url=options.get('base_url')
+        )
+        report = engine.collect(parcels, forecast_days=options['days'])
 
-            for parcel in parcels:
-                result = collector.collect_and_save_weather_data(
-                    parcel, parcel.latitude, parcel.longitude
+        for result in report['results']:
+            if result['success']:
+                self.stdout.write(
+                    self.style.SUCCESS(f"✅ {result['parcel_name']}: {result['attempts']} tentative(s)")
                 )
-
-                if result['success']:
-                    success_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'✅ {parcel.name}: {result["alerts_generated"]} alertes'
-                        )
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'❌ {parcel.name}: {result["error"]}'
-                        )
-                    )
-
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Collecte terminée: {success_count}/{total} parcelles mises à jour'
+            else:
+                self.stdout.write(
+                    self.style.ERROR(f"❌ {result['parcel_name']}: {result['error']}")
                 )
-            )
\ No newline at end of file
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Collecte terminée: {report['success']}/{report['total']} parcelles mises à jour "
+                f"en {report['duration_s']}s ({report['parcels_per_minute']} parcelles/minute)"
+            )
+        )
+        stats = engine.cell_cache.stats()
+        self.stdout.write(
+            f"Cellules: {report['cells']} | appels API: {report['api_calls']} | "
+            f"appels économisés: {report['api_calls_saved']} "
+            f"(cumul cache: {stats['hits']} hits / {stats['misses']} misses)"
+        )
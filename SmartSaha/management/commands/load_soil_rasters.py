@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from SmartSaha.models import Parcel, SoilData, SoilProperty
+from SmartSaha.services import DashboardService
+from SmartSaha.services.soil_cache import soil_has_values
+from SmartSaha.services.soil_raster import soil_raster
+
+
+class Command(BaseCommand):
+    help = "Renseigne les données sol des parcelles depuis les tuiles SoilGrids locales (sans réseau)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Inclure les parcelles ayant déjà des données sol')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Parcelles échantillonnées par lot')
+
+    def handle(self, *args, **options):
+        if not soil_raster.available:
+            self.stdout.write(self.style.ERROR(
+                f"Tuiles indisponibles (rasterio installé ? fichiers dans {soil_raster.root} ?)"
+            ))
+            return
+
+        parcels = Parcel.objects.filter(points__isnull=False).exclude(points=[]).order_by('pk')
+        if not options['all']:
+            parcels = parcels.exclude(soildata__isnull=False)
+
+        started = time.perf_counter()
+        created, skipped, owners = 0, 0, set()
+        batch = []
+        for parcel in parcels.iterator(chunk_size=options['batch_size']):
+            point = parcel.points[0]
+            batch.append((parcel, (point["lat"], point["lng"])))
+            if len(batch) >= options['batch_size']:
+                created, skipped = self._store(batch, owners, created, skipped)
+                batch = []
+        if batch:
+            created, skipped = self._store(batch, owners, created, skipped)
+
+        # bulk_create n'émet pas de signaux : invalidation explicite des blocs sol
+        for owner_id in owners:
+            DashboardService.on_data_change(owner_id, "SoilData")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} échantillon(s) créé(s), {skipped} parcelle(s) hors emprise ou sans valeurs "
+            f"en {elapsed:.2f} s"
+        ))
+
+    @staticmethod
+    def _store(batch, owners, created, skipped):
+        payloads = soil_raster.sample_many([coordinates for _, coordinates in batch])
+        samples = [
+            SoilData(parcel=parcel, data=payload)
+            for (parcel, _), payload in zip(batch, payloads)
+            if soil_has_values(payload)
+        ]
+        with transaction.atomic():
+            SoilData.objects.bulk_create(samples)
+            SoilProperty.objects.bulk_create(
+                [row for sample in samples for row in SoilProperty.build_for(sample)]
+            )
+        owners.update(sample.parcel.owner_id for sample in samples)
+        return created + len(samples), skipped + len(batch) - len(samples)
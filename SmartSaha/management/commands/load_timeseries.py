@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from SmartSaha.models import ClimateData, WeatherData
+from SmartSaha.services import TimeSeriesService
+
+
+class Command(BaseCommand):
+    help = "Alimente la série journalière (DailyObservation) depuis les JSON WeatherData / ClimateData"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recharger tout l historique (sinon incrémental)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Lignes JSON lues par lot')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['full']:
+            written = {
+                model.__name__: TimeSeriesService.load(model, batch_size=options['batch_size'])[0]
+                for model in (WeatherData, ClimateData)
+            }
+        else:
+            written = TimeSeriesService.load_new()
+
+        for model_name, count in written.items():
+            self.stdout.write(f"{model_name}: {count} observation(s) écrite(s)")
+        self.stdout.write(self.style.SUCCESS(f"Terminé en {time.perf_counter() - started:.2f} s"))
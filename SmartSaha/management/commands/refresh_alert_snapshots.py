@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from SmartSaha.models import WeatherData
+from SmartSaha.models.externalData import ALERT_RULES_VERSION
+
+
+class Command(BaseCommand):
+    help = "Recalcule les snapshots d'alertes météo créés avec une ancienne version des règles"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Taille des lots de mise à jour')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stale = (
+            WeatherData.objects.exclude(alerts_version=ALERT_RULES_VERSION)
+            .prefetch_related('forecast_days')
+            .order_by('pk')
+        )
+
+        updated = 0
+        batch = []
+        for weather_data in stale.iterator(chunk_size=batch_size):
+            weather_data.refresh_alerts_snapshot()
+            weather_data.risk_level = weather_data._calculate_risk_level()
+            batch.append(weather_data)
+            if len(batch) >= batch_size:
+                updated += self._flush(batch)
+                batch = []
+        updated += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} snapshot(s) d'alertes recalculé(s) (règles v{ALERT_RULES_VERSION})"
+        ))
+
+    @staticmethod
+    def _flush(batch):
+        if batch:
+            WeatherData.objects.bulk_update(batch, ['alerts_snapshot', 'alerts_version', 'risk_level'])
+        return len(batch)
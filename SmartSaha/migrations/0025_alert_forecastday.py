@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0024_weatherdata_agriculturalalert_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=100)),
+                ('message', models.TextField()),
+                ('severity', models.CharField(choices=[('LOW', 'Faible'), ('MEDIUM', 'Moyenne'), ('HIGH', 'Haute'), ('CRITICAL', 'Critique')], max_length=10)),
+                ('action', models.TextField(blank=True)),
+                ('is_read', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('alert_date', models.DateField()),
+                ('parcel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='SmartSaha.parcel')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ForecastDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('max_temp_c', models.FloatField(blank=True, null=True)),
+                ('min_temp_c', models.FloatField(blank=True, null=True)),
+                ('avg_temp_c', models.FloatField(blank=True, null=True)),
+                ('total_precip_mm', models.FloatField(blank=True, null=True)),
+                ('max_wind_kph', models.FloatField(blank=True, null=True)),
+                ('avg_humidity', models.IntegerField(blank=True, null=True)),
+                ('chance_of_rain', models.IntegerField(blank=True, null=True)),
+                ('condition', models.CharField(blank=True, max_length=100)),
+                ('parcel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_days', to='SmartSaha.parcel')),
+                ('weather_data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecast_days', to='SmartSaha.weatherdata')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['parcel', 'date'], name='SmartSaha_f_parcel__ccb0f9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('weather_data', 'date'), name='unique_forecast_day_per_weather_data')],
+            },
+        ),
+    ]
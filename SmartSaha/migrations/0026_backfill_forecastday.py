@@ -0,0 +1,57 @@
+import datetime
+
+from django.db import migrations
+
+API_FIELDS = {
+    'max_temp_c': 'maxtemp_c',
+    'min_temp_c': 'mintemp_c',
+    'avg_temp_c': 'avgtemp_c',
+    'total_precip_mm': 'totalprecip_mm',
+    'max_wind_kph': 'maxwind_kph',
+    'avg_humidity': 'avghumidity',
+    'chance_of_rain': 'daily_chance_of_rain',
+}
+
+
+def backfill_forecast_days(apps, schema_editor):
+    WeatherData = apps.get_model("SmartSaha", "WeatherData")
+    ForecastDay = apps.get_model("SmartSaha", "ForecastDay")
+
+    batch = []
+    for weather_data in WeatherData.objects.only("id", "parcel_id", "data").iterator(chunk_size=500):
+        data = weather_data.data if isinstance(weather_data.data, dict) else {}
+        seen = set()
+        for day in data.get('forecast', {}).get('forecastday', []):
+            date = day.get('date')
+            if not date or date in seen:
+                continue
+            seen.add(date)
+            day_data = day.get('day', {})
+            batch.append(ForecastDay(
+                weather_data_id=weather_data.id,
+                parcel_id=weather_data.parcel_id,
+                date=datetime.date.fromisoformat(date),
+                condition=(day_data.get('condition') or {}).get('text', '')[:100],
+                **{field: day_data.get(key) for field, key in API_FIELDS.items()}
+            ))
+        if len(batch) >= 1000:
+            ForecastDay.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+
+    ForecastDay.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def clear_forecast_days(apps, schema_editor):
+    ForecastDay = apps.get_model("SmartSaha", "ForecastDay")
+    ForecastDay.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0025_alert_forecastday'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_forecast_days, clear_forecast_days),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0026_backfill_forecastday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherdata',
+            name='alerts_snapshot',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='weatherdata',
+            name='alerts_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
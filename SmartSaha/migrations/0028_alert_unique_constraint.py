@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:45
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_alerts(apps, schema_editor):
+    """Garde l'alerte la plus ancienne de chaque (parcelle, type, sévérité, date)"""
+    Alert = apps.get_model("SmartSaha", "Alert")
+    duplicates = (
+        Alert.objects.values('parcel_id', 'type', 'severity', 'alert_date')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates.iterator():
+        Alert.objects.filter(
+            parcel_id=group['parcel_id'],
+            type=group['type'],
+            severity=group['severity'],
+            alert_date=group['alert_date'],
+        ).exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0027_weatherdata_alerts_snapshot_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_alerts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alert',
+            constraint=models.UniqueConstraint(fields=('parcel', 'type', 'severity', 'alert_date'), name='unique_alert_per_parcel_type_severity_date'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0028_alert_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SoilProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property', models.CharField(max_length=50)),
+                ('depth', models.CharField(max_length=20)),
+                ('top_depth', models.IntegerField(blank=True, null=True)),
+                ('bottom_depth', models.IntegerField(blank=True, null=True)),
+                ('mean', models.FloatField(blank=True, null=True)),
+                ('unit', models.CharField(blank=True, max_length=20)),
+                ('target_unit', models.CharField(blank=True, max_length=20)),
+                ('d_factor', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('parcel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soil_properties', to='SmartSaha.parcel')),
+                ('soil_data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='property_values', to='SmartSaha.soildata')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['parcel', 'fetched_at'], name='SmartSaha_s_parcel__582e3e_idx'), models.Index(fields=['parcel', 'property'], name='SmartSaha_s_parcel__90a00c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('soil_data', 'property', 'depth'), name='unique_soil_property_per_sample')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+def backfill_soil_properties(apps, schema_editor):
+    SoilData = apps.get_model("SmartSaha", "SoilData")
+    SoilProperty = apps.get_model("SmartSaha", "SoilProperty")
+
+    batch = []
+    for soil_data in SoilData.objects.only("id", "parcel_id", "data", "created_at").iterator(chunk_size=500):
+        data = soil_data.data if isinstance(soil_data.data, dict) else {}
+        seen = set()
+        for layer in data.get('properties', {}).get('layers', []):
+            name = layer.get('name')
+            units = layer.get('unit_measure') or {}
+            for depth in layer.get('depths', []):
+                label = depth.get('label', '')
+                if not name or (name, label) in seen:
+                    continue
+                seen.add((name, label))
+                depth_range = depth.get('range') or {}
+                batch.append(SoilProperty(
+                    soil_data_id=soil_data.id,
+                    parcel_id=soil_data.parcel_id,
+                    property=name[:50],
+                    depth=label[:20],
+                    top_depth=depth_range.get('top_depth'),
+                    bottom_depth=depth_range.get('bottom_depth'),
+                    mean=(depth.get('values') or {}).get('mean'),
+                    unit=(units.get('mapped_units') or '')[:20],
+                    target_unit=(units.get('target_units') or '')[:20],
+                    d_factor=units.get('d_factor'),
+                    fetched_at=soil_data.created_at,
+                ))
+        if len(batch) >= 1000:
+            SoilProperty.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+
+    SoilProperty.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def clear_soil_properties(apps, schema_editor):
+    SoilProperty = apps.get_model("SmartSaha", "SoilProperty")
+    SoilProperty.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0029_soilproperty'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_soil_properties, clear_soil_properties),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('SmartSaha', '0030_backfill_soilproperty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(default='nasa_power', max_length=20)),
+                ('cell', models.CharField(max_length=40)),
+                ('variable', models.CharField(max_length=30)),
+                ('date', models.DateField()),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'cell', 'date'], name='SmartSaha_d_source_c3a6b4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'cell', 'variable', 'date'), name='unique_daily_observation')],
+            },
+        ),
+    ]
@@ -1,73 +1,164 @@
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
 from django.core.cache import cache
+from rest_framework import status
 from rest_framework.response import Response
 
+GENERATION_KEY_PREFIX = "cachegen"
+
+
+def _generation_key(namespace):
+    return f"{GENERATION_KEY_PREFIX}:{namespace}"
+
+
+def _new_generation():
+    # Valeur initiale horodatée : si le compteur est évincé, on ne retombe pas
+    # sur une génération déjà utilisée par des clés encore en cache.
+    return int(time.time() * 1000)
+
+
+def namespace_generations(*namespaces):
+    """Générations courantes des namespaces (un seul aller-retour cache)"""
+    keys = [_generation_key(ns) for ns in namespaces]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        generation = found.get(key)
+        if generation is None:
+            cache.add(key, _new_generation(), timeout=None)
+            generation = cache.get(key)
+        generations.append(generation)
+    return generations
+
+
+def bump_namespace(namespace):
+    """Invalide toutes les clés d'un namespace en un seul INCR"""
+    key = _generation_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _new_generation(), timeout=None)
+        return cache.get(key)
+
+
 class CacheInvalidationMixin:
     """
     Mixin pour gérer le cache automatique des ViewSets DRF.
     - Cache les endpoints list et retrieve.
-    - Invalide le cache sur create/update/partial_update/destroy.
+    - Chaque clé embarque un compteur de génération : invalider = un INCR,
+      sans scan des clés (KEYS) côté Redis.
+    - cache_scope = "user" : clés et invalidations propres à chaque utilisateur
+      (l'écriture d'un agriculteur ne vide pas le cache des autres) ;
+      "global" : données partagées (référentiels, groupes...).
+    - La clé de list inclut les paramètres de requête normalisés (filtres,
+      recherche, tri, page/curseur).
+    - ETag / If-None-Match : une liste inchangée renvoie 304 sans sérialisation.
     - Supporte un cache spécifique pour des objets liés (ex: Parcel).
     """
     cache_timeout = 60 * 10  # 10 minutes par défaut
-    cache_prefix = None      # À définir dans chaque ViewSet
+    cache_prefix = None      # Nom de la classe si non défini
+    cache_scope = "user"     # "user" ou "global"
     use_object_cache = False # Si True, cache par pk pour retrieve individuel
 
+    def get_cache_prefix(self):
+        return self.cache_prefix or self.__class__.__name__.lower()
+
+    def get_cache_user_id(self):
+        user = getattr(self.request, "user", None)
+        return user.pk if user is not None and user.is_authenticated else "anon"
+
+    def get_cache_namespaces(self):
+        """Namespaces dont la génération entre dans les clés (du plus large au plus fin)"""
+        prefix = self.get_cache_prefix()
+        if self.cache_scope == "user":
+            return [prefix, f"{prefix}:u{self.get_cache_user_id()}"]
+        return [prefix]
+
     def get_cache_key(self, suffix):
-        return f"{self.cache_prefix}:{suffix}"
+        namespaces = self.get_cache_namespaces()
+        generations = namespace_generations(*namespaces)
+        versioned = ":".join(f"{ns}@{gen}" for ns, gen in zip(namespaces, generations))
+        return f"{versioned}:{suffix}"
+
+    def get_query_signature(self):
+        """Empreinte des paramètres de requête, indépendante de leur ordre"""
+        params = sorted(
+            (name, value)
+            for name, values in self.request.query_params.lists()
+            for value in values
+            if value != ""
+        )
+        if not params:
+            return "all"
+        return hashlib.md5(urlencode(params).encode()).hexdigest()
+
+    @staticmethod
+    def compute_etag(data):
+        payload = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+        return '"%s"' % hashlib.md5(payload.encode()).hexdigest()
+
+    def cached_response(self, key, fetch):
+        """
+        Sert key depuis le cache ({"etag", "data"}) ou via fetch(), avec 304
+        si le client possède déjà cette version (If-None-Match).
+        """
+        entry = cache.get(key)
+        if entry is None:
+            response = fetch()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = {"etag": self.compute_etag(response.data), "data": response.data}
+            cache.set(key, entry, self.cache_timeout)
+
+        if_none_match = self.request.headers.get("If-None-Match", "")
+        if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entry["data"])
+        response["ETag"] = entry["etag"]
+        return response
 
     # ---------------- READ ----------------
     def list(self, request, *args, **kwargs):
-        key = self.get_cache_key("list")
-        data = cache.get(key)
-        if data:
-            return Response(data)
-        response = super().list(request, *args, **kwargs)
-        cache.set(key, response.data, self.cache_timeout)
-        return response
+        key = self.get_cache_key(f"list:{self.get_query_signature()}")
+        return self.cached_response(key, lambda: super(CacheInvalidationMixin, self).list(request, *args, **kwargs))
 
     def retrieve(self, request, *args, **kwargs):
         if self.use_object_cache:
             key = self.get_cache_key(f"detail:{kwargs.get('pk')}")
-            data = cache.get(key)
-            if data:
-                return Response(data)
-            response = super().retrieve(request, *args, **kwargs)
-            cache.set(key, response.data, self.cache_timeout)
-            return response
+            return self.cached_response(
+                key, lambda: super(CacheInvalidationMixin, self).retrieve(request, *args, **kwargs)
+            )
         return super().retrieve(request, *args, **kwargs)
 
     # ---------------- WRITE ----------------
-    def invalidate_cache(self, obj=None):
+    def invalidate_cache(self, obj=None, all_users=False):
         """
-        Supprime tout le cache lié au ViewSet.
+        Invalide le cache du ViewSet : génération de l'utilisateur courant
+        (scope "user") ou de tout le préfixe (scope "global" ou all_users=True).
         Si obj est fourni, supprime aussi le cache spécifique à l'objet.
         """
-        # Cache global du ViewSet
-        keys = cache.keys(f"{self.cache_prefix}:*") or []  
-        for k in keys:
-            cache.delete(k)
+        namespaces = self.get_cache_namespaces()
+        bump_namespace(namespaces[0] if all_users else namespaces[-1])
 
         # Cache spécifique à l'objet (ex: Parcel)
         if obj:
-            # Pour obj lui-même
-            if hasattr(obj, "uuid"):
-                obj_key = self.get_cache_key(f"detail:{obj.uuid}")
-                cache.delete(obj_key)
-
             # Si obj est lié à un Parcel
             if hasattr(obj, "parcel") and obj.parcel and hasattr(obj.parcel, "uuid"):
                 parcel_key = f"parcel_full_data_{obj.parcel.uuid}"
                 cache.delete(parcel_key)
 
-
     def perform_create(self, serializer):
-        serializer.save()
-        self.invalidate_cache(serializer.instance)  
+        super().perform_create(serializer)
+        self.invalidate_cache(serializer.instance)
 
     def perform_update(self, serializer):
-        serializer.save()
+        super().perform_update(serializer)
         self.invalidate_cache(serializer.instance)
 
     def perform_destroy(self, instance):
         self.invalidate_cache(instance)
-        instance.delete()
+        super().perform_destroy(instance)
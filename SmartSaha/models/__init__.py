@@ -5,6 +5,6 @@ from .parcels import Parcel, ParcelPoint
 from .tasks import Task, TaskStatus,TaskPriority
 from .yelds import YieldRecord,YieldForecast
 from .posts import Post, PostType, PostCurrency
-from .externalData import ClimateData,SoilData, WeatherData, BaseWeatherModel, AgriculturalAlert, AgriculturalAlertManager
+from .externalData import ClimateData, DailyObservation, SoilData, SoilProperty, WeatherData, ForecastDay, BaseWeatherModel, AgriculturalAlert, AgriculturalAlertManager, WeatherDataQuerySet, latest_weather_prefetch
 from .groups import Organisation, GroupType, GroupRole, Group, MemberGroup
 from .alerts import Alert
\ No newline at end of file
@@ -22,4 +22,10 @@ class Alert(models.Model):
     alert_date = models.DateField()  # Date de l'événement alerté
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['parcel', 'type', 'severity', 'alert_date'],
+                name='unique_alert_per_parcel_type_severity_date'
+            ),
+        ]
\ No newline at end of file
@@ -1,4 +1,10 @@
+import datetime
+
 from django.db import models
+from django.db.models import F, Prefetch, Window
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from django.contrib.postgres.fields import JSONField
 
 class SoilData(models.Model):
@@ -6,6 +12,101 @@ class SoilData(models.Model):
     data = models.JSONField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @property
+    def property_rows(self):
+        """
+        Valeurs sol normalisées (SoilProperty), lues depuis la table ou le
+        prefetch `property_values` ; construites depuis le JSON si non enregistré.
+        """
+        if getattr(self, '_property_rows', None) is None:
+            rows = []
+            if self.pk:
+                rows = list(self.property_values.all())
+            if not rows:
+                rows = SoilProperty.build_for(self)
+            self._property_rows = rows
+        return self._property_rows
+
+    @property
+    def has_values(self):
+        """Au moins une valeur moyenne non nulle"""
+        return any(row.mean is not None for row in self.property_rows)
+
+    def sync_properties(self):
+        """Réécrit les lignes SoilProperty depuis le JSON (appelé à l'ingestion)"""
+        SoilProperty.objects.filter(soil_data=self).delete()
+        rows = SoilProperty.build_for(self)
+        SoilProperty.objects.bulk_create(rows)
+        self._property_rows = rows
+        return rows
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.sync_properties()
+
+
+class SoilProperty(models.Model):
+    """
+    Valeur SoilGrids normalisée (propriété × profondeur), extraite une seule
+    fois de SoilData.data à l'ingestion. Résumés et contrôles de validité
+    deviennent des requêtes indexées / AVG SQL sur le dernier échantillon.
+    """
+    soil_data = models.ForeignKey(SoilData, on_delete=models.CASCADE, related_name='property_values')
+    parcel = models.ForeignKey("SmartSaha.Parcel", on_delete=models.CASCADE, related_name='soil_properties')
+    property = models.CharField(max_length=50)
+    depth = models.CharField(max_length=20)
+    top_depth = models.IntegerField(null=True, blank=True)
+    bottom_depth = models.IntegerField(null=True, blank=True)
+    mean = models.FloatField(null=True, blank=True)  # valeur brute (unités mapped_units)
+    unit = models.CharField(max_length=20, blank=True)
+    target_unit = models.CharField(max_length=20, blank=True)
+    d_factor = models.FloatField(null=True, blank=True)
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['parcel', 'fetched_at']),
+            models.Index(fields=['parcel', 'property']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['soil_data', 'property', 'depth'], name='unique_soil_property_per_sample'),
+        ]
+
+    @classmethod
+    def build_for(cls, soil_data):
+        """Construit (sans sauvegarder) les valeurs d'un SoilData"""
+        rows = []
+        seen = set()
+        data = soil_data.data if isinstance(soil_data.data, dict) else {}
+        fetched_at = soil_data.created_at or timezone.now()
+        for layer in data.get('properties', {}).get('layers', []):
+            name = layer.get('name')
+            units = layer.get('unit_measure') or {}
+            for depth in layer.get('depths', []):
+                label = depth.get('label', '')
+                if not name or (name, label) in seen:
+                    continue
+                seen.add((name, label))
+                depth_range = depth.get('range') or {}
+                rows.append(cls(
+                    soil_data=soil_data,
+                    parcel_id=soil_data.parcel_id,
+                    property=name[:50],
+                    depth=label[:20],
+                    top_depth=depth_range.get('top_depth'),
+                    bottom_depth=depth_range.get('bottom_depth'),
+                    mean=(depth.get('values') or {}).get('mean'),
+                    unit=(units.get('mapped_units') or '')[:20],
+                    target_unit=(units.get('target_units') or '')[:20],
+                    d_factor=units.get('d_factor'),
+                    fetched_at=fetched_at,
+                ))
+        return rows
+
+    def __str__(self):
+        return f"{self.parcel_id} - {self.property} {self.depth}"
+
 class ClimateData(models.Model):
     parcel = models.ForeignKey("SmartSaha.Parcel", on_delete=models.CASCADE)
     data = models.JSONField()
@@ -14,6 +115,36 @@ class ClimateData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+class DailyObservation(models.Model):
+    """
+    Série temporelle journalière au format long : une valeur par
+    (source, cellule de grille, variable, jour). Les plages déjà présentes
+    ne sont plus redemandées au fournisseur (NASA POWER...).
+    """
+    source = models.CharField(max_length=20, default='nasa_power')
+    cell = models.CharField(max_length=40)  # geo.cell_key
+    variable = models.CharField(max_length=30)
+    date = models.DateField()
+    value = models.FloatField(null=True, blank=True)
+    fetched_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'cell', 'date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'cell', 'variable', 'date'], name='unique_daily_observation'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.cell} {self.variable} {self.date}: {self.value}"
+
+
+# Version du jeu de règles d'alertes : l'incrémenter à chaque modification
+# des seuils/règles pour que les snapshots existants soient recalculés.
+ALERT_RULES_VERSION = 1
+
+
 class BaseWeatherModel(models.Model):
     """Classe abstraite de base pour tous les modèles météo"""
     created_at = models.DateTimeField(auto_now_add=True)
@@ -23,6 +154,40 @@ class BaseWeatherModel(models.Model):
         abstract = True
 
 
+class WeatherDataQuerySet(models.QuerySet):
+    """Accès groupé aux dernières observations météo par parcelle"""
+
+    def latest_per_parcel(self):
+        """Uniquement la ligne la plus récente de chaque parcelle (fenêtre ROW_NUMBER, une requête)"""
+        return self.annotate(
+            parcel_rank=Window(RowNumber(), partition_by=[F('parcel_id')], order_by=F('created_at').desc())
+        ).filter(parcel_rank=1)
+
+    def light(self):
+        """
+        Diffère le JSON brut : seul le bloc 'current' est remonté, les jours
+        viennent de ForecastDay et les alertes du snapshot.
+        """
+        return self.defer('data').annotate(current_json=KeyTransform('current', 'data'))
+
+    def latest_for_parcels(self, parcels):
+        """{parcel_id: dernier WeatherData} avec jours de prévision préchargés"""
+        weather = self.filter(parcel__in=parcels).latest_per_parcel().light().prefetch_related('forecast_days')
+        return {w.parcel_id: w for w in weather}
+
+
+def latest_weather_prefetch(to_attr='latest_weather'):
+    """
+    Prefetch du dernier WeatherData (allégé) de chaque parcelle :
+    parcel.<to_attr> est une liste de 0 ou 1 élément.
+    """
+    return Prefetch(
+        'weatherdata_set',
+        queryset=WeatherData.objects.latest_per_parcel().light().prefetch_related('forecast_days'),
+        to_attr=to_attr
+    )
+
+
 class WeatherData(BaseWeatherModel):
     parcel = models.ForeignKey("SmartSaha.Parcel", on_delete=models.CASCADE)
     data = models.JSONField()
@@ -39,6 +204,10 @@ class WeatherData(BaseWeatherModel):
     ])
     risk_level = models.CharField(max_length=20, blank=True)  # Bas, Moyen, Élevé
 
+    # Alertes calculées à l'ingestion (versionnées par jeu de règles)
+    alerts_snapshot = models.JSONField(default=list, blank=True)
+    alerts_version = models.PositiveIntegerField(default=0)
+
     class Meta:
         indexes = [
             models.Index(fields=['parcel', 'start']),
@@ -47,42 +216,90 @@ class WeatherData(BaseWeatherModel):
         ]
         ordering = ['-start']
 
+    objects = WeatherDataQuerySet.as_manager()
+
+    @property
+    def current_conditions(self):
+        """Bloc 'current' de la réponse API (annotation current_json si data est différé)"""
+        if 'data' in self.get_deferred_fields() and hasattr(self, 'current_json'):
+            return self.current_json or {}
+        return self.data.get('current', {})
+
     @property
     def current_temperature(self):
         """Température actuelle en °C"""
-        return self.data.get('current', {}).get('temp_c')
+        return self.current_conditions.get('temp_c')
+
+    # ---------------- Jours de prévision (colonnes typées) ----------------
+    @property
+    def forecast_rows(self):
+        """
+        Jours de prévision typés (ForecastDay).
+        Lus depuis la table (ou le prefetch `forecast_days`) ; construits depuis
+        le JSON tant que l'objet n'est pas encore enregistré. JSON différé
+        (light()) : pas de rechargement, aucune ligne (ex. collecte en erreur).
+        """
+        if getattr(self, '_forecast_rows', None) is None:
+            rows = []
+            if self.pk:
+                rows = list(self.forecast_days.all())
+            if not rows and 'data' not in self.get_deferred_fields():
+                rows = ForecastDay.build_for(self)
+            self._forecast_rows = rows
+        return self._forecast_rows
+
+    def sync_forecast_days(self):
+        """Réécrit les lignes ForecastDay depuis le JSON (appelé à l'ingestion)"""
+        ForecastDay.objects.filter(weather_data=self).delete()
+        rows = ForecastDay.build_for(self)
+        ForecastDay.objects.bulk_create(rows)
+        self._forecast_rows = rows
+        return rows
 
     @property
     def total_precipitation(self):
         """Précipitations totales sur la période"""
-        forecast_days = self.data.get('forecast', {}).get('forecastday', [])
-        return sum(day['day']['totalprecip_mm'] for day in forecast_days)
+        return sum(row.total_precip_mm or 0 for row in self.forecast_rows)
 
     @property
     def agricultural_alerts(self):
-        """Génère les alertes agricoles depuis les données JSON"""
-        return self._generate_alerts()
+        """
+        Alertes agricoles matérialisées.
+        Le snapshot est recalculé (et persisté) seulement si le jeu de règles a changé.
+        """
+        if self.alerts_version != ALERT_RULES_VERSION:
+            self.refresh_alerts_snapshot(persist=bool(self.pk))
+        return self.alerts_snapshot
+
+    def refresh_alerts_snapshot(self, persist=False):
+        """Recalcule le snapshot d'alertes avec les règles courantes"""
+        self.alerts_snapshot = self._generate_alerts()
+        self.alerts_version = ALERT_RULES_VERSION
+        if persist:
+            WeatherData.objects.filter(pk=self.pk).update(
+                alerts_snapshot=self.alerts_snapshot,
+                alerts_version=self.alerts_version
+            )
+        return self.alerts_snapshot
 
     def _generate_alerts(self):
         alerts = []
-        forecast_days = self.data.get('forecast', {}).get('forecastday', [])
 
-        for day in forecast_days:
-            day_data = day['day']
-            date = day['date']
+        for row in self.forecast_rows:
+            date = row.date.isoformat()
 
             # Alerte pluie intense
-            if day_data['totalprecip_mm'] > 20:
+            if row.total_precip_mm is not None and row.total_precip_mm > 20:
                 alerts.append({
                     'date': date,
                     'type': 'HEAVY_RAIN',
-                    'message': f"🌧️ Pluie intense prévue: {day_data['totalprecip_mm']}mm",
+                    'message': f"🌧️ Pluie intense prévue: {row.total_precip_mm}mm",
                     'severity': 'HIGH',
                     'action': 'Reporter travaux drainage'
                 })
 
             # Alerte sécheresse
-            if day_data['totalprecip_mm'] == 0 and day_data['avgtemp_c'] > 30:
+            if row.total_precip_mm == 0 and row.avg_temp_c is not None and row.avg_temp_c > 30:
                 alerts.append({
                     'date': date,
                     'type': 'DROUGHT_RISK',
@@ -92,31 +309,31 @@ class WeatherData(BaseWeatherModel):
                 })
 
             # Alerte gel (pour cultures sensibles)
-            if day_data['mintemp_c'] < 5:
+            if row.min_temp_c is not None and row.min_temp_c < 5:
                 alerts.append({
                     'date': date,
                     'type': 'FROST_RISK',
-                    'message': f"❄️ Risque de gel: {day_data['mintemp_c']}°C",
+                    'message': f"❄️ Risque de gel: {row.min_temp_c}°C",
                     'severity': 'HIGH',
                     'action': 'Protéger cultures sensibles'
                 })
 
             # Alerte vent fort
-            if day_data['maxwind_kph'] > 30:
+            if row.max_wind_kph is not None and row.max_wind_kph > 30:
                 alerts.append({
                     'date': date,
                     'type': 'STRONG_WIND',
-                    'message': f"💨 Vent fort: {day_data['maxwind_kph']} km/h",
+                    'message': f"💨 Vent fort: {row.max_wind_kph} km/h",
                     'severity': 'MEDIUM',
                     'action': 'Éviter traitements phytosanitaires'
                 })
 
             # Alerte humidité élevée (maladies fongiques)
-            if day_data['avghumidity'] > 85:
+            if row.avg_humidity is not None and row.avg_humidity > 85:
                 alerts.append({
                     'date': date,
                     'type': 'HIGH_HUMIDITY',
-                    'message': f"💧 Humidité élevée: {day_data['avghumidity']}%",
+                    'message': f"💧 Humidité élevée: {row.avg_humidity}%",
                     'severity': 'MEDIUM',
                     'action': 'Surveiller maladies fongiques'
                 })
@@ -127,16 +344,14 @@ class WeatherData(BaseWeatherModel):
     def optimal_planting_days(self):
         """Jours optimaux pour les semis"""
         optimal_days = []
-        forecast_days = self.data.get('forecast', {}).get('forecastday', [])
 
-        for day in forecast_days:
-            day_data = day['day']
+        for row in self.forecast_rows:
             # Conditions optimales: pas de pluie forte, températures modérées
-            if (day_data['daily_chance_of_rain'] < 30 and
-                    15 <= day_data['avgtemp_c'] <= 25 and
-                    day_data['maxwind_kph'] < 20):
+            if (row.chance_of_rain is not None and row.chance_of_rain < 30 and
+                    row.avg_temp_c is not None and 15 <= row.avg_temp_c <= 25 and
+                    row.max_wind_kph is not None and row.max_wind_kph < 20):
                 optimal_days.append({
-                    'date': day['date'],
+                    'date': row.date.isoformat(),
                     'score': 85,  # Score de pertinence
                     'reason': 'Conditions climatiques optimales'
                 })
@@ -146,8 +361,7 @@ class WeatherData(BaseWeatherModel):
     @property
     def irrigation_recommendation(self):
         """Recommandations d'irrigation"""
-        forecast_days = self.data.get('forecast', {}).get('forecastday', [])
-        total_rain = sum(day['day']['totalprecip_mm'] for day in forecast_days)
+        total_rain = self.total_precipitation
 
         if total_rain > 40:
             return {"irrigation": "Non nécessaire", "reason": "Pluies suffisantes"}
@@ -175,8 +389,10 @@ class WeatherData(BaseWeatherModel):
 
     def get_weather_summary(self):
         """Résumé météo pour dashboard"""
-        current = self.data.get('current', {})
-        forecast_days = self.data.get('forecast', {}).get('forecastday', [])
+        current = self.current_conditions
+        rows = self.forecast_rows
+        max_temps = [row.max_temp_c for row in rows if row.max_temp_c is not None]
+        min_temps = [row.min_temp_c for row in rows if row.min_temp_c is not None]
 
         return {
             'current_conditions': {
@@ -186,35 +402,39 @@ class WeatherData(BaseWeatherModel):
                 'precipitation': current.get('precip_mm')
             },
             'forecast_stats': {
-                'max_temp': max(day['day']['maxtemp_c'] for day in forecast_days),
-                'min_temp': min(day['day']['mintemp_c'] for day in forecast_days),
+                'max_temp': max(max_temps, default=None),
+                'min_temp': min(min_temps, default=None),
                 'total_rain': self.total_precipitation,
-                'rainy_days': sum(1 for day in forecast_days if day['day']['totalprecip_mm'] > 0)
+                'rainy_days': sum(1 for row in rows if (row.total_precip_mm or 0) > 0)
             }
         }
 
     def calculate_growing_degree_days(self, base_temp=10):
         """Calcul des degrés-jours de croissance"""
-        forecast_days = self.data.get('forecast', {}).get('forecastday', [])
         gdd = 0
 
-        for day in forecast_days:
-            day_data = day['day']
-            avg_temp = day_data['avgtemp_c']
-            if avg_temp > base_temp:
-                gdd += (avg_temp - base_temp)
+        for row in self.forecast_rows:
+            if row.avg_temp_c is not None and row.avg_temp_c > base_temp:
+                gdd += (row.avg_temp_c - base_temp)
 
         return gdd
 
-    def save(self, *args, **kwargs):
-        """Auto-remplissage des métadonnées à la sauvegarde"""
+    def prepare_metadata(self):
+        """Remplit les métadonnées dérivées du JSON (aussi utilisé avant un bulk_create)"""
         if not self.location_name and 'location' in self.data:
             self.location_name = self.data['location']['name']
 
+        self.refresh_alerts_snapshot()
+
         if not self.risk_level:
             self.risk_level = self._calculate_risk_level()
 
+    def save(self, *args, **kwargs):
+        """Auto-remplissage des métadonnées et des jours de prévision à la sauvegarde"""
+        self._forecast_rows = ForecastDay.build_for(self)
+        self.prepare_metadata()
         super().save(*args, **kwargs)
+        self.sync_forecast_days()
 
     def _calculate_risk_level(self):
         """Calcule automatiquement le niveau de risque"""
@@ -233,7 +453,71 @@ class WeatherData(BaseWeatherModel):
         """Récupère les dernières données pour une parcelle"""
         return cls.objects.filter(parcel=parcel).latest('created_at')
 
-    pass
+
+class ForecastDay(models.Model):
+    """
+    Jour de prévision normalisé, extrait une seule fois de WeatherData.data
+    à l'ingestion. Les propriétés météo et les dashboards lisent ces colonnes
+    (ou les agrègent en SQL) au lieu de reparcourir le JSON.
+    """
+    weather_data = models.ForeignKey(WeatherData, on_delete=models.CASCADE, related_name='forecast_days')
+    parcel = models.ForeignKey("SmartSaha.Parcel", on_delete=models.CASCADE, related_name='forecast_days')
+    date = models.DateField()
+
+    max_temp_c = models.FloatField(null=True, blank=True)
+    min_temp_c = models.FloatField(null=True, blank=True)
+    avg_temp_c = models.FloatField(null=True, blank=True)
+    total_precip_mm = models.FloatField(null=True, blank=True)
+    max_wind_kph = models.FloatField(null=True, blank=True)
+    avg_humidity = models.IntegerField(null=True, blank=True)
+    chance_of_rain = models.IntegerField(null=True, blank=True)
+    condition = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        ordering = ['date']
+        indexes = [
+            models.Index(fields=['parcel', 'date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['weather_data', 'date'], name='unique_forecast_day_per_weather_data'),
+        ]
+
+    # Correspondance colonne -> clé du bloc "day" de WeatherAPI
+    API_FIELDS = {
+        'max_temp_c': 'maxtemp_c',
+        'min_temp_c': 'mintemp_c',
+        'avg_temp_c': 'avgtemp_c',
+        'total_precip_mm': 'totalprecip_mm',
+        'max_wind_kph': 'maxwind_kph',
+        'avg_humidity': 'avghumidity',
+        'chance_of_rain': 'daily_chance_of_rain',
+    }
+
+    @classmethod
+    def build_for(cls, weather_data):
+        """Construit (sans sauvegarder) les jours de prévision d'un WeatherData"""
+        rows = []
+        seen = set()
+        data = weather_data.data if isinstance(weather_data.data, dict) else {}
+        for day in data.get('forecast', {}).get('forecastday', []):
+            day_data = day.get('day', {})
+            date = day.get('date')
+            if isinstance(date, str):
+                date = datetime.date.fromisoformat(date)
+            if date is None or date in seen:
+                continue
+            seen.add(date)
+            rows.append(cls(
+                weather_data=weather_data,
+                parcel_id=weather_data.parcel_id,
+                date=date,
+                condition=(day_data.get('condition') or {}).get('text', '')[:100],
+                **{field: day_data.get(key) for field, key in cls.API_FIELDS.items()}
+            ))
+        return rows
+
+    def __str__(self):
+        return f"{self.parcel_id} - {self.date}"
 
 
 class AgriculturalAlertManager(models.Manager):
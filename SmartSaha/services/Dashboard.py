@@ -1,6 +1,65 @@
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.db.models import Sum, Avg, Count, F, Q
-from SmartSaha.models import Parcel, ParcelCrop, YieldRecord, Task, SoilData, ClimateData, WeatherData
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Sum, Avg, F, OuterRef, Subquery
+from SmartSaha.models import Parcel, ParcelCrop, YieldRecord, Task, SoilData, SoilProperty, ClimateData, WeatherData, BIReport, latest_weather_prefetch
+from SmartSaha.services.task_statistics import TaskStatisticsService
+
+logger = logging.getLogger(__name__)
+
+_block_pool = None
+_precompute_pool = None
+
+
+def _dashboard_config():
+    return getattr(settings, "DASHBOARD_CACHE", {})
+
+
+def _get_block_pool():
+    """Pool partagé des calculs de blocs (chaque thread garde sa propre connexion DB)"""
+    global _block_pool
+    if _block_pool is None:
+        _block_pool = ThreadPoolExecutor(
+            max_workers=_dashboard_config().get("MAX_WORKERS", 8), thread_name_prefix="dashboard"
+        )
+    return _block_pool
+
+
+def _get_precompute_pool():
+    """Pool dédié aux précalculs : les blocs demandés en direct n'attendent jamais derrière eux"""
+    global _precompute_pool
+    if _precompute_pool is None:
+        _precompute_pool = ThreadPoolExecutor(
+            max_workers=_dashboard_config().get("PRECOMPUTE_WORKERS", 2), thread_name_prefix="dashboard-precompute"
+        )
+    return _precompute_pool
+
+
+def _precompute_in_background(user_id):
+    # Retiré de la file avant le calcul : une écriture pendant le calcul replanifie un passage
+    cache.delete(DashboardService.precompute_pending_key(user_id))
+    close_old_connections()
+    try:
+        DashboardService.precompute_for_user(user_id)
+    except Exception as e:
+        logger.error(f"Précalcul dashboard {user_id} échoué: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def _compute_block_in_worker(service, block):
+    close_old_connections()
+    try:
+        return service.compute_block(block)
+    finally:
+        close_old_connections()
 
 
 class DashboardService:
@@ -9,15 +68,164 @@ class DashboardService:
     précharge les relations pour sols et climat, et met en cache les blocs.
     """
     CACHE_TIMEOUT = 60 * 15  # 15 min
+    FULL_CACHE_TIMEOUT = 60 * 30
+    REPORT_NAME = "dashboard"  # BIReport du dernier dashboard précalculé
+    PRECOMPUTE_LOCK_TIMEOUT = 60 * 5
+
+    # Bloc -> (méthode de calcul, modèles dont il dépend). Les signaux
+    # n'invalident que les blocs touchés par le modèle modifié.
+    BLOCKS = {
+        "parcels": ("get_parcels_data", ("Parcel",)),
+        "soil": ("get_soil_summary", ("Parcel", "SoilData")),
+        "weather": ("get_weather_summary", ("Parcel", "WeatherData")),
+        "enhanced_weather": ("get_enhanced_weather_summary", ("Parcel", "WeatherData")),
+        "weather_overview": ("get_dashboard_weather_overview", ("Parcel", "WeatherData")),
+        "yield": ("get_yield_summary", ("Parcel", "ParcelCrop", "YieldRecord")),
+        "task": ("get_task_summary", ("Parcel", "ParcelCrop", "Task")),
+    }
+
+    # Clé du dashboard complet -> bloc
+    FULL_DASHBOARD = (
+        ("parcels", "parcels"),
+        ("soil_summary", "soil"),
+        ("climate_summary", "weather_overview"),
+        ("yield_summary", "yield"),
+        ("task_summary", "task"),
+    )
+    # Dernière version calculée d'un bloc, servie (marquée stale) si son recalcul est trop lent
+    LAST_GOOD_TIMEOUT = 60 * 60 * 24
 
     def __init__(self, user):
         self.user = user
+        self.timings = {}
+
+    # ---------------- Cache des blocs ----------------
+    @staticmethod
+    def block_key(user_id, block):
+        return f"dashboard_{user_id}_{block}"
+
+    @staticmethod
+    def full_key(user_id):
+        return f"dashboard_full_{user_id}"
+
+    @staticmethod
+    def last_good_key(user_id, block):
+        return f"dashboard_{user_id}_{block}_last"
+
+    @classmethod
+    def blocks_for_model(cls, model_name):
+        return [block for block, (_, models) in cls.BLOCKS.items() if model_name in models]
+
+    @classmethod
+    def invalidate_blocks(cls, user_id, blocks=None):
+        """
+        Supprime les blocs donnés (tous par défaut) et le dashboard assemblé :
+        ils seront recalculés à la prochaine lecture ou par rebuild_blocks.
+        """
+        blocks = cls.BLOCKS if blocks is None else blocks
+        cache.delete_many([cls.block_key(user_id, block) for block in blocks] + [cls.full_key(user_id)])
+
+    def rebuild_blocks(self, blocks=None):
+        """Recalcule et remet en cache les blocs (reconstruction anticipée)"""
+        for block in (self.BLOCKS if blocks is None else blocks):
+            getattr(self, self.BLOCKS[block][0])()
+
+    @classmethod
+    def on_data_change(cls, user_id, model_name):
+        """
+        Invalide les blocs dépendant de model_name pour cet utilisateur puis
+        planifie le précalcul de son dashboard (DASHBOARD_CACHE["PRECOMPUTE"]).
+        """
+        blocks = cls.blocks_for_model(model_name)
+        if not blocks:
+            return
+        cls.invalidate_blocks(user_id, blocks)
+        cls.schedule_precompute(user_id)
+
+    # ---------------- Précalcul ----------------
+    @staticmethod
+    def precompute_lock_key(user_id):
+        return f"dashboard_{user_id}_precompute_lock"
+
+    @staticmethod
+    def precompute_dirty_key(user_id):
+        return f"dashboard_{user_id}_precompute_dirty"
+
+    @staticmethod
+    def precompute_pending_key(user_id):
+        return f"dashboard_{user_id}_precompute_pending"
+
+    @classmethod
+    def schedule_precompute(cls, user_id):
+        """
+        Envoie le précalcul à Celery, ou au pool local dédié si Celery n'est pas
+        configuré/joignable (un seul précalcul en attente par utilisateur).
+        """
+        config = _dashboard_config()
+        if not config.get("PRECOMPUTE", True):
+            return
+        if config.get("PRECOMPUTE_BACKEND", "thread") == "celery":
+            try:
+                from SmartSaha.tasks import precompute_user_dashboard
+                precompute_user_dashboard.apply_async(
+                    args=[str(user_id)], countdown=config.get("PRECOMPUTE_DELAY", 0)
+                )
+                return
+            except Exception as e:
+                logger.warning(f"Celery indisponible, précalcul local du dashboard {user_id}: {str(e)}")
+        if not cache.add(cls.precompute_pending_key(user_id), 1, timeout=cls.PRECOMPUTE_LOCK_TIMEOUT):
+            return
+        _get_precompute_pool().submit(_precompute_in_background, user_id)
+
+    @classmethod
+    def precompute_for_user(cls, user_id):
+        """
+        Précalcule le dashboard d'un utilisateur sous verrou (anti-stampede) :
+        une demande reçue pendant le calcul marque le dashboard « dirty » et
+        le détenteur du verrou refait un passage. Retourne False si un autre
+        worker calcule déjà.
+        """
+        lock_key, dirty_key = cls.precompute_lock_key(user_id), cls.precompute_dirty_key(user_id)
+        if not cache.add(lock_key, 1, timeout=cls.PRECOMPUTE_LOCK_TIMEOUT):
+            cache.set(dirty_key, 1, timeout=cls.PRECOMPUTE_LOCK_TIMEOUT)
+            return False
+        try:
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is None:
+                return False
+            for _ in range(3):
+                cache.delete(dirty_key)
+                cls(user).precompute()
+                if not cache.get(dirty_key):
+                    break
+            return True
+        finally:
+            cache.delete(lock_key)
+
+    def precompute(self):
+        """
+        Recalcule les blocs manquants, met le dashboard complet en cache et
+        le sauvegarde comme snapshot BIReport (repli si le cache est vidé).
+        """
+        data = self.get_full_dashboard(degrade=False, parallel=False)
+        cache.set(self.full_key(self.user.pk), data, timeout=self.FULL_CACHE_TIMEOUT)
+
+        snapshot = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+        with transaction.atomic():
+            BIReport.objects.filter(user=self.user, name=self.REPORT_NAME).delete()
+            BIReport.objects.create(user=self.user, name=self.REPORT_NAME, data_snapshot=snapshot)
+        return data
+
+    @classmethod
+    def latest_snapshot(cls, user):
+        report = BIReport.objects.filter(user=user, name=cls.REPORT_NAME).order_by('-created_at').first()
+        return report.data_snapshot if report else None
 
     # ---------------- Parcelles ----------------
     def get_parcels_data(self):
-        cache_key = f"dashboard_{self.user.pk}_parcels"
+        cache_key = self.block_key(self.user.pk, "parcels")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
         parcels = Parcel.objects.filter(owner=self.user)
@@ -27,43 +235,56 @@ class DashboardService:
 
     # ---------------- Sols ----------------
     def get_soil_summary(self):
-        cache_key = f"dashboard_{self.user.pk}_soil"
+        cache_key = self.block_key(self.user.pk, "soil")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
-        parcels = Parcel.objects.filter(owner=self.user).prefetch_related("soildata_set")
-        soil_summary = []
+        # Dernier échantillon valide de chaque parcelle, puis AVG SQL par propriété
+        latest_sample = SoilProperty.objects.filter(
+            parcel=OuterRef("pk"), mean__isnull=False
+        ).order_by("-fetched_at", "-soil_data_id").values("soil_data_id")[:1]
+        parcels = list(Parcel.objects.filter(owner=self.user).annotate(latest_soil_id=Subquery(latest_sample)))
+
+        averages = {}
+        rows = (
+            SoilProperty.objects
+            .filter(soil_data_id__in=[p.latest_soil_id for p in parcels if p.latest_soil_id], mean__isnull=False)
+            .values("parcel_id", "property")
+            .annotate(avg_mean=Avg("mean"))
+            .order_by()
+        )
+        for row in rows:
+            averages.setdefault(row["parcel_id"], {})[row["property"]] = row["avg_mean"]
 
-        for parcel in parcels:
-            layer_agg = {}
-            for soil in parcel.soildata_set.all():
-                layers = soil.data.get("properties", {}).get("layers", [])
-                for layer in layers:
-                    name = layer.get("name")
-                    for depth in layer.get("depths", []):
-                        val = depth.get("values", {}).get("mean")
-                        if val is not None:
-                            layer_agg.setdefault(name, []).append(val)
-            summary = {k: sum(v)/len(v) if v else None for k, v in layer_agg.items()} if layer_agg else None
-            soil_summary.append({"parcel_id": str(parcel.uuid), "soil_summary": summary})
+        soil_summary = [
+            {"parcel_id": str(parcel.uuid), "soil_summary": averages.get(parcel.pk)}
+            for parcel in parcels
+        ]
 
         cache.set(cache_key, soil_summary, timeout=self.CACHE_TIMEOUT)
         return soil_summary
 
     # ---------------- Météo ----------------
+    def _parcels_with_latest_weather(self):
+        """
+        Parcelles de l'utilisateur avec leur dernier WeatherData (parcel.latest_weather) :
+        une requête pour les parcelles, une pour la météo (JSON brut différé), une pour les jours.
+        """
+        return list(Parcel.objects.filter(owner=self.user).prefetch_related(latest_weather_prefetch()))
+
     def get_weather_summary(self):
-        cache_key = f"dashboard_{self.user.pk}_weather"
+        cache_key = self.block_key(self.user.pk, "weather")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
-        parcels = Parcel.objects.filter(owner=self.user).prefetch_related("weatherdata_set")
+        parcels = self._parcels_with_latest_weather()
         weather_summary = []
 
         for parcel in parcels:
             # Récupérer les données météo les plus récentes
-            latest_weather = parcel.weatherdata_set.order_by('-created_at').first()
+            latest_weather = parcel.latest_weather[0] if parcel.latest_weather else None
 
             if latest_weather:
                 # Utiliser les propriétés calculées de WeatherData
@@ -91,16 +312,16 @@ class DashboardService:
 
     def get_enhanced_weather_summary(self):
         """Version enrichie avec analyse agricole complète"""
-        cache_key = f"dashboard_{self.user.pk}_enhanced_weather"
+        cache_key = self.block_key(self.user.pk, "enhanced_weather")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
-        parcels = Parcel.objects.filter(owner=self.user).prefetch_related("weatherdata_set")
+        parcels = self._parcels_with_latest_weather()
         enhanced_summary = []
 
         for parcel in parcels:
-            latest_weather = parcel.weatherdata_set.order_by('-created_at').first()
+            latest_weather = parcel.latest_weather[0] if parcel.latest_weather else None
 
             if latest_weather:
                 # Utiliser l'analyseur agricole pour des insights avancés
@@ -147,14 +368,14 @@ class DashboardService:
 
     def get_dashboard_weather_overview(self):
         """Version compacte pour le dashboard principal"""
-        cache_key = f"dashboard_{self.user.pk}_weather_overview"
+        cache_key = self.block_key(self.user.pk, "weather_overview")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
-        parcels = Parcel.objects.filter(owner=self.user)
+        parcels = self._parcels_with_latest_weather()
         overview = {
-            "total_parcels": parcels.count(),
+            "total_parcels": len(parcels),
             "parcels_with_weather_data": 0,
             "high_risk_parcels": 0,
             "total_alerts": 0,
@@ -162,7 +383,7 @@ class DashboardService:
         }
 
         for parcel in parcels:
-            latest_weather = WeatherData.objects.filter(parcel=parcel).order_by('-created_at').first()
+            latest_weather = parcel.latest_weather[0] if parcel.latest_weather else None
 
             if latest_weather:
                 overview["parcels_with_weather_data"] += 1
@@ -198,38 +419,30 @@ class DashboardService:
 
     def refresh_weather_data(self):
         """Force le rafraîchissement des données météo pour toutes les parcelles"""
-        from SmartSaha.services import WeatherDataCollector
+        from SmartSaha.services import WeatherCollectionEngine
 
-        collector = WeatherDataCollector()
-        parcels = Parcel.objects.filter(owner=self.user)
-
-        refresh_results = []
+        parcels = Parcel.objects.filter(owner=self.user).filter(points__isnull=False).exclude(points=[])
+        report = WeatherCollectionEngine().collect(parcels)
 
-        for parcel in parcels:
-            if parcel.points:  # Vérifier que la parcelle a des coordonnées
-                result = collector.collect_and_save_weather_data(parcel)
-                refresh_results.append({
-                    "parcel_name": parcel.parcel_name,
-                    "success": result['success'],
-                    "alerts_generated": result.get('alerts_generated', 0),
-                    "error": result.get('error')
-                })
+        refresh_results = [
+            {
+                "parcel_name": result['parcel_name'],
+                "success": result['success'],
+                "alerts_generated": result.get('alerts_generated', 0),
+                "error": result.get('error')
+            }
+            for result in report['results']
+        ]
 
         # Nettoyer le cache
-        cache_keys = [
-            f"dashboard_{self.user.pk}_weather",
-            f"dashboard_{self.user.pk}_enhanced_weather",
-            f"dashboard_{self.user.pk}_weather_overview"
-        ]
-        for key in cache_keys:
-            cache.delete(key)
+        self.invalidate_blocks(self.user.pk, self.blocks_for_model("WeatherData"))
 
         return refresh_results
     # ---------------- Rendements ----------------
     def get_yield_summary(self):
-        cache_key = f"dashboard_{self.user.pk}_yield"
+        cache_key = self.block_key(self.user.pk, "yield")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
         # Agrégation SQL : sum et avg par ParcelCrop
@@ -260,25 +473,23 @@ class DashboardService:
 
     # ---------------- Tâches ----------------
     def get_task_summary(self):
-        cache_key = f"dashboard_{self.user.pk}_task"
+        cache_key = self.block_key(self.user.pk, "task")
         data = cache.get(cache_key)
-        if data:
+        if data is not None:
             return data
 
-        # Agrégation SQL : total et complétées par Parcel
-        parcels = Parcel.objects.filter(owner=self.user)
+        # Une requête groupée pour toutes les parcelles (+ la liste des parcelles)
+        by_parcel = TaskStatisticsService.for_user(self.user).compute()["by_parcel"]
         data = []
-        for parcel in parcels:
-            tasks = Task.objects.filter(parcelCrop__parcel=parcel)
-            agg = tasks.aggregate(
-                total_tasks=Count("id"),
-                completed_tasks=Count("id", filter=Q(status__name="Done"))
-            )
+        for parcel in Parcel.objects.filter(owner=self.user):
+            stats = by_parcel.get(parcel.pk, TaskStatisticsService.empty_stats())
             data.append({
                 "parcel_id": str(parcel.uuid),
                 "task_summary": {
-                    "total_tasks": agg.get("total_tasks", 0),
-                    "completed_tasks": agg.get("completed_tasks", 0)
+                    "total_tasks": stats["total"],
+                    "completed_tasks": stats["done_status"],
+                    "overdue_tasks": stats["overdue"],
+                    "urgent_tasks": stats["urgent"]
                 }
             })
 
@@ -286,14 +497,88 @@ class DashboardService:
         return data
 
     # ---------------- Dashboard complet ----------------
-    def get_full_dashboard(self):
+    def compute_block(self, block):
+        """Calcule (ou lit) un bloc ; retourne (données, durée en ms)"""
+        started = time.perf_counter()
+        data = getattr(self, self.BLOCKS[block][0])()
+        cache.set(self.last_good_key(self.user.pk, block), data, timeout=self.LAST_GOOD_TIMEOUT)
+        return data, round((time.perf_counter() - started) * 1000, 1)
+
+    def _degraded_block(self, block, reason):
+        stale = cache.get(self.last_good_key(self.user.pk, block))
+        if stale is not None:
+            return {"status": "stale", "reason": reason, "data": stale}
+        return {"status": "pending", "reason": reason}
+
+    def get_full_dashboard(self, degrade=True, parallel=None):
         """
-        Assemble les blocs depuis le cache (ou calcule si cache vide)
+        Assemble les blocs : ceux en cache sont lus en un seul get_many, les
+        autres calculés en parallèle (DASHBOARD_CACHE["PARALLEL_BLOCKS"]).
+        Avec degrade, un bloc (même seul à recalculer) qui dépasse son délai
+        (BLOCK_TIMEOUT, ou BLOCK_TIMEOUTS[bloc]) ou qui échoue est remplacé
+        par un marqueur stale/pending ; il termine en arrière-plan et sera en
+        cache au prochain appel. Les durées par bloc sont dans self.timings.
         """
-        return {
-            "parcels": self.get_parcels_data(),
-            "soil_summary": self.get_soil_summary(),
-            "climate_summary": self.get_dashboard_weather_overview(),
-            "yield_summary": self.get_yield_summary(),
-            "task_summary": self.get_task_summary(),
-        }
+        config = _dashboard_config()
+        if parallel is None:
+            parallel = config.get("PARALLEL_BLOCKS", True)
+        keys = {block: self.block_key(self.user.pk, block) for _, block in self.FULL_DASHBOARD}
+        cached = cache.get_many(list(keys.values()))
+        blocks, incomplete = {}, []
+        self.timings = {}
+
+        missing = []
+        for block, key in keys.items():
+            if key in cached:
+                blocks[block] = cached[key]
+                self.timings[block] = {"ms": 0.0, "source": "cache"}
+            else:
+                missing.append(block)
+
+        # Avec degrade, même un seul bloc manquant passe par le pool pour avoir un délai
+        if missing and parallel and (degrade or len(missing) > 1):
+            started = time.perf_counter()
+            futures = {block: _get_block_pool().submit(_compute_block_in_worker, self, block) for block in missing}
+            for block, future in futures.items():
+                timeout = None
+                if degrade:
+                    limit = config.get("BLOCK_TIMEOUTS", {}).get(block, config.get("BLOCK_TIMEOUT", 5))
+                    timeout = max(0, limit - (time.perf_counter() - started))
+                try:
+                    blocks[block], ms = future.result(timeout=timeout)
+                    self.timings[block] = {"ms": ms, "source": "computed"}
+                except FutureTimeout:
+                    blocks[block] = self._degraded_block(block, "timeout")
+                    incomplete.append(block)
+                    self.timings[block] = {"ms": round(limit * 1000, 1), "source": "timeout"}
+                except Exception as e:
+                    if not degrade:
+                        raise
+                    logger.error(f"Bloc dashboard {block} en échec: {str(e)}")
+                    blocks[block] = self._degraded_block(block, "error")
+                    incomplete.append(block)
+                    self.timings[block] = {"ms": None, "source": "error"}
+        else:
+            for block in missing:
+                try:
+                    blocks[block], ms = self.compute_block(block)
+                    self.timings[block] = {"ms": ms, "source": "computed"}
+                except Exception as e:
+                    if not degrade:
+                        raise
+                    logger.error(f"Bloc dashboard {block} en échec: {str(e)}")
+                    blocks[block] = self._degraded_block(block, "error")
+                    incomplete.append(block)
+                    self.timings[block] = {"ms": None, "source": "error"}
+
+        dashboard = {name: blocks[block] for name, block in self.FULL_DASHBOARD}
+        if incomplete:
+            dashboard["incomplete_blocks"] = incomplete
+        return dashboard
+
+    def server_timing_header(self):
+        """Valeur d'en-tête Server-Timing des derniers blocs assemblés"""
+        return ", ".join(
+            f'{block};desc="{timing["source"]}"' + (f';dur={timing["ms"]}' if timing["ms"] is not None else "")
+            for block, timing in self.timings.items()
+        )
@@ -3,6 +3,18 @@ from .parcelData import ParcelDataService
 from .deepseek import DeepSeekClient, GeminiClient, WorkingAIClient, MistralRAGClient
 from .yield_forecast import YieldForecastService, YieldAnalyticsService
 from .Dashboard import DashboardService
+from .task_statistics import TaskStatisticsService
 from .weather import WeatherDataService, AgriculturalAnalyzer, WeatherAPIClient, WeatherDataCollector
+from .forecast_cache import ForecastCellCache, forecast_cell_cache
+from .http_clients import OutboundClients, http_clients
+from .llm_router import LLMRouter, ProviderError, llm_router
+from .llm_stream import StreamStats, stream_stats
+from .answer_cache import AnswerCache, answer_cache
+from .soil_cache import SoilLookupService, soil_lookup
+from .soil_raster import SoilRasterBackend, soil_raster
+from .climate_store import ClimateStore, climate_store
+from .timeseries import TimeSeriesService
+from .retention import RetentionService
+from .weather_collection import WeatherCollectionEngine, HostRateLimiter, collect_fleet_weather
 from .alerts import AlertService
 from .chatbot import SimpleAIClient, RobustGeminiClient, MistralAgentClient
\ No newline at end of file
@@ -0,0 +1,452 @@
+# SmartSaha/services/alert_rules.py
+"""
+Moteur d'alertes déclaratif et vectorisé.
+
+Les règles (métrique, opérateur, seuil, sévérité, filtre cultures) sont
+évaluées en un seul passage NumPy sur un tableau (parcelle × jour × métrique),
+ce qui permet de générer les alertes de toutes les parcelles d'une
+organisation d'un coup. `evaluate_python` garde l'évaluation ligne à ligne
+(même résultat) comme référence pour les tests et le benchmark.
+"""
+import operator
+import string
+from dataclasses import dataclass
+from datetime import date as date_cls
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ---------------- Métriques ----------------
+FORECAST_METRICS = ('min_temp', 'max_temp', 'avg_temp', 'precip', 'wind', 'humidity', 'rain_chance')
+SOIL_METRICS = ('ph', 'nitrogen')
+
+# ForecastDay (colonnes typées)
+ROW_FIELDS = {
+    'min_temp': 'min_temp_c',
+    'max_temp': 'max_temp_c',
+    'avg_temp': 'avg_temp_c',
+    'precip': 'total_precip_mm',
+    'wind': 'max_wind_kph',
+    'humidity': 'avg_humidity',
+    'rain_chance': 'chance_of_rain',
+}
+# Bloc "day" de WeatherAPI.com
+API_KEYS = {
+    'min_temp': 'mintemp_c',
+    'max_temp': 'maxtemp_c',
+    'avg_temp': 'avgtemp_c',
+    'precip': 'totalprecip_mm',
+    'wind': 'maxwind_kph',
+    'humidity': 'avghumidity',
+    'rain_chance': 'daily_chance_of_rain',
+}
+# Ancien format "daily_forecast"
+LEGACY_KEYS = {
+    'min_temp': ('min_temp',),
+    'max_temp': ('max_temp',),
+    'avg_temp': ('avg_temp',),
+    'precip': ('total_precip', 'precipitation'),
+    'wind': ('wind',),
+    'humidity': ('humidity',),
+    'rain_chance': ('rain_chance',),
+}
+
+NUMPY_OPERATORS = {
+    '<': np.less,
+    '<=': np.less_equal,
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '==': np.equal,
+}
+PYTHON_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+}
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    """
+    Règle d'alerte déclarative.
+    - conditions : ((métrique, opérateur, seuil), ...) combinées par ET
+    - crops : cultures concernées (vide = toutes les parcelles)
+    - group : règles exclusives, la première qui se déclenche l'emporte
+    - horizon : nombre de jours évalués (None = tous)
+    - window : 'sum' pour une règle sur le cumul de l'horizon (une alerte par parcelle)
+    - metrics : champs "metrics" ajoutés à l'alerte ((libellé, métrique), ...)
+    """
+    type: str
+    conditions: Tuple[Tuple[str, str, float], ...]
+    severity: str
+    message: str
+    action: str = ''
+    crops: Tuple[str, ...] = ()
+    group: str = ''
+    horizon: Optional[int] = None
+    window: Optional[str] = None
+    metrics: Tuple[Tuple[str, str], ...] = ()
+
+
+SENSITIVE_CROPS = ('maïs', 'tomate', 'riz', 'vigne', 'arbres fruitiers')
+
+WEATHER_RULES = (
+    AlertRule('❄️ GEL EXTRÊME', (('min_temp', '<', 5),), 'CRITICAL',
+              "Gel sévère prévu ({min_temp}°C) le {date}",
+              'Protection urgente nécessaire - voiles, chauffage', group='frost', horizon=3),
+    AlertRule('❄️ RISQUE GEL', (('min_temp', '<', 10),), 'HIGH',
+              "Risque de gel ({min_temp}°C) le {date}",
+              'Protéger les cultures sensibles avec voile', crops=SENSITIVE_CROPS, group='frost', horizon=3),
+    AlertRule('🔥 CANICULE', (('max_temp', '>', 40),), 'CRITICAL',
+              "Température extrême ({max_temp}°C) le {date}",
+              'Irrigation renforcée, ombrage si possible', group='heat', horizon=3),
+    AlertRule('🌡️ CHALEUR EXTRÊME', (('max_temp', '>', 35),), 'HIGH',
+              "Température élevée ({max_temp}°C) le {date}",
+              'Augmenter irrigation pour éviter stress thermique', group='heat', horizon=3),
+    AlertRule('🌧️ INONDATION', (('precip', '>', 100),), 'CRITICAL',
+              "Pluies très importantes ({precip}mm sur 7 jours) - risque inondation",
+              'Vérifier drainage urgent, préparer pompage', group='rain', horizon=7, window='sum'),
+    AlertRule('🌧️ EXCÈS PLUIE', (('precip', '>', 50),), 'MEDIUM',
+              "Fortes pluies prévues ({precip}mm sur 7 jours)",
+              'Vérifier le drainage des parcelles', group='rain', horizon=7, window='sum'),
+    AlertRule('💧 SÉCHERESSE SÉVÈRE', (('precip', '<', 5),), 'HIGH',
+              "Très faibles précipitations ({precip}mm sur 7 jours)",
+              'Irrigation intensive nécessaire - risque perte de récolte', group='rain', horizon=7, window='sum'),
+    AlertRule('💧 SÉCHERESSE', (('precip', '<', 10),), 'MEDIUM',
+              "Faibles précipitations ({precip}mm sur 7 jours)",
+              'Renforcer irrigation - risque stress hydrique', group='rain', horizon=7, window='sum'),
+)
+
+PEST_RULES = (
+    AlertRule('🦠 RISQUE MILDIU', (('humidity', '>', 80), ('avg_temp', '>=', 15), ('avg_temp', '<=', 25)), 'MEDIUM',
+              "Conditions favorables au mildiou le {date}",
+              'Surveiller cultures, traitement préventif si nécessaire', horizon=5),
+    AlertRule('🍂 RISQUE OÏDIUM', (('humidity', '>', 70), ('avg_temp', '>', 25)), 'MEDIUM',
+              "Conditions favorables à l'oïdium le {date}",
+              'Traiter préventivement avec soufre', horizon=5),
+)
+
+SOIL_RULES = (
+    AlertRule('🧪 pH ACIDE', (('ph', '<', 5.5),), 'MEDIUM',
+              "pH du sol acide ({ph}) pour la plupart des cultures",
+              'Appliquer 1-2 tonnes/ha de chaux agricole'),
+    AlertRule('🌱 CARENCE AZOTE', (('nitrogen', '<', 1.0),), 'HIGH',
+              "Taux d'azote faible ({nitrogen} g/kg)",
+              'Appliquer engrais azoté (urée ou fumier)'),
+)
+
+# Risques jour par jour de AgriculturalAnalyzer (sans action, avec métriques)
+RISK_RULES = (
+    AlertRule('HEAVY_RAIN', (('precip', '>', 20),), 'HIGH',
+              "🌧️ Pluie intense prévue: {precip}mm",
+              metrics=(('precipitation', 'precip'), ('chance_of_rain', 'rain_chance'))),
+    AlertRule('FROST_RISK', (('min_temp', '<', 5),), 'HIGH',
+              "❄️ Risque de gel: {min_temp}°C",
+              metrics=(('min_temperature', 'min_temp'), ('avg_temperature', 'avg_temp'))),
+    AlertRule('DROUGHT_RISK', (('precip', '<=', 0), ('avg_temp', '>', 30)), 'MEDIUM',
+              "🌵 Risque de sécheresse: {avg_temp}°C sans pluie",
+              metrics=(('precipitation', 'precip'), ('temperature', 'avg_temp'))),
+    AlertRule('STRONG_WIND', (('wind', '>', 30),), 'MEDIUM',
+              "💨 Vent fort: {wind} km/h",
+              metrics=(('wind_speed', 'wind'), ('wind_direction', 'wind_dir'))),
+    AlertRule('HIGH_HUMIDITY', (('humidity', '>', 85),), 'MEDIUM',
+              "💧 Humidité élevée: {humidity}%",
+              metrics=(('humidity', 'humidity'), ('condition', 'condition'))),
+)
+
+
+# ---------------- Données d'entrée ----------------
+class RuleFrame:
+    """
+    Tableau (parcelle × jour × métrique) évalué par le moteur.
+    Les valeurs absentes sont NaN ; `valid` marque les jours réellement présents.
+    """
+
+    def __init__(self, keys: Sequence, metrics: Sequence[str], values: np.ndarray, dates: np.ndarray,
+                 valid: np.ndarray, crops: Optional[Sequence[Iterable[str]]] = None,
+                 conditions: Optional[np.ndarray] = None):
+        self.keys = list(keys)
+        self.metrics = tuple(metrics)
+        self.metric_index = {m: i for i, m in enumerate(self.metrics)}
+        self.values = values
+        self.dates = dates
+        self.valid = valid
+        self.crops = [frozenset(c or ()) for c in (crops or [()] * len(self.keys))]
+        self.conditions = conditions
+
+    @classmethod
+    def from_days(cls, entries: Sequence[Tuple], metrics: Sequence[str] = FORECAST_METRICS) -> 'RuleFrame':
+        """
+        entries : [(clé parcelle, [jour, ...], cultures), ...]
+        où chaque jour est un dict {métrique: valeur, 'date': ..., 'condition': ...}
+        """
+        n_parcels = len(entries)
+        n_days = max((len(days) for _, days, _ in entries), default=0)
+        values = np.full((n_parcels, n_days, len(metrics)), np.nan)
+        dates = np.full((n_parcels, n_days), None, dtype=object)
+        conditions = np.full((n_parcels, n_days), '', dtype=object)
+        valid = np.zeros((n_parcels, n_days), dtype=bool)
+
+        for p, (_, days, _) in enumerate(entries):
+            if not days:
+                continue
+            values[p, :len(days)] = np.array(
+                [[day.get(m) for m in metrics] for day in days], dtype=float
+            )
+            dates[p, :len(days)] = [day.get('date') for day in days]
+            conditions[p, :len(days)] = [day.get('condition', '') for day in days]
+            valid[p, :len(days)] = True
+
+        return cls([key for key, _, _ in entries], metrics, values, dates, valid,
+                   crops=[crops for _, _, crops in entries], conditions=conditions)
+
+
+def _iso(value):
+    if isinstance(value, date_cls):
+        return value.isoformat()
+    return value
+
+
+def days_from_rows(rows) -> List[Dict]:
+    """Jours depuis des ForecastDay"""
+    return [
+        {**{m: getattr(row, field) for m, field in ROW_FIELDS.items()},
+         'date': _iso(row.date), 'condition': row.condition}
+        for row in rows
+    ]
+
+
+def days_from_api(data: Dict) -> List[Dict]:
+    """Jours depuis une réponse WeatherAPI (forecast.forecastday)"""
+    days = []
+    for day in (data or {}).get('forecast', {}).get('forecastday', []):
+        day_data = day.get('day', {})
+        days.append({
+            **{m: day_data.get(key) for m, key in API_KEYS.items()},
+            'date': day.get('date'),
+            'condition': (day_data.get('condition') or {}).get('text', ''),
+            'wind_dir': day_data.get('wind_dir', 'N/A'),
+        })
+    return days
+
+
+def days_from_legacy(daily_forecast: Sequence[Dict]) -> List[Dict]:
+    """Jours depuis l'ancien format daily_forecast"""
+    days = []
+    for day in daily_forecast:
+        entry = {'date': day.get('date'), 'condition': day.get('condition', '')}
+        for m, keys in LEGACY_KEYS.items():
+            entry[m] = next((day[k] for k in keys if day.get(k) is not None), None)
+        days.append(entry)
+    return days
+
+
+def soil_metrics(soil_json: Dict) -> Dict:
+    """pH et azote (unités cibles) depuis un JSON SoilGrids"""
+    soil_json = soil_json or {}
+    already_converted = soil_json.get('metadata', {}).get('source') == 'default_values'
+    values = {}
+    for layer in soil_json.get('properties', {}).get('layers', []):
+        name = {'phh2o': 'ph', 'nitrogen': 'nitrogen'}.get(layer.get('name'))
+        if not name:
+            continue
+        mean = next(
+            (d.get('values', {}).get('mean') for d in layer.get('depths', [])
+             if d.get('values', {}).get('mean') is not None),
+            None
+        )
+        if mean is not None and not already_converted:
+            mean = mean / (layer.get('unit_measure', {}).get('d_factor') or 1)
+        values[name] = mean
+    return values
+
+
+# ---------------- Moteur ----------------
+def _display(value):
+    """Valeur lisible pour les messages (entier si possible, sinon 1 décimale)"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 1)
+
+
+class AlertRuleEngine:
+    """Évalue une table de règles sur un RuleFrame"""
+
+    SEVERITY_ORDER = {'CRITICAL': 0, 'HIGH': 1, 'MEDIUM': 2, 'LOW': 3}
+
+    def __init__(self, rules: Sequence[AlertRule]):
+        self.rules = tuple(rules)
+        # Champs réellement utilisés par chaque règle (message + metrics) :
+        # seuls ceux-ci sont extraits du tableau pour les parcelles en alerte
+        self._fields = [
+            tuple(dict.fromkeys(
+                [name for _, name, _, _ in string.Formatter().parse(rule.message) if name and name != 'date']
+                + [key for _, key in rule.metrics]
+            ))
+            for rule in self.rules
+        ]
+
+    # ---------------- Vectorisé ----------------
+    def evaluate(self, frame: RuleFrame, today: Optional[date_cls] = None) -> List[List[Dict]]:
+        """Alertes par parcelle (même ordre que frame.keys), en un seul passage NumPy"""
+        today_iso = (today or date_cls.today()).isoformat()
+        n_parcels, n_days = frame.valid.shape
+        crop_masks = self._crop_masks(frame)
+        has_days = frame.valid.any(axis=1)
+        taken = {}
+        hits = [[] for _ in range(n_parcels)]
+
+        for index, rule in enumerate(self.rules):
+            horizon = min(rule.horizon or n_days, n_days)
+            values = frame.values[:, :horizon, :]
+
+            if rule.window:
+                # Cumul sur l'horizon, jours absents comptés comme 0
+                aggregated = np.nansum(values, axis=1)
+                mask = self._match(aggregated, rule, frame) & has_days & crop_masks[index]
+                mask = self._exclusive(taken, rule, mask)
+                columns = self._columns(frame, index)
+                parcels = np.flatnonzero(mask)
+                for p, row in zip(parcels, aggregated[parcels][:, [i for _, i in columns]].tolist()):
+                    context = {m: _display(v) for (m, _), v in zip(columns, row)}
+                    hits[p].append(((1, 0, index), self._alert(rule, context, today_iso)))
+                continue
+
+            mask = self._match(values, rule, frame) & frame.valid[:, :horizon] & crop_masks[index][:, None]
+            mask = self._exclusive(taken, rule, mask, n_days)
+            columns = self._columns(frame, index)
+            parcels, days = np.nonzero(mask)
+            rows = frame.values[parcels, days][:, [i for _, i in columns]].tolist()
+            extras = [name for name in self._fields[index] if name not in frame.metric_index]
+            for p, d, row in zip(parcels, days, rows):
+                context = {m: _display(v) for (m, _), v in zip(columns, row)}
+                if 'condition' in extras and frame.conditions is not None:
+                    context['condition'] = frame.conditions[p, d]
+                alert_date = _iso(frame.dates[p, d])
+                hits[p].append(((0, d, index), self._alert(rule, context, alert_date)))
+
+        return [[alert for _, alert in sorted(parcel_hits, key=lambda h: h[0])] for parcel_hits in hits]
+
+    def _columns(self, frame: RuleFrame, index: int) -> List[Tuple[str, int]]:
+        return [(m, frame.metric_index[m]) for m in self._fields[index] if m in frame.metric_index]
+
+    def _match(self, values: np.ndarray, rule: AlertRule, frame: RuleFrame) -> np.ndarray:
+        mask = np.ones(values.shape[:-1], dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for metric, op, threshold in rule.conditions:
+                # Les comparaisons avec NaN sont fausses : valeur absente = pas d'alerte
+                mask &= NUMPY_OPERATORS[op](values[..., frame.metric_index[metric]], threshold)
+        return mask
+
+    @staticmethod
+    def _exclusive(taken: Dict, rule: AlertRule, mask: np.ndarray, n_days: int = None) -> np.ndarray:
+        if not rule.group:
+            return mask
+        shape = mask.shape if n_days is None else (mask.shape[0], n_days)
+        group_taken = taken.setdefault((rule.group, rule.window), np.zeros(shape, dtype=bool))
+        view = group_taken if n_days is None else group_taken[:, :mask.shape[1]]
+        mask = mask & ~view
+        view |= mask
+        return mask
+
+    def _crop_masks(self, frame: RuleFrame) -> List[np.ndarray]:
+        """Masque (parcelle,) par règle : parcelle portant au moins une culture visée"""
+        n_parcels = len(frame.keys)
+        vocabulary = sorted({crop for rule in self.rules for crop in rule.crops})
+        position = {crop: i for i, crop in enumerate(vocabulary)}
+        matrix = np.zeros((n_parcels, len(vocabulary)), dtype=bool)
+        for p, crops in enumerate(frame.crops):
+            for crop in crops & position.keys():
+                matrix[p, position[crop]] = True
+
+        everyone = np.ones(n_parcels, dtype=bool)
+        return [
+            matrix[:, [position[c] for c in rule.crops]].any(axis=1) if rule.crops else everyone
+            for rule in self.rules
+        ]
+
+    @staticmethod
+    def _alert(rule: AlertRule, context: Dict, alert_date) -> Dict:
+        context = {**context, 'date': alert_date}
+        alert = {
+            'type': rule.type,
+            'message': rule.message.format(**context),
+            'severity': rule.severity,
+            'date': alert_date,
+        }
+        if rule.action:
+            alert['action'] = rule.action
+        if rule.metrics:
+            alert['metrics'] = {label: context.get(key, 'N/A') for label, key in rule.metrics}
+        return alert
+
+    # ---------------- Référence Python ----------------
+    def evaluate_python(self, entries: Sequence[Tuple], today: Optional[date_cls] = None,
+                        metrics: Sequence[str] = FORECAST_METRICS) -> List[List[Dict]]:
+        """
+        Évaluation parcelle par parcelle et jour par jour (chemin historique).
+        Même résultat que evaluate(), utilisée pour les tests et le benchmark.
+        """
+        today_iso = (today or date_cls.today()).isoformat()
+        results = []
+
+        for _, days, crops in entries:
+            crops = frozenset(crops or ())
+            day_hits, window_hits = [], []
+            if not days:
+                results.append([])
+                continue
+
+            for d, day in enumerate(days):
+                taken = set()
+                for index, rule in enumerate(self.rules):
+                    if rule.window or d >= (rule.horizon or len(days)):
+                        continue
+                    if rule.crops and not crops.intersection(rule.crops):
+                        continue
+                    if rule.group and rule.group in taken:
+                        continue
+                    if all(self._python_match(day.get(m), op, t) for m, op, t in rule.conditions):
+                        if rule.group:
+                            taken.add(rule.group)
+                        context = {m: _display(day.get(m)) for m in metrics}
+                        context['date'] = _iso(day.get('date'))
+                        context['condition'] = day.get('condition', '')
+                        day_hits.append(self._alert(rule, context, context['date']))
+
+            taken = set()
+            for rule in self.rules:
+                if not rule.window:
+                    continue
+                if rule.crops and not crops.intersection(rule.crops):
+                    continue
+                if rule.group and rule.group in taken:
+                    continue
+                window_days = days[:rule.horizon or len(days)]
+                totals = {m: 0 for m in metrics}
+                for day in window_days:
+                    for m in metrics:
+                        if day.get(m) is not None:
+                            totals[m] += day[m]
+                if all(self._python_match(totals[m], op, t) for m, op, t in rule.conditions):
+                    if rule.group:
+                        taken.add(rule.group)
+                    context = {m: _display(v) for m, v in totals.items()}
+                    window_hits.append(self._alert(rule, context, today_iso))
+
+            results.append(day_hits + window_hits)
+
+        return results
+
+    @staticmethod
+    def _python_match(value, op, threshold) -> bool:
+        return value is not None and PYTHON_OPERATORS[op](value, threshold)
+
+
+weather_rule_engine = AlertRuleEngine(WEATHER_RULES)
+pest_rule_engine = AlertRuleEngine(PEST_RULES)
+soil_rule_engine = AlertRuleEngine(SOIL_RULES)
+risk_rule_engine = AlertRuleEngine(RISK_RULES)
@@ -1,213 +1,96 @@
 # services/alert_service.py
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
-from SmartSaha.models import WeatherData
+from SmartSaha.models import WeatherData, SoilData, Parcel
+from SmartSaha.services.alert_rules import (
+    RuleFrame, SOIL_METRICS, days_from_rows, days_from_api, days_from_legacy, soil_metrics,
+    weather_rule_engine, pest_rule_engine, soil_rule_engine
+)
 
 class AlertService:
-    @staticmethod
-    def generate_weather_alerts(parcel, weather_data):
-        """Génère des alertes météo basées sur les cultures"""
-        alerts = []
+    DASHBOARD_STATS_CACHE_TIMEOUT = getattr(settings, 'ALERT_STATS_CACHE_TIMEOUT', 30)
 
-        # Récupérer les cultures de la parcelle (adaptation à votre modèle)
-        current_crops = []
-        try:
-            if hasattr(parcel, 'parcel_crops') and hasattr(parcel.parcel_crops, 'all'):
-                current_crops = [pc.crop.name.lower() for pc in parcel.parcel_crops.all()]
-            elif hasattr(parcel, 'crops') and hasattr(parcel.crops, 'all'):
-                current_crops = [crop.name.lower() for crop in parcel.crops.all()]
-        except Exception as e:
-            print(f"Erreur récupération cultures: {e}")
-            current_crops = []
-
-        # Conversion de l'objet WeatherData en dict si nécessaire
-        if hasattr(weather_data, '__dict__'):
-            weather_dict = weather_data.__dict__
-        elif hasattr(weather_data, 'get'):
-            weather_dict = weather_data
-        else:
-            weather_dict = {}
-
-        # Accès sécurisé aux données météo
-        daily_forecast = []
-        try:
-            # Essayer différents formats de données
-            if hasattr(weather_data, 'daily_forecast'):
-                daily_forecast = weather_data.daily_forecast
-            elif 'daily_forecast' in weather_dict:
-                daily_forecast = weather_dict['daily_forecast']
-            elif hasattr(weather_data, 'forecast'):
-                daily_forecast = weather_data.forecast
-        except Exception as e:
-            print(f"Erreur accès forecast: {e}")
-
-        # Alertes température - avec gestion d'erreur
-        for day in daily_forecast[:3]:  # 3 prochains jours
-            try:
-                # Accès sécurisé aux données du jour
-                if hasattr(day, '__dict__'):
-                    day_dict = day.__dict__
-                else:
-                    day_dict = day
-
-                # Récupération des températures avec valeurs par défaut
-                min_temp = getattr(day, 'min_temp', None) or day_dict.get('min_temp', 0)
-                max_temp = getattr(day, 'max_temp', None) or day_dict.get('max_temp', 0)
-                date_str = getattr(day, 'date', None) or day_dict.get('date', datetime.now().date().isoformat())
-
-                # Alerte gel
-                if min_temp < 5:  # Seuil gel critique
-                    alerts.append({
-                        'type': '❄️ GEL EXTRÊME',
-                        'message': f"Gel sévère prévu ({min_temp}°C) le {date_str}",
-                        'severity': 'CRITICAL',
-                        'action': 'Protection urgente nécessaire - voiles, chauffage',
-                        'date': date_str
-                    })
-                elif min_temp < 10 and any(
-                        crop in current_crops for crop in ['maïs', 'tomate', 'riz', 'vigne', 'arbres fruitiers']):
-                    alerts.append({
-                        'type': '❄️ RISQUE GEL',
-                        'message': f"Risque de gel ({min_temp}°C) le {date_str}",
-                        'severity': 'HIGH',
-                        'action': 'Protéger les cultures sensibles avec voile',
-                        'date': date_str
-                    })
-
-                # Alerte canicule
-                if max_temp > 40:
-                    alerts.append({
-                        'type': '🔥 CANICULE',
-                        'message': f"Température extrême ({max_temp}°C) le {date_str}",
-                        'severity': 'CRITICAL',
-                        'action': 'Irrigation renforcée, ombrage si possible',
-                        'date': date_str
-                    })
-                elif max_temp > 35:
-                    alerts.append({
-                        'type': '🌡️ CHALEUR EXTRÊME',
-                        'message': f"Température élevée ({max_temp}°C) le {date_str}",
-                        'severity': 'HIGH',
-                        'action': 'Augmenter irrigation pour éviter stress thermique',
-                        'date': date_str
-                    })
-
-            except Exception as e:
-                print(f"Erreur traitement jour météo: {e}")
-                continue
-
-        # Alertes pluie - avec gestion d'erreur
-        try:
-            total_rain_7d = 0
-            for day in daily_forecast[:7]:
-                if hasattr(day, '__dict__'):
-                    day_dict = day.__dict__
-                else:
-                    day_dict = day
-
-                precip = getattr(day, 'total_precip', None) or day_dict.get('total_precip', 0) or day_dict.get(
-                    'precipitation', 0)
-                total_rain_7d += precip
-
-            if total_rain_7d > 100:
-                alerts.append({
-                    'type': '🌧️ INONDATION',
-                    'message': f"Pluies très importantes ({total_rain_7d}mm sur 7 jours) - risque inondation",
-                    'severity': 'CRITICAL',
-                    'action': 'Vérifier drainage urgent, préparer pompage',
-                    'date': datetime.now().date().isoformat()
-                })
-            elif total_rain_7d > 50:
-                alerts.append({
-                    'type': '🌧️ EXCÈS PLUIE',
-                    'message': f"Fortes pluies prévues ({total_rain_7d}mm sur 7 jours)",
-                    'severity': 'MEDIUM',
-                    'action': 'Vérifier le drainage des parcelles',
-                    'date': datetime.now().date().isoformat()
-                })
-            elif total_rain_7d < 5:
-                alerts.append({
-                    'type': '💧 SÉCHERESSE SÉVÈRE',
-                    'message': f"Très faibles précipitations ({total_rain_7d}mm sur 7 jours)",
-                    'severity': 'HIGH',
-                    'action': 'Irrigation intensive nécessaire - risque perte de récolte',
-                    'date': datetime.now().date().isoformat()
-                })
-            elif total_rain_7d < 10:
-                alerts.append({
-                    'type': '💧 SÉCHERESSE',
-                    'message': f"Faibles précipitations ({total_rain_7d}mm sur 7 jours)",
-                    'severity': 'MEDIUM',
-                    'action': 'Renforcer irrigation - risque stress hydrique',
-                    'date': datetime.now().date().isoformat()
-                })
+    @staticmethod
+    def dashboard_stats_cache_key(user_id):
+        return f"alerts_dashboard_stats_{user_id}"
 
-        except Exception as e:
-            print(f"Erreur calcul pluie: {e}")
+    @staticmethod
+    def invalidate_dashboard_stats(user_id):
+        """À appeler après toute écriture d'alertes de l'utilisateur"""
+        cache.delete(AlertService.dashboard_stats_cache_key(user_id))
 
-        return alerts
+    @staticmethod
+    def parcel_crop_names(parcel):
+        """Noms (minuscules) des cultures de la parcelle"""
+        return [pc.crop.name.lower() for pc in parcel.parcel_crops.all()]
 
     @staticmethod
-    def generate_soil_alerts(parcel, soil_data):
-        """Alertes basées sur l'analyse du sol"""
-        alerts = []
+    def forecast_days(weather_data):
+        """
+        Jours de prévision normalisés pour le moteur de règles, quelle que soit la
+        forme reçue : WeatherData, analyse de get_weather_analysis, JSON WeatherAPI
+        ou ancien format daily_forecast.
+        """
+        if isinstance(weather_data, WeatherData):
+            return days_from_rows(weather_data.forecast_rows)
+        if not isinstance(weather_data, dict):
+            return []
+        if 'weather_data' in weather_data:
+            return AlertService.forecast_days(weather_data['weather_data'])
+        if 'forecast' in weather_data:
+            return days_from_api(weather_data)
+        return days_from_legacy(weather_data.get('daily_forecast', []))
 
-        try:
-            # Conversion en dict si nécessaire
-            if hasattr(soil_data, '__dict__'):
-                soil_dict = soil_data.__dict__
-            else:
-                soil_dict = soil_data
-
-            # pH analysis - avec accès sécurisé
-            ph = None
-            if hasattr(soil_data, 'phh2o'):
-                if hasattr(soil_data.phh2o, 'mean'):
-                    ph = soil_data.phh2o.mean
-                elif hasattr(soil_data.phh2o, 'get'):
-                    ph = soil_data.phh2o.get('mean')
-            elif 'phh2o' in soil_dict:
-                ph_data = soil_dict['phh2o']
-                if hasattr(ph_data, 'mean'):
-                    ph = ph_data.mean
-                elif isinstance(ph_data, dict):
-                    ph = ph_data.get('mean')
-
-            if ph and ph < 5.5:
-                alerts.append({
-                    'type': '🧪 pH ACIDE',
-                    'message': f"pH du sol acide ({ph}) pour la plupart des cultures",
-                    'severity': 'MEDIUM',
-                    'action': 'Appliquer 1-2 tonnes/ha de chaux agricole',
-                    'date': datetime.now().date().isoformat()
-                })
+    @staticmethod
+    def generate_weather_alerts(parcel, weather_data):
+        """Génère des alertes météo basées sur les cultures (table WEATHER_RULES)"""
+        entries = [(parcel.pk, AlertService.forecast_days(weather_data), AlertService.parcel_crop_names(parcel))]
+        return weather_rule_engine.evaluate(RuleFrame.from_days(entries))[0]
 
-            # Nitrogen analysis
-            nitrogen = None
-            if hasattr(soil_data, 'nitrogen'):
-                if hasattr(soil_data.nitrogen, 'mean'):
-                    nitrogen = soil_data.nitrogen.mean
-            elif 'nitrogen' in soil_dict:
-                nitro_data = soil_dict['nitrogen']
-                if hasattr(nitro_data, 'mean'):
-                    nitrogen = nitro_data.mean
-                elif isinstance(nitro_data, dict):
-                    nitrogen = nitro_data.get('mean')
-
-            if nitrogen and nitrogen < 1.0:
-                alerts.append({
-                    'type': '🌱 CARENCE AZOTE',
-                    'message': f"Taux d'azote faible ({nitrogen} g/kg)",
-                    'severity': 'HIGH',
-                    'action': 'Appliquer engrais azoté (urée ou fumier)',
-                    'date': datetime.now().date().isoformat()
-                })
+    @staticmethod
+    def generate_soil_alerts(parcel, soil_data):
+        """Alertes basées sur l'analyse du sol (table SOIL_RULES)"""
+        soil_json = soil_data.data if isinstance(soil_data, SoilData) else soil_data
+        metrics = soil_metrics(soil_json if isinstance(soil_json, dict) else {})
+        if not metrics:
+            return []
 
-        except Exception as e:
-            print(f"Erreur analyse sol: {e}")
+        today = timezone.now().date()
+        entries = [(parcel.pk, [{**metrics, 'date': today.isoformat()}], ())]
+        return soil_rule_engine.evaluate(RuleFrame.from_days(entries, metrics=SOIL_METRICS), today=today)[0]
 
-        return alerts
+    @staticmethod
+    def generate_bulk_weather_alerts(parcels):
+        """
+        Alertes météo + maladies pour un ensemble de parcelles (ex: une organisation)
+        en un seul passage vectorisé sur leurs dernières prévisions.
+        Retourne {uuid parcelle: [alertes]}.
+        """
+        from SmartSaha.models import ForecastDay
+
+        parcels = list(parcels.prefetch_related('parcel_crops__crop'))
+        latest_ids = WeatherData.objects.filter(parcel__in=parcels).latest_per_parcel().values('id')
+
+        rows_by_parcel = {}
+        for row in ForecastDay.objects.filter(weather_data_id__in=latest_ids).order_by('parcel_id', 'date'):
+            rows_by_parcel.setdefault(row.parcel_id, []).append(row)
+
+        entries = [
+            (parcel.pk, days_from_rows(rows_by_parcel.get(parcel.pk, [])), AlertService.parcel_crop_names(parcel))
+            for parcel in parcels
+        ]
+        frame = RuleFrame.from_days(entries)
+        weather_alerts = weather_rule_engine.evaluate(frame)
+        pest_alerts = pest_rule_engine.evaluate(frame)
+
+        return {
+            str(parcel.uuid): weather_alerts[i] + pest_alerts[i]
+            for i, parcel in enumerate(parcels)
+        }
 
     @staticmethod
     def generate_task_alerts(parcel):
@@ -294,34 +177,9 @@ class AlertService:
 
     @staticmethod
     def generate_pest_disease_alerts(parcel, weather_data):
-        """Alertes maladies et ravageurs basées sur les conditions météo"""
-        alerts = []
-
-        # Conditions favorables mildiou (humidité + température)
-        for day in weather_data.get('daily_forecast', [])[:5]:
-            humidity = day.get('humidity', 0)
-            temp = day.get('avg_temp', 0)
-
-            if humidity > 80 and 15 <= temp <= 25:
-                alerts.append({
-                    'type': '🦠 RISQUE MILDIU',
-                    'message': f"Conditions favorables au mildiou le {day['date']}",
-                    'severity': 'MEDIUM',
-                    'action': 'Surveiller cultures, traitement préventif si nécessaire',
-                    'date': day['date']
-                })
-
-            # Conditions favorables oïdium
-            if humidity > 70 and temp > 25:
-                alerts.append({
-                    'type': '🍂 RISQUE OÏDIUM',
-                    'message': f"Conditions favorables à l'oïdium le {day['date']}",
-                    'severity': 'MEDIUM',
-                    'action': 'Traiter préventivement avec soufre',
-                    'date': day['date']
-                })
-
-        return alerts
+        """Alertes maladies et ravageurs basées sur les conditions météo (table PEST_RULES)"""
+        entries = [(parcel.pk, AlertService.forecast_days(weather_data), AlertService.parcel_crop_names(parcel))]
+        return pest_rule_engine.evaluate(RuleFrame.from_days(entries))[0]
 
 
     @staticmethod
@@ -386,6 +244,57 @@ class AlertService:
         return all_alerts
 
 
+    @staticmethod
+    def bulk_save_alerts(parcel, alerts):
+        """
+        Enregistre les alertes générées sans doublon (parcelle, type, sévérité, date).
+        Une requête pour lire les clés existantes + un bulk_create, au lieu d'un
+        get_or_create par alerte. Retourne {'created': n, 'skipped': m}.
+        Lecture et insertion se font sous verrou de la parcelle : deux générations
+        concurrentes sont sérialisées et les compteurs restent exacts.
+        """
+        from SmartSaha.models import Alert
+
+        candidates = {}
+        for alert_data in alerts:
+            alert_date = alert_data['date']
+            if isinstance(alert_date, str):
+                alert_date = date.fromisoformat(alert_date[:10])
+            key = (alert_data['type'], alert_data['severity'], alert_date)
+            candidates.setdefault(key, alert_data)
+
+        if not candidates:
+            return {'created': 0, 'skipped': len(alerts)}
+
+        with transaction.atomic():
+            list(Parcel.objects.select_for_update().filter(pk=parcel.pk).values_list('pk', flat=True))
+            existing = set(
+                Alert.objects.filter(
+                    parcel=parcel,
+                    alert_date__in={alert_date for _, _, alert_date in candidates}
+                ).values_list('type', 'severity', 'alert_date')
+            )
+
+            new_alerts = [
+                Alert(
+                    parcel=parcel,
+                    type=alert_type,
+                    severity=severity,
+                    alert_date=alert_date,
+                    message=alert_data['message'],
+                    action=alert_data.get('action', ''),
+                    is_read=False
+                )
+                for (alert_type, severity, alert_date), alert_data in candidates.items()
+                if (alert_type, severity, alert_date) not in existing
+            ]
+            # ignore_conflicts : écritures hors de ce chemin (sans verrou), contrainte unique
+            Alert.objects.bulk_create(new_alerts, ignore_conflicts=True)
+        if new_alerts:
+            AlertService.invalidate_dashboard_stats(parcel.owner_id)
+
+        return {'created': len(new_alerts), 'skipped': len(alerts) - len(new_alerts)}
+
     @staticmethod
     def get_alert_statistics(alerts):
         """Retourne des statistiques sur les alertes"""
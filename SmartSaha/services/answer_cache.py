@@ -0,0 +1,215 @@
+# SmartSaha/services/answer_cache.py
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from SmartSaha.services.parcel_version import parcel_data_version
+
+DEFAULT_CONFIG = {
+    "ENABLED": True,
+    "TIMEOUT": 60 * 60 * 24 * 7,   # durée de vie d'une réponse
+    "SEMANTIC": False,             # niveau approché (questions reformulées), sur activation
+    "THRESHOLD": 0.95,             # similarité cosinus minimale
+    "MAX_ENTRIES": 2000,           # niveau approché : entrées gardées par processus (LRU)
+    "DIMENSIONS": 4096,
+}
+# Mots vides ignorés par le niveau approché ("quand planter le riz" == "quand planter du riz").
+# Les négations (ne, n, pas, sans, jamais, plus, aucun...) sont gardées : elles inversent la question.
+STOP_WORDS = frozenset(
+    "a au aux avec ce ces c d dans de des doit dois du elle en est et faut il ils j je l la le les leur "
+    "ma mais me mes mon nos notre nous on ou par peut pour qu que qui s sa se ses son sur "
+    "t ta te tes ton tu un une vos votre vous y".split()
+)
+
+
+def normalize_question(question: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces réduits"""
+    text = unicodedata.normalize("NFKD", (question or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def numbers(normalized: str) -> Tuple[str, ...]:
+    """Mots contenant un chiffre (surfaces, doses, dates), dans l'ordre de la question"""
+    return tuple(word for word in normalized.split() if any(c.isdigit() for c in word))
+
+
+def embed(normalized: str, dimensions: int) -> Optional[np.ndarray]:
+    """
+    Vecteur local (sans modèle externe) : mots pleins et trigrammes de
+    caractères hachés, normalisé L2. None si la question n'a aucun mot plein.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in normalized.split():
+        if word in STOP_WORDS:
+            continue
+        vector[zlib.crc32(f"w:{word}".encode()) % dimensions] += 2.0
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode()) % dimensions] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class AnswerCache:
+    """
+    Cache des réponses de l'assistant, par question normalisée et empreinte de
+    contexte (fournisseur/modèle, parcelle et version de ses données, modules).
+
+    - Niveau exact : cache Django partagé entre workers, TTL TIMEOUT.
+    - Niveau approché (SEMANTIC) : vecteurs locaux comparés par cosinus aux
+      questions déjà répondues pour la même empreinte (recherche exhaustive,
+      suffisante pour MAX_ENTRIES), au-dessus de THRESHOLD, et mêmes nombres
+      (« 2 hectares » ne sert jamais « 8 hectares ») ; en mémoire du
+      processus, éviction LRU. Désactivé par défaut.
+    Une donnée de parcelle modifiée change l'empreinte : les anciennes
+    réponses ne sont plus servies et expirent d'elles-mêmes.
+    """
+    KEY_PREFIX = "answer_cache"
+    STATS_KEYS = ("exact_hits", "semantic_hits", "misses")
+
+    def __init__(self, config: Optional[Dict] = None):
+        self._config = config
+        self._entries = OrderedDict()  # (empreinte, question normalisée) -> (vecteur, nombres, réponse, expiration)
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> Dict:
+        return {**DEFAULT_CONFIG, **getattr(settings, 'ANSWER_CACHE', {}), **(self._config or {})}
+
+    @staticmethod
+    def fingerprint(provider: str, parcel_uuid=None, user_modules: Optional[Dict] = None) -> str:
+        modules = sorted(name for name, enabled in (user_modules or {}).items() if enabled)
+        parts = [provider]
+        if parcel_uuid:
+            parts += [str(parcel_uuid), str(parcel_data_version(parcel_uuid))]
+        return json.dumps(parts + modules)
+
+    def _key(self, fingerprint: str, normalized: str) -> str:
+        digest = hashlib.sha1(f"{fingerprint}\n{normalized}".encode()).hexdigest()
+        return f"{self.KEY_PREFIX}:{digest}"
+
+    # ---------------- Lecture / écriture ----------------
+    def get(self, question: str, fingerprint: str) -> Tuple[Optional[str], Optional[str]]:
+        """(réponse, niveau "exact" | "semantic") ou (None, None)"""
+        config = self.config
+        if not config["ENABLED"]:
+            return None, None
+        normalized = normalize_question(question)
+
+        answer = cache.get(self._key(fingerprint, normalized))
+        if answer is not None:
+            self._incr("exact_hits")
+            self._remember(fingerprint, normalized, answer, config)
+            return answer, "exact"
+
+        if config["SEMANTIC"]:
+            answer = self._nearest(fingerprint, normalized, config)
+            if answer is not None:
+                self._incr("semantic_hits")
+                return answer, "semantic"
+
+        self._incr("misses")
+        return None, None
+
+    def set(self, question: str, fingerprint: str, answer: str):
+        config = self.config
+        if not config["ENABLED"] or not answer:
+            return
+        normalized = normalize_question(question)
+        cache.set(self._key(fingerprint, normalized), answer, timeout=config["TIMEOUT"])
+        self._remember(fingerprint, normalized, answer, config)
+
+    def cached_stream(self, question: str, fingerprint: str, chunks: Iterator[str]) -> Iterator[str]:
+        """Relaye un flux et met la réponse en cache s'il se termine normalement"""
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            self.set(question, fingerprint, "".join(parts))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    # ---------------- Niveau approché ----------------
+    def _remember(self, fingerprint: str, normalized: str, answer: str, config: Dict):
+        if not config["SEMANTIC"]:
+            return
+        vector = embed(normalized, config["DIMENSIONS"])
+        if vector is None:
+            return
+        with self._lock:
+            self._entries[(fingerprint, normalized)] = (
+                vector, numbers(normalized), answer, time.monotonic() + config["TIMEOUT"]
+            )
+            self._entries.move_to_end((fingerprint, normalized))
+            while len(self._entries) > config["MAX_ENTRIES"]:
+                self._entries.popitem(last=False)
+
+    def _nearest(self, fingerprint: str, normalized: str, config: Dict) -> Optional[str]:
+        vector = embed(normalized, config["DIMENSIONS"])
+        if vector is None:
+            return None
+        wanted = numbers(normalized)
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for key, (other, values, answer, expires) in list(self._entries.items()):
+                if expires <= now:
+                    del self._entries[key]
+                elif key[0] == fingerprint and values == wanted:
+                    candidates.append((key, other, answer))
+            if not candidates:
+                return None
+            scores = np.stack([other for _, other, _ in candidates]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < config["THRESHOLD"]:
+                return None
+            key, _, answer = candidates[best]
+            self._entries.move_to_end(key)
+            return answer
+
+    # ---------------- Statistiques ----------------
+    def _incr(self, name: str):
+        key = f"{self.KEY_PREFIX}:stats:{name}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    def stats(self) -> Dict:
+        """Compteurs cumulés : succès par niveau, échecs, appels fournisseur économisés"""
+        values = cache.get_many([f"{self.KEY_PREFIX}:stats:{name}" for name in self.STATS_KEYS])
+        exact, semantic, misses = (values.get(f"{self.KEY_PREFIX}:stats:{name}", 0) for name in self.STATS_KEYS)
+        total = exact + semantic + misses
+        return {
+            'exact_hits': exact,
+            'semantic_hits': semantic,
+            'misses': misses,
+            'hit_rate': round((exact + semantic) / total, 3) if total else None,
+            'provider_calls_saved': exact + semantic,
+            'semantic_entries': len(self._entries),
+        }
+
+    def reset_stats(self):
+        cache.delete_many([f"{self.KEY_PREFIX}:stats:{name}" for name in self.STATS_KEYS])
+
+    def clear_local(self):
+        with self._lock:
+            self._entries.clear()
+
+
+answer_cache = AnswerCache()
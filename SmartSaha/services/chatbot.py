@@ -1,9 +1,16 @@
 # SmartSaha/services/simple_ai_client.py
 import os
-import httpx
 from django.conf import settings
 from mistralai import Mistral
 
+from SmartSaha.services.deepseek import (
+    MISTRAL_URL, OPENROUTER_URL, mistral_stream, openrouter_complete, openrouter_stream
+)
+from SmartSaha.services.answer_cache import answer_cache
+from SmartSaha.services.http_clients import http_clients
+from SmartSaha.services.llm_router import llm_router
+from SmartSaha.services.llm_stream import iter_sse_json
+
 BASE_PROMPT = """
 Tu es un ingenieur agronome expert à Madagascar.
 Reponds toujours de maniere précise, pratique, court et adaptee aux conditions locales :
@@ -14,12 +21,14 @@ Reponds toujours de maniere précise, pratique, court et adaptee aux conditions
 
 
 class SimpleAIClient:
+    EXTRA_HEADERS = {"HTTP-Referer": "https://localhost", "X-Title": "SmartSaha"}
+
     def __init__(self):
         self.api_key = getattr(settings, "OPENROUTER_API_KEY", None) or os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY manquant")
 
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = OPENROUTER_URL
         self.models = [
             "deepseek/deepseek-chat:free",
             "huggingfaceh4/zephyr-7b-beta:free",
@@ -28,45 +37,45 @@ class SimpleAIClient:
 
     def ask(self, question: str):
         """Version ultra-simplifiée - utilise seulement la question de l'utilisateur"""
+        fingerprint = answer_cache.fingerprint("openrouter-simple")
+        cached, _ = answer_cache.get(question, fingerprint)
+        if cached is not None:
+            return cached
+
         full_prompt = f"{BASE_PROMPT}\n\nQuestion: {question}\nRéponse:"
 
-        for model in self.models:
-            try:
-                print(f"🔄 Essai avec: {model}")
-
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://localhost",
-                    "X-Title": "SmartSaha"
-                }
-                payload = {
-                    "model": model,
-                    "messages": [{"role": "user", "content": full_prompt}],
-                    "max_tokens": 1000
-                }
-
-                with httpx.Client(timeout=30.0) as client:
-                    response = client.post(
-                        f"{self.base_url}/chat/completions",
-                        json=payload,
-                        headers=headers
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        print(f"✅ Succès avec {model}")
-                        return data["choices"][0]["message"]["content"]
-                    else:
-                        print(f"❌ {model} échoué: {response.status_code}")
-                        continue
-
-            except Exception as e:
-                print(f"❌ Erreur avec {model}: {e}")
-                continue
+        messages = [{"role": "user", "content": full_prompt}]
+
+        # Modèles en course (requêtes couvertes), modèles en échec récent écartés
+        answer, model = llm_router.route(
+            self.models,
+            lambda candidate, timeout: openrouter_complete(
+                candidate, messages, self.api_key, self.EXTRA_HEADERS, timeout=timeout, max_tokens=1000
+            ),
+            timeout=30.0
+        )
+        if answer is not None:
+            print(f"✅ Succès avec {model}")
+            answer_cache.set(question, fingerprint, answer)
+            return answer
 
         return "Désolé, le service est temporairement indisponible. Réessaie dans quelques minutes."
 
+    def stream_ask(self, question: str):
+        """Version en flux : premier modèle disponible qui répond, morceaux relayés au fil de l'eau"""
+        fingerprint = answer_cache.fingerprint("openrouter-simple")
+        cached, _ = answer_cache.get(question, fingerprint)
+        if cached is not None:
+            return iter([cached])
+        messages = [{"role": "user", "content": f"{BASE_PROMPT}\n\nQuestion: {question}\nRéponse:"}]
+        chunks = llm_router.stream(
+            self.models,
+            lambda candidate: openrouter_stream(
+                candidate, messages, self.api_key, self.EXTRA_HEADERS, timeout=30.0, max_tokens=1000
+            )
+        )
+        return answer_cache.cached_stream(question, fingerprint, chunks)
+
 
 # SmartSaha/services/robust_gemini_client.py
 from google import genai
@@ -91,9 +100,15 @@ class RobustGeminiClient:
         # 🎯 UNIQUEMENT le modèle de votre URL
         self.model = "gemini-2.0-flash"
         self.base_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
+        self.stream_url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:streamGenerateContent"
 
     def ask(self, question: str):
         """Utilise uniquement le modèle gemini-2.0-flash"""
+        fingerprint = answer_cache.fingerprint(f"gemini:{self.model}")
+        cached, _ = answer_cache.get(question, fingerprint)
+        if cached is not None:
+            return cached
+
         full_prompt = f"{BASE_PROMPT}\n\nQuestion: {question}\nRéponse:"
 
         try:
@@ -117,7 +132,7 @@ class RobustGeminiClient:
             }
 
             # Appel API - ICI on utilise requests qui est maintenant importé
-            response = requests.post(
+            response = http_clients.post(
                 url,
                 json=payload,
                 headers=headers,
@@ -132,6 +147,7 @@ class RobustGeminiClient:
                 # Extraction du texte de réponse
                 if "candidates" in result and len(result["candidates"]) > 0:
                     text = result["candidates"][0]["content"]["parts"][0]["text"]
+                    answer_cache.set(question, fingerprint, text)
                     return text
                 else:
                     return "Erreur: Aucune réponse générée par le modèle"
@@ -151,6 +167,32 @@ class RobustGeminiClient:
             return f"Erreur: {error_msg}"
 
 
+    def stream_ask(self, question: str):
+        """Version en flux (streamGenerateContent, SSE), réponse en cache servie d'un bloc"""
+        fingerprint = answer_cache.fingerprint(f"gemini:{self.model}")
+        cached, _ = answer_cache.get(question, fingerprint)
+        if cached is not None:
+            return iter([cached])
+        return answer_cache.cached_stream(question, fingerprint, self._stream(question))
+
+    def _stream(self, question: str):
+        payload = {"contents": [{"parts": [{"text": f"{BASE_PROMPT}\n\nQuestion: {question}\nRéponse:"}]}]}
+        with http_clients.post(
+            f"{self.stream_url}?alt=sse&key={self.api_key}",
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=30,
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Erreur API Gemini: Status {response.status_code}")
+            for event in iter_sse_json(response.iter_lines(decode_unicode=True)):
+                for candidate in event.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+
+
 # ✅ Utilisation simple
 try:
     gemini_client = RobustGeminiClient()
@@ -168,10 +210,27 @@ class MistralAgentClient:
 
         try:
             from mistralai import Mistral
+            # Client httpx partagé : pas de nouvelle connexion TLS par question
+            self.client = Mistral(api_key=self.api_key, client=http_clients.httpx_client(MISTRAL_URL))
             self.mistral_available = True
         except ImportError:
             self.mistral_available = False
 
+    MODEL = "mistral-small-latest"  # Modèle gratuit et efficace
+
+    @staticmethod
+    def _messages(question: str):
+        return [
+            {
+                "role": "system",
+                "content": "Expert agronome malgache. Réponses courtes, précises, adaptées aux saisons et sols locaux. Pas de généralités."
+            },
+            {
+                "role": "user",
+                "content": question
+            }
+        ]
+
     def ask(self, question: str):
         """Client agronome avec modèle officiel"""
         if not self.mistral_available:
@@ -180,23 +239,13 @@ class MistralAgentClient:
         try:
             print(f"🔄 Mistral - Question: {question[:50]}...")
 
-            with  Mistral(api_key=self.api_key) as client:
-                response = client.chat.complete(
-                    model="mistral-small-latest",  # Modèle gratuit et efficace
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Expert agronome malgache. Réponses courtes, précises, adaptées aux saisons et sols locaux. Pas de généralités."
-                        },
-                        {
-                            "role": "user",
-                            "content": question
-                        }
-                    ],
-                    max_tokens=500,  # Réponses courtes
-                    temperature=0.3,  # Réponses précises
-                    stream=False
-                )
+            response = self.client.chat.complete(
+                model=self.MODEL,
+                messages=self._messages(question),
+                max_tokens=500,  # Réponses courtes
+                temperature=0.3,  # Réponses précises
+                stream=False
+            )
 
             answer = response.choices[0].message.content
             print(f"✅ Réponse reçue: {answer[:50]}...")
@@ -204,4 +253,12 @@ class MistralAgentClient:
 
         except Exception as e:
             print(f"❌ Erreur Mistral: {e}")
-            return f"Erreur service: {str(e)}"
\ No newline at end of file
+            return f"Erreur service: {str(e)}"
+
+    def stream_ask(self, question: str):
+        """Version en flux : morceaux de texte au fil de l'eau"""
+        if not self.mistral_available:
+            return iter(["Erreur: pip install mistralai"])
+        return mistral_stream(
+            self.client, model=self.MODEL, messages=self._messages(question), max_tokens=500, temperature=0.3
+        )
@@ -1,17 +1,26 @@
 # SmartSaha/services/climate_service.py
-import requests
+from SmartSaha.services.http_clients import http_clients
 
 NASA_API_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+NASA_PARAMETERS = "T2M,T2MDEW,T2MWET,TS,T2M_RANGE,T2M_MAX,T2M_MIN,PRECTOTCORR,EVLAND,GWETPROF"
 
 
-def get_climate_data(longitude, latitude, start, end):
+def fetch_power_daily(latitude, longitude, start, end):
+    """Appel brut NASA POWER (start/end : date ou YYYYMMDD)"""
+    start = start.strftime("%Y%m%d") if hasattr(start, "strftime") else start
+    end = end.strftime("%Y%m%d") if hasattr(end, "strftime") else end
     url = (
-        f"{NASA_API_URL}?parameters="
-        "T2M,T2MDEW,T2MWET,TS,T2M_RANGE,T2M_MAX,T2M_MIN,"
-        "PRECTOTCORR,EVLAND,GWETPROF"
+        f"{NASA_API_URL}?parameters={NASA_PARAMETERS}"
         f"&community=RE&longitude={longitude}&latitude={latitude}"
         f"&start={start}&end={end}&format=JSON"
     )
-    response = requests.get(url, timeout=20)
+    response = http_clients.get(url)
     response.raise_for_status()
     return response.json()
+
+
+def get_climate_data(longitude, latitude, start, end):
+    """Série journalière servie par le stockage local, complété au besoin"""
+    from SmartSaha.services.climate_store import climate_store
+
+    return climate_store.payload(float(latitude), float(longitude), start, end)
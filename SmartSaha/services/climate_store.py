@@ -0,0 +1,251 @@
+# SmartSaha/services/climate_store.py
+import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from SmartSaha.models import DailyObservation, Parcel
+from SmartSaha.services.geo import grid_cell, cell_bounds, cell_center, cell_key
+from SmartSaha.services.parcel_version import bump_parcel_data_version
+
+logger = logging.getLogger(__name__)
+
+DateRange = Tuple[datetime.date, datetime.date]
+
+
+def parse_power_date(value) -> datetime.date:
+    """Date NASA POWER (YYYYMMDD, str/int) ou date"""
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value), "%Y%m%d").date()
+
+
+def missing_ranges(start: datetime.date, end: datetime.date, held) -> List[DateRange]:
+    """Sous-plages contiguës de [start, end] dont les jours ne sont pas dans held"""
+    ranges, current = [], None
+    day = start
+    while day <= end:
+        if day in held:
+            if current:
+                ranges.append(current)
+                current = None
+        else:
+            current = (current[0], day) if current else (day, day)
+        day += datetime.timedelta(days=1)
+    if current:
+        ranges.append(current)
+    return ranges
+
+
+def split_range(start: datetime.date, end: datetime.date, chunk_days: int) -> List[DateRange]:
+    """Découpe [start, end] en morceaux d'au plus chunk_days jours"""
+    chunks = []
+    while start <= end:
+        chunk_end = min(end, start + datetime.timedelta(days=chunk_days - 1))
+        chunks.append((start, chunk_end))
+        start = chunk_end + datetime.timedelta(days=1)
+    return chunks
+
+
+class ClimateStore:
+    """
+    Séries climatiques journalières NASA POWER stockées par cellule de grille
+    (DailyObservation).
+
+    Pour une plage demandée, seuls les jours absents de la cellule sont
+    récupérés : les sous-plages manquantes sont découpées en morceaux
+    (CHUNK_DAYS) appelés en parallèle, puis fusionnées en base. Une plage
+    entièrement couverte est servie localement, sans appel amont.
+    Les jours encore non publiés par NASA (valeur de remplissage -999 partout)
+    ne sont pas enregistrés et seront redemandés plus tard : pas avant
+    UNPUBLISHED_RETRY secondes pour la cellule.
+    """
+    SOURCE = "nasa_power"
+    FILL_VALUE = -999.0
+    # Au-delà, un jour absent n'est pas un retard de publication NASA
+    PUBLICATION_LAG_DAYS = 30
+
+    def __init__(self, fetcher: Optional[Callable] = None, cell_degrees: Optional[float] = None):
+        config = getattr(settings, 'CLIMATE_STORE', {})
+        self.cell_degrees = cell_degrees or config.get('CELL_DEGREES', 0.5)
+        self.chunk_days = config.get('CHUNK_DAYS', 366)
+        self.max_workers = config.get('MAX_WORKERS', 4)
+        self.unpublished_retry = config.get('UNPUBLISHED_RETRY', 60 * 60 * 6)
+        self._fetcher = fetcher
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            from SmartSaha.services.climate import fetch_power_daily
+            return fetch_power_daily
+        return self._fetcher
+
+    # ---------------- Cellules / couverture ----------------
+    def locate(self, latitude: float, longitude: float) -> Tuple[str, Tuple[float, float]]:
+        cell = grid_cell(latitude, longitude, self.cell_degrees)
+        return cell_key(cell, self.cell_degrees), cell_center(cell, self.cell_degrees)
+
+    def held_dates(self, cell: str, start: datetime.date, end: datetime.date):
+        return set(
+            DailyObservation.objects
+            .filter(source=self.SOURCE, cell=cell, date__range=(start, end))
+            .values_list('date', flat=True)
+            .distinct()
+        )
+
+    def missing(self, latitude: float, longitude: float, start, end) -> List[DateRange]:
+        start, end = parse_power_date(start), parse_power_date(end)
+        cell, _ = self.locate(latitude, longitude)
+        return missing_ranges(start, end, self.held_dates(cell, start, end))
+
+    def is_covered(self, latitude: float, longitude: float, start, end) -> bool:
+        return not self.missing(latitude, longitude, start, end)
+
+    @staticmethod
+    def unpublished_key(cell: str) -> str:
+        return f"climate_store:unpublished:{cell}"
+
+    def _remember_unpublished(self, cell: str, start: datetime.date, end: datetime.date, held, stored):
+        """Premier jour de la fin de plage encore non publiée (récente), pour ne pas la redemander à chaque appel"""
+        recent = datetime.date.today() - datetime.timedelta(days=self.PUBLICATION_LAG_DAYS)
+        day = end
+        while day >= max(start, recent) and day not in held and day not in stored:
+            day -= datetime.timedelta(days=1)
+        if day < end:
+            cache.set(self.unpublished_key(cell), day + datetime.timedelta(days=1), timeout=self.unpublished_retry)
+
+    # ---------------- Ingestion ----------------
+    @classmethod
+    def rows_from_payload(cls, cell: str, payload: Dict) -> List[DailyObservation]:
+        """Lignes DailyObservation d'une réponse NASA POWER (jours non publiés exclus)"""
+        payload = payload or {}
+        parameters = payload.get('properties', {}).get('parameter', {})
+        fill_value = payload.get('header', {}).get('fill_value', cls.FILL_VALUE)
+        by_day = {}
+        for variable, series in parameters.items():
+            for day, value in series.items():
+                value = None if value is None or value == fill_value else float(value)
+                by_day.setdefault(parse_power_date(day), []).append((variable, value))
+
+        rows = []
+        for day, values in by_day.items():
+            if all(value is None for _, value in values):
+                continue
+            rows.extend(
+                DailyObservation(source=cls.SOURCE, cell=cell, variable=variable, date=day, value=value)
+                for variable, value in values
+            )
+        return rows
+
+    def ensure(self, latitude: float, longitude: float, start, end) -> Dict:
+        """
+        Complète la cellule du point sur [start, end] et retourne un résumé
+        {"cell", "fetched_ranges", "stored_rows"}.
+        """
+        start, end = parse_power_date(start), parse_power_date(end)
+        cell, (center_lat, center_lon) = self.locate(latitude, longitude)
+        held = self.held_dates(cell, start, end)
+        # Jours non publiés lors d'un appel récent : redemandés après UNPUBLISHED_RETRY
+        unpublished_from = cache.get(self.unpublished_key(cell))
+        fetch_end = end if unpublished_from is None else min(end, unpublished_from - datetime.timedelta(days=1))
+        chunks = [
+            chunk
+            for gap_start, gap_end in missing_ranges(start, fetch_end, held)
+            for chunk in split_range(gap_start, gap_end, self.chunk_days)
+        ]
+        if not chunks:
+            return {"cell": cell, "fetched_ranges": [], "stored_rows": 0}
+
+        # Appels HTTP seuls dans les threads ; écriture en base dans le thread courant
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            payloads = list(pool.map(
+                lambda chunk: self.fetcher(center_lat, center_lon, chunk[0], chunk[1]), chunks
+            ))
+
+        rows = [row for payload in payloads for row in self.rows_from_payload(cell, payload)]
+        self._remember_unpublished(cell, start, fetch_end, held, {row.date for row in rows})
+        DailyObservation.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        if rows:
+            # bulk_create n'émet pas de signaux : nouvelle version des parcelles de la cellule
+            transaction.on_commit(lambda: self.bump_cell_parcels(latitude, longitude))
+        logger.info("Climat %s : %d plage(s) récupérée(s), %d valeurs", cell, len(chunks), len(rows))
+        return {
+            "cell": cell,
+            "fetched_ranges": [(chunk_start.isoformat(), chunk_end.isoformat()) for chunk_start, chunk_end in chunks],
+            "stored_rows": len(rows),
+        }
+
+    def bump_cell_parcels(self, latitude: float, longitude: float) -> int:
+        """
+        Incrémente la version des données des parcelles dont le premier point
+        est dans la cellule du point (filtre SQL sur la boîte de la cellule).
+        """
+        cell, _ = self.locate(latitude, longitude)
+        lat_min, lat_max, lng_min, lng_max = cell_bounds(
+            grid_cell(latitude, longitude, self.cell_degrees), self.cell_degrees
+        )
+        # Boîte légèrement élargie (arrondis flottants), cellule revérifiée comme à l'écriture
+        margin = self.cell_degrees * 1e-6
+        parcels = Parcel.objects.filter(
+            points__0__lat__gte=lat_min - margin, points__0__lat__lt=lat_max + margin,
+            points__0__lng__gte=lng_min - margin, points__0__lng__lt=lng_max + margin,
+        ).values_list('uuid', 'points')
+        bumped = 0
+        for parcel_id, points in parcels:
+            try:
+                in_cell = self.locate(points[0]["lat"], points[0]["lng"])[0] == cell
+            except (IndexError, KeyError, TypeError):
+                continue
+            if in_cell:
+                bump_parcel_data_version(parcel_id)
+                bumped += 1
+        return bumped
+
+    # ---------------- Lecture ----------------
+    def payload(self, latitude: float, longitude: float, start, end, summary: Optional[Dict] = None) -> Dict:
+        """
+        Série locale au format NASA POWER (properties.parameter.{VAR}.{YYYYMMDD}),
+        après complétion des jours manquants ; -999 pour les jours absents.
+        summary : résultat d'un ensure() déjà fait sur cette plage (pas de second passage).
+        """
+        start, end = parse_power_date(start), parse_power_date(end)
+        if summary is None:
+            summary = self.ensure(latitude, longitude, start, end)
+        cell, (center_lat, center_lon) = self.locate(latitude, longitude)
+
+        observations = (
+            DailyObservation.objects
+            .filter(source=self.SOURCE, cell=cell, date__range=(start, end))
+            .order_by('variable', 'date')
+            .values_list('variable', 'date', 'value')
+        )
+        parameters = {}
+        for variable, day, value in observations:
+            parameters.setdefault(variable, {})[day.strftime("%Y%m%d")] = (
+                self.FILL_VALUE if value is None else value
+            )
+        days = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+        for series in parameters.values():
+            for day in days:
+                series.setdefault(day.strftime("%Y%m%d"), self.FILL_VALUE)
+
+        return {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [center_lon, center_lat]},
+            "properties": {"parameter": {variable: dict(sorted(series.items())) for variable, series in parameters.items()}},
+            "header": {
+                "title": "NASA/POWER daily (stockage local)",
+                "fill_value": self.FILL_VALUE,
+                "start": start.strftime("%Y%m%d"),
+                "end": end.strftime("%Y%m%d"),
+                "cell": cell,
+                "source": "local" if not summary["fetched_ranges"] else "local+nasa_power",
+            },
+        }
+
+
+climate_store = ClimateStore()
@@ -1,14 +1,130 @@
 # services/context_builder.py
+import datetime
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+
 from SmartSaha.models import Parcel
 from SmartSaha.services import ParcelDataService
-import asyncio
+from SmartSaha.services.parcel_version import parcel_data_version
+from SmartSaha.services.timeseries import CLIMATE_SOURCE, TimeSeriesService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "PARALLEL": True,            # sol et météo (appels externes possibles) en parallèle
+    "MAX_WORKERS": 4,
+    "MODULE_TIMEOUT": 6,         # s, au-delà le module est signalé indisponible
+    "MODULE_TIMEOUTS": {},       # délais spécifiques, ex: {"soil": 10}
+    "CACHE_TIMEOUT": 60 * 60,    # contexte rendu, invalidé par la version des données
+    "MAX_TOKENS": 1200,          # budget du contexte dans le prompt
+    "CHARS_PER_TOKEN": 4,        # estimation (pas de tokenizer côté serveur)
+    "MAX_TASKS": 8,              # tâches détaillées par culture, les autres sont comptées
+    "MAX_YIELDS": 10,            # relevés de rendement détaillés, les autres agrégés
+    "CLIMATE_DAYS": 60,          # fenêtre du résumé climat NASA POWER (store local)
+}
+MODULES = ("parcel", "soil", "weather", "crops", "yield_records")
+# Modules pouvant appeler SoilGrids / WeatherAPI : lancés en tâche de fond
+BACKGROUND_MODULES = ("soil", "weather")
+UNAVAILABLE = {
+    "parcel": "Parcelle: données indisponibles pour le moment",
+    "soil": "Sol: données indisponibles pour le moment",
+    "weather": "Météo: données indisponibles pour le moment",
+    "crops": "Cultures et tâches: données indisponibles pour le moment",
+    "yield_records": "Historique rendements: données indisponibles pour le moment",
+}
+
+_module_pool = None
+
+
+def _config() -> Dict:
+    return {**DEFAULT_CONFIG, **getattr(settings, 'CONTEXT_BUILDER', {})}
+
+
+def _get_module_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Pool partagé des modules lents (chaque thread garde sa propre connexion DB)"""
+    global _module_pool
+    if _module_pool is None:
+        _module_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="context")
+    return _module_pool
+
+
+def _load_in_worker(loader, parcel, config):
+    close_old_connections()
+    try:
+        return loader(parcel, config)
+    finally:
+        close_old_connections()
+
+
+def fit_to_budget(sections: Sequence[Sequence[str]], max_tokens: int,
+                  chars_per_token: int = DEFAULT_CONFIG["CHARS_PER_TOKEN"]) -> str:
+    """
+    Assemble les sections sous le budget de tokens. Chaque section propose ses
+    rendus du plus détaillé au plus résumé : tant que le budget est dépassé,
+    la section la plus longue passe au rendu suivant. En dernier recours le
+    texte est tronqué (les premières sections, les plus importantes, restent).
+    """
+    levels = [0] * len(sections)
+    budget = max_tokens * chars_per_token
+
+    def render():
+        return "\n".join(section[level] for section, level in zip(sections, levels) if section[level])
+
+    text = render()
+    while len(text) > budget:
+        candidates = [i for i, section in enumerate(sections) if levels[i] < len(section) - 1]
+        if not candidates:
+            return text[:budget - 1].rstrip() + "…"
+        i = max(candidates, key=lambda i: len(sections[i][levels[i]]))
+        levels[i] += 1
+        text = render()
+    return text
+
+
+def _number(value, digits=1):
+    return None if value is None else round(value, digits)
+
 
 class ContextBuilder:
+    """
+    Contexte de l'assistant agronome pour une parcelle.
+
+    - Une requête pour la parcelle ; cultures/tâches et rendements en
+      requêtes groupées (pas de N+1).
+    - Sol et météo (données en base réutilisées, sinon cache par cellule puis
+      API) calculés en parallèle, chacun avec son délai (MODULE_TIMEOUT,
+      MODULE_TIMEOUTS[module]). Un module en retard ou en échec est signalé
+      indisponible ; il termine en arrière-plan et ses données seront en base
+      à la question suivante.
+    - Contexte rendu mis en cache par (parcelle, modules, version des
+      données) : toute modification de la parcelle le remplace.
+    - Taille bornée par MAX_TOKENS : les sections les plus longues passent à
+      leur version résumée (voir fit_to_budget).
+    """
+    KEY_PREFIX = "assistant_context"
+
+    @classmethod
+    def cache_key(cls, parcel_uuid, modules: Sequence[str], version) -> str:
+        digest = hashlib.sha1(json.dumps([str(parcel_uuid), str(version), list(modules)]).encode()).hexdigest()
+        return f"{cls.KEY_PREFIX}:{digest}"
 
     @staticmethod
     def build_context(parcel_uuid=None, user_modules=None):
         """
         Construit le contexte complet pour l'assistant agronome.
+        Retourne (contexte, complet) : complet est faux si un module a dépassé
+        son délai ou échoué (contexte ni mis en cache ici, ni à mettre en cache
+        avec la réponse par l'appelant).
         user_modules = {
             "parcel": True/False,
             "soil": True/False,
@@ -18,36 +134,218 @@ class ContextBuilder:
         }
         """
         user_modules = user_modules or {}
-        context = []
+        if not parcel_uuid:
+            return "", True
+        modules = [name for name in MODULES if user_modules.get(name, False)]
 
-        parcel = None
-        if parcel_uuid:
+        config = _config()
+        # Version lue avant le calcul : une écriture concurrente ne peut pas être masquée
+        key = ContextBuilder.cache_key(parcel_uuid, modules, parcel_data_version(parcel_uuid))
+        context = cache.get(key)
+        if context is not None:
+            return context, True
+
+        try:
+            parcel = Parcel.objects.get(uuid=parcel_uuid)
+        except (Parcel.DoesNotExist, ValidationError):
+            return "Parcelle inconnue", True
+
+        sections, complete = ContextBuilder.gather(parcel, modules, config)
+        context = fit_to_budget(sections, config["MAX_TOKENS"], config["CHARS_PER_TOKEN"])
+        if complete:
+            cache.set(key, context, timeout=config["CACHE_TIMEOUT"])
+        return context, complete
+
+    @staticmethod
+    def gather(parcel, modules: Sequence[str], config: Dict):
+        """
+        Rendus (détaillé → résumé) de chaque module demandé, dans l'ordre de
+        MODULES, et un indicateur de complétude (aucun module en retard/échec).
+        """
+        loaders = {
+            "parcel": ContextBuilder.parcel_section,
+            "soil": ContextBuilder.soil_section,
+            "weather": ContextBuilder.weather_section,
+            "crops": ContextBuilder.crops_section,
+            "yield_records": ContextBuilder.yield_section,
+        }
+        started = time.perf_counter()
+        background = [name for name in modules if name in BACKGROUND_MODULES]
+        futures = {}
+        if config["PARALLEL"] and background:
+            pool = _get_module_pool(config["MAX_WORKERS"])
+            futures = {name: pool.submit(_load_in_worker, loaders[name], parcel, config) for name in background}
+
+        results, complete = {}, True
+        # Modules locaux (requêtes groupées) pendant que sol et météo s'exécutent
+        for name in modules:
+            if name in futures:
+                continue
+            try:
+                results[name] = loaders[name](parcel, config)
+            except Exception as e:
+                logger.error(f"Contexte {name} en échec: {str(e)}")
+                results[name], complete = (UNAVAILABLE[name],), False
+
+        for name, future in futures.items():
+            limit = config["MODULE_TIMEOUTS"].get(name, config["MODULE_TIMEOUT"])
             try:
-                parcel = Parcel.objects.get(uuid=parcel_uuid)
-                if user_modules.get("parcel", False):
-                    context.append(f"Parcelle: {parcel.parcel_name}")
-            except Parcel.DoesNotExist:
-                context.append("Parcelle inconnue")
-
-        # Sol et Climat (synchrone)
-        if parcel and user_modules.get("soil", False):
-            soil_info = ParcelDataService.fetch_soil(parcel)  # doit être synchrone
-            if soil_info:
-                context.append(soil_info)
-
-        if parcel and user_modules.get("weather", False):
-            climate_info = ParcelDataService.fetch_climate(parcel)  # doit être synchrone
-            if climate_info:
-                context.append(climate_info)
-
-        # Cultures et tâches
-        if parcel and user_modules.get("crops", False):
-            parcel_crops_info = ParcelDataService.build_parcel_crops(parcel)
-            context.append(f"Cultures et tâches: {parcel_crops_info}")
-
-        # Rendements
-        if parcel and user_modules.get("yield_records", False):
-            yields_info = ParcelDataService.build_yield_records(parcel)
-            context.append(f"Historique rendements: {yields_info}")
-
-        return "\n".join([str(c) for c in context])
+                results[name] = future.result(timeout=max(0, limit - (time.perf_counter() - started)))
+            except FutureTimeout:
+                logger.warning(f"Contexte {name} : délai de {limit}s dépassé")
+                results[name], complete = (UNAVAILABLE[name],), False
+            except Exception as e:
+                logger.error(f"Contexte {name} en échec: {str(e)}")
+                results[name], complete = (UNAVAILABLE[name],), False
+
+        logger.debug(f"Contexte {parcel.uuid} construit en {round((time.perf_counter() - started) * 1000)} ms")
+        return [results[name] for name in modules], complete
+
+    # ---------------- Sections ----------------
+    @staticmethod
+    def parcel_section(parcel, config):
+        area = ParcelDataService.calculate_area(parcel)
+        return (f"Parcelle: {parcel.parcel_name}" + (f" ({area} ha)" if area else ""),)
+
+    @staticmethod
+    def soil_section(parcel, config):
+        soil = ParcelDataService.fetch_soil(parcel)
+        rows = [row for row in (soil.property_rows if soil else []) if row.mean is not None]
+        if not rows:
+            return (UNAVAILABLE["soil"],)
+
+        by_property = {}
+        for row in rows:
+            by_property.setdefault(row.property, []).append(row)
+
+        def value(row):
+            unit = row.target_unit if row.target_unit and row.target_unit != "-" else ""
+            return f"{_number(row.mean / (row.d_factor or 1), 2)}{' ' + unit if unit else ''}"
+
+        detailed, topsoil = [], []
+        for name, values in by_property.items():
+            values.sort(key=lambda row: row.top_depth if row.top_depth is not None else 0)
+            detailed.append(f"- {name}: " + ", ".join(f"{value(row)} ({row.depth})" for row in values))
+            topsoil.append(f"{name} {value(values[0])}")
+        return (
+            "Sol (SoilGrids):\n" + "\n".join(detailed),
+            "Sol (horizon de surface): " + ", ".join(topsoil),
+        )
+
+    @staticmethod
+    def weather_section(parcel, config):
+        weather = ParcelDataService.fetch_weather(parcel)
+        climate = ContextBuilder.climate_summary(parcel, config)
+        rows = weather.forecast_rows if weather else []
+        current = weather.current_conditions if weather else {}
+        if not rows and not current:
+            return (UNAVAILABLE["weather"] + (f"\n{climate}" if climate else ""),)
+
+        lines = []
+        if current:
+            lines.append(
+                f"Météo actuelle: {current.get('temp_c')} °C, humidité {current.get('humidity')} %, "
+                f"{(current.get('condition') or {}).get('text', '')}".rstrip(", ")
+            )
+        days = [
+            f"- {row.date}: {_number(row.min_temp_c)}-{_number(row.max_temp_c)} °C, "
+            f"pluie {_number(row.total_precip_mm)} mm ({row.chance_of_rain or 0} %), {row.condition}".rstrip(", ")
+            for row in rows
+        ]
+        max_temps = [row.max_temp_c for row in rows if row.max_temp_c is not None]
+        min_temps = [row.min_temp_c for row in rows if row.min_temp_c is not None]
+        summary = (
+            f"Prévisions {len(rows)} jours: {_number(min(min_temps)) if min_temps else '?'}-"
+            f"{_number(max(max_temps)) if max_temps else '?'} °C, pluie cumulée "
+            f"{_number(weather.total_precipitation)} mm, "
+            f"{sum(1 for row in rows if (row.total_precip_mm or 0) > 0)} jours de pluie"
+        ) if rows else ""
+        climate_lines = [climate] if climate else []
+
+        return (
+            "\n".join(lines + (["Prévisions:"] + days if days else []) + climate_lines),
+            "\n".join(lines + ([summary] if summary else []) + climate_lines),
+            "\n".join([summary or lines[0]] + climate_lines),
+        )
+
+    @staticmethod
+    def climate_summary(parcel, config) -> Optional[str]:
+        """Moyennes récentes depuis le store climat local (aucun appel NASA POWER)"""
+        end = datetime.date.today()
+        start = end - datetime.timedelta(days=config["CLIMATE_DAYS"])
+        dates, series = TimeSeriesService.parcel_arrays(
+            parcel, start, end, variables=["T2M", "PRECTOTCORR"], source=CLIMATE_SOURCE
+        )
+        temperature, rain = series.get("T2M"), series.get("PRECTOTCORR")
+        if temperature is None or np.isnan(temperature).all():
+            return None
+        known = ~np.isnan(temperature)
+        last_day = dates[known][-1]
+        text = (
+            f"Climat ({int(known.sum())} jours connus jusqu'au {last_day}): "
+            f"température moyenne {_number(float(np.nanmean(temperature)))} °C"
+        )
+        if rain is not None and not np.isnan(rain).all():
+            text += f", pluie cumulée {_number(float(np.nansum(rain)))} mm"
+        return text
+
+    @staticmethod
+    def crops_section(parcel, config):
+        crops = ParcelDataService.build_parcel_crops(parcel)
+        if not crops:
+            return ("Cultures et tâches: aucune culture enregistrée",)
+
+        detailed, summary = [], []
+        for crop in crops:
+            variety = f" ({crop['crop']['variety']})" if crop['crop']['variety'] else ""
+            header = (
+                f"- {crop['crop']['name']}{variety}: plantée le {crop['planting_date']}"
+                + (f", récolte {crop['harvest_date']}" if crop['harvest_date'] else "")
+                + f", {crop['area']} ha" + (f", statut {crop['status']}" if crop['status'] else "")
+            )
+            # Tâches ouvertes d'abord (par échéance), les terminées ensuite
+            tasks = sorted(crop['tasks'], key=lambda task: (task['completed_at'] is not None, task['due_date']))
+            open_count = sum(1 for task in tasks if task['completed_at'] is None)
+            counts = f"{len(tasks)} tâches dont {open_count} ouvertes"
+            lines = [
+                f"  · {task['name']} (échéance {task['due_date']}"
+                + (f", {task['status']}" if task['status'] else "")
+                + (f", priorité {task['priority']}" if task['priority'] else "") + ")"
+                for task in tasks[:config["MAX_TASKS"]]
+            ]
+            if len(tasks) > config["MAX_TASKS"]:
+                lines.append(f"  · ... et {len(tasks) - config['MAX_TASKS']} autres tâches")
+            detailed.append("\n".join([header + (f" — {counts}" if tasks else "")] + lines))
+            summary.append(header + (f" — {counts}" if tasks else ""))
+        return (
+            "Cultures et tâches:\n" + "\n".join(detailed),
+            "Cultures et tâches:\n" + "\n".join(summary),
+        )
+
+    @staticmethod
+    def yield_section(parcel, config):
+        records = ParcelDataService.build_yield_records(parcel)
+        if not records:
+            return ("Historique rendements: aucun relevé",)
+
+        by_crop: Dict[str, List[float]] = {}
+        for record in records:
+            by_crop.setdefault(record['crop'], []).append(record['yield'])
+        aggregates = "; ".join(
+            f"{crop}: {len(values)} relevés, moyenne {_number(sum(values) / len(values), 2)}, "
+            f"min {_number(min(values), 2)}, max {_number(max(values), 2)}"
+            for crop, values in by_crop.items()
+        )
+
+        latest = sorted(records, key=lambda record: record['date'], reverse=True)[:config["MAX_YIELDS"]]
+        lines = [
+            f"- {record['date']} {record['crop']}: {record['yield']}"
+            + (f" ({record['notes']})" if record['notes'] else "")
+            for record in latest
+        ]
+        if len(records) > len(latest):
+            lines.append(f"- ... {len(records) - len(latest)} relevés plus anciens (voir moyennes)")
+        return (
+            "Historique rendements:\n" + "\n".join(lines) + f"\nMoyennes: {aggregates}",
+            f"Historique rendements: {aggregates}",
+        )
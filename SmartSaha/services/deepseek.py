@@ -2,7 +2,14 @@ import httpx
 import os
 from django.conf import settings
 
+from SmartSaha.services.answer_cache import answer_cache
 from SmartSaha.services.context_builder import ContextBuilder
+from SmartSaha.services.http_clients import http_clients
+from SmartSaha.services.llm_router import ProviderError, llm_router
+from SmartSaha.services.llm_stream import iter_sse_json
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+MISTRAL_URL = "https://api.mistral.ai"
 
 BASE_PROMPT = """
 Tu es un ingenieur agronome expert à Madagascar.
@@ -12,17 +19,82 @@ Reponds toujours de maniere précise, pratique, court et adaptee aux conditions
 - si cest un estimation, calcule avec les donnees qu on te fourni et tes connaissances
 - Si tu ne sais pas, indique clairement que l’information n’est pas disponible.
 """
+def openrouter_complete(model: str, messages: list, api_key: str, extra_headers: dict = None,
+                        timeout: float = None, **params) -> str:
+    """Un appel chat/completions OpenRouter ; ProviderError si le modèle ne répond pas"""
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json", **(extra_headers or {})}
+    kwargs = {"timeout": timeout} if timeout else {}
+    try:
+        response = http_clients.httpx_client(OPENROUTER_URL).post(
+            f"{OPENROUTER_URL}/chat/completions",
+            json={"model": model, "messages": messages, **params},
+            headers=headers,
+            **kwargs
+        )
+    except httpx.HTTPError as e:
+        raise ProviderError(f"{model}: {e}") from e
+    if response.status_code != 200:
+        raise _provider_error(model, response)
+    try:
+        return response.json()["choices"][0]["message"]["content"]
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        raise ProviderError(f"{model}: réponse inattendue") from e
+
+
+def _provider_error(model: str, response) -> ProviderError:
+    retry_after = response.headers.get("Retry-After")
+    return ProviderError(
+        f"{model}: HTTP {response.status_code}",
+        status=response.status_code,
+        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+    )
+
+
+def openrouter_stream(model: str, messages: list, api_key: str, extra_headers: dict = None,
+                      timeout: float = None, **params):
+    """Même appel en flux (SSE amont) : génère les morceaux de texte au fil de l'eau"""
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json", **(extra_headers or {})}
+    kwargs = {"timeout": timeout} if timeout else {}
+    try:
+        with http_clients.httpx_client(OPENROUTER_URL).stream(
+            "POST",
+            f"{OPENROUTER_URL}/chat/completions",
+            json={"model": model, "messages": messages, "stream": True, **params},
+            headers=headers,
+            **kwargs
+        ) as response:
+            if response.status_code != 200:
+                raise _provider_error(model, response)
+            for event in iter_sse_json(response.iter_lines()):
+                choices = event.get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    yield text
+    except httpx.HTTPError as e:
+        raise ProviderError(f"{model}: {e}") from e
+
+
+def mistral_stream(client, **params):
+    """Morceaux de texte d'une complétion Mistral en flux"""
+    with client.chat.stream(**params) as events:
+        for event in events:
+            choices = event.data.choices
+            text = choices[0].delta.content if choices else None
+            if isinstance(text, str) and text:
+                yield text
+
+
 class DeepSeekClient:
     def __init__(self, model="deepseek/deepseek-r1:free"):
         self.api_key = getattr(settings, "OPENROUTER_API_KEY", None) or os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY manquant dans settings ou .env")
 
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = OPENROUTER_URL
         self.model = model
 
     def ask(self, question: str, parcel_uuid: str = None, user_modules: dict = None):
-        context_data = ContextBuilder.build_context(parcel_uuid, user_modules)
+        context_data, _ = ContextBuilder.build_context(parcel_uuid, user_modules)
         print(context_data)
         full_prompt = f"{BASE_PROMPT}\n\nDonnées locales:\n{context_data}\n\nQuestion: {question}\nRéponse:"
         print(full_prompt)
@@ -37,17 +109,17 @@ class DeepSeekClient:
             "messages": [{"role": "user", "content": full_prompt}]
         }
 
-        with httpx.Client(timeout=60.0) as client:
-            try:
-                response = client.post(f"{self.base_url}/chat/completions", json=payload, headers=headers)
-                print("Status:", response.status_code)
-                print("Response:", response.text[:500])  # debug rapide
-                response.raise_for_status()
-                data = response.json()
-            except httpx.HTTPStatusError as e:
-                return f"Erreur API OpenRouter ({e.response.status_code}): {e.response.text}"
-            except Exception as e:
-                return f"Erreur interne: {str(e)}"
+        client = http_clients.httpx_client(self.base_url)
+        try:
+            response = client.post(f"{self.base_url}/chat/completions", json=payload, headers=headers)
+            print("Status:", response.status_code)
+            print("Response:", response.text[:500])  # debug rapide
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPStatusError as e:
+            return f"Erreur API OpenRouter ({e.response.status_code}): {e.response.text}"
+        except Exception as e:
+            return f"Erreur interne: {str(e)}"
 
         # Retourne le contenu de la réponse
         try:
@@ -73,7 +145,7 @@ class GeminiClient:
         self.client = genai.Client(api_key=self.api_key)
 
     def ask(self, question: str, parcel_uuid: str = None, user_modules: dict = None):
-        context_data = ContextBuilder.build_context(parcel_uuid, user_modules)
+        context_data, _ = ContextBuilder.build_context(parcel_uuid, user_modules)
         print(context_data)
 
         full_prompt = f"{BASE_PROMPT}\n\nDonnées locales:\n{context_data}\n\nQuestion: {question}\nRéponse:"
@@ -103,44 +175,21 @@ class WorkingAIClient:
 
     def ask(self, question, parcel_uuid=None, user_modules=None):
         # 1. Récupère le contexte (comme avant)
-        context_data = ContextBuilder.build_context(parcel_uuid, user_modules)
+        context_data, _ = ContextBuilder.build_context(parcel_uuid, user_modules)
         full_prompt = f"{BASE_PROMPT}\n\nDonnées locales:\n{context_data}\n\nQuestion: {question}\nRéponse:"
 
-        # 2. Essaie chaque modèle jusqu'à ce qu'un marche
-        for model in self.models:
-            try:
-                print(f"🔄 Essai avec le modèle: {model}")
-
-                headers = {
-                    "Authorization": f"Bearer {getattr(settings, "OPENROUTER_API_KEY", None) or os.getenv("OPENROUTER_API_KEY")}",
-                    "Content-Type": "application/json"
-                }
-                payload = {
-                    "model": model,
-                    "messages": [{"role": "user", "content": full_prompt}]
-                }
-
-                # 3. Appel API
-                with httpx.Client(timeout=60.0) as client:
-                    response = client.post(
-                        "https://openrouter.ai/api/v1/chat/completions",
-                        json=payload,
-                        headers=headers
-                    )
-
-                    if response.status_code == 200:
-                        data = response.json()
-                        print(f"✅ Succès avec {model}")
-                        return data["choices"][0]["message"]["content"]
-                    else:
-                        print(f"❌ {model} a échoué: {response.status_code}")
-                        continue
-
-            except Exception as e:
-                print(f"❌ Erreur avec {model}: {e}")
-                continue
-
-        # 4. Si tout échoue
+        api_key = getattr(settings, "OPENROUTER_API_KEY", None) or os.getenv("OPENROUTER_API_KEY")
+        messages = [{"role": "user", "content": full_prompt}]
+
+        # 2. Modèles en course (requêtes couvertes), modèles en échec récent écartés
+        answer, model = llm_router.route(
+            self.models, lambda candidate, timeout: openrouter_complete(candidate, messages, api_key, timeout=timeout)
+        )
+        if answer is not None:
+            print(f"✅ Succès avec {model}")
+            return answer
+
+        # 3. Si tout échoue
         return "Désolé, tous les services IA sont temporairement saturés. Réessaie dans 1-2 minutes."
 
 
@@ -153,17 +202,16 @@ class MistralRAGClient:
         self.model = model
         try:
             from mistralai import Mistral
+            # Client httpx partagé : pas de nouvelle connexion TLS par question
+            self.client = Mistral(api_key=self.api_key, client=http_clients.httpx_client(MISTRAL_URL))
             self.mistral_available = True
         except ImportError:
             self.mistral_available = False
 
-    def ask(self, question: str, parcel_uuid: str = None, user_modules: dict = None):
-        """Version RAG avec contexte local"""
-        if not self.mistral_available:
-            return "Erreur: Package 'mistralai' non installé. Exécutez: pip install mistralai"
-
+    def _messages(self, question: str, parcel_uuid: str = None, user_modules: dict = None):
+        """(messages, contexte complet) ; un contexte incomplet ne doit pas alimenter le cache des réponses"""
         # Construction du contexte RAG
-        context_data = ContextBuilder.build_context(parcel_uuid, user_modules)
+        context_data, complete = ContextBuilder.build_context(parcel_uuid, user_modules)
         print("Contexte RAG:", context_data)
 
         # Prompt RAG complet
@@ -180,32 +228,62 @@ BASÉ SUR LE CONTEXTE CI-DESSUS, RÉPONDS DE MANIÈRE PRÉCISE ET ADAPTÉE :
 """
         print("Prompt Mistral RAG généré")
         print("MISTRAL_API_KEY =", self.api_key[:10] + "...")
+        return [
+            {
+                "role": "system",
+                "content": "Tu es Dr. Andry Rakoto, expert agronome malgache. Réponses courtes, précises, basées sur les données fournies."
+            },
+            {
+                "role": "user",
+                "content": full_prompt
+            }
+        ], complete
+
+    def _fingerprint(self, parcel_uuid, user_modules):
+        return answer_cache.fingerprint(f"mistral-rag:{self.model}", parcel_uuid, user_modules)
 
-        try:
-            from mistralai import Mistral
+    def ask(self, question: str, parcel_uuid: str = None, user_modules: dict = None):
+        """Version RAG avec contexte local"""
+        if not self.mistral_available:
+            return "Erreur: Package 'mistralai' non installé. Exécutez: pip install mistralai"
 
-            with Mistral(api_key=self.api_key) as client:
-                response = client.chat.complete(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Tu es Dr. Andry Rakoto, expert agronome malgache. Réponses courtes, précises, basées sur les données fournies."
-                        },
-                        {
-                            "role": "user",
-                            "content": full_prompt
-                        }
-                    ],
-                    temperature=0.3,  # Réponses précises
-                    max_tokens=1000,
-                    stream=False
-                )
+        # Même question, même contexte (version des données de la parcelle) : réponse en cache
+        fingerprint = self._fingerprint(parcel_uuid, user_modules)
+        cached, _ = answer_cache.get(question, fingerprint)
+        if cached is not None:
+            return cached
+
+        messages, complete = self._messages(question, parcel_uuid, user_modules)
+        try:
+            response = self.client.chat.complete(
+                model=self.model,
+                messages=messages,
+                temperature=0.3,  # Réponses précises
+                max_tokens=1000,
+                stream=False
+            )
 
             print("Réponse Mistral RAG reçue")
-            return response.choices[0].message.content
+            answer = response.choices[0].message.content
+            if complete:
+                answer_cache.set(question, fingerprint, answer)
+            return answer
 
         except Exception as e:
             error_msg = f"Erreur API Mistral: {str(e)}"
             print(f"❌ {error_msg}")
-            return error_msg
\ No newline at end of file
+            return error_msg
+
+    def stream_ask(self, question: str, parcel_uuid: str = None, user_modules: dict = None):
+        """Version en flux : contexte construit tout de suite, morceaux de texte générés ensuite"""
+        if not self.mistral_available:
+            return iter(["Erreur: Package 'mistralai' non installé. Exécutez: pip install mistralai"])
+        fingerprint = self._fingerprint(parcel_uuid, user_modules)
+        cached, _ = answer_cache.get(question, fingerprint)
+        if cached is not None:
+            return iter([cached])
+        messages, complete = self._messages(question, parcel_uuid, user_modules)
+        chunks = mistral_stream(self.client, model=self.model, messages=messages, temperature=0.3, max_tokens=1000)
+        if not complete:
+            return chunks
+        return answer_cache.cached_stream(question, fingerprint, chunks)
@@ -0,0 +1,113 @@
+# SmartSaha/services/forecast_cache.py
+import logging
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from SmartSaha.services.geo import grid_cell, cell_center, cell_key
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastCellCache:
+    """
+    Cache des prévisions météo par cellule de grille.
+
+    Les parcelles voisines (même cellule) partagent une seule réponse WeatherAPI
+    par fenêtre de rafraîchissement (TTL). L'appel amont est fait au centre de la
+    cellule pour que la réponse ne dépende pas de la première parcelle servie.
+    Les compteurs hits/misses sont conservés dans le cache Django afin d'être
+    partagés entre workers.
+    """
+    KEY_PREFIX = "weather_cell"
+    STATS_KEYS = ("hits", "misses")
+
+    def __init__(self, cell_degrees: Optional[float] = None, timeout: Optional[int] = None):
+        config = getattr(settings, 'WEATHER_GRID_CACHE', {})
+        self.cell_degrees = cell_degrees or config.get('CELL_DEGREES', 0.01)
+        self.timeout = timeout or config.get('TIMEOUT', 60 * 60)
+        self.enabled = config.get('ENABLED', True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # ---------------- Cellules ----------------
+    def locate(self, latitude: float, longitude: float) -> Tuple[str, Tuple[float, float]]:
+        """Retourne (clé de cellule, centre de la cellule) pour un point"""
+        cell = grid_cell(latitude, longitude, self.cell_degrees)
+        return cell_key(cell, self.cell_degrees), cell_center(cell, self.cell_degrees)
+
+    def _key(self, cell: str, days: int, variant: str) -> str:
+        return f"{self.KEY_PREFIX}:{variant}:{days}:{cell}"
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # ---------------- Lecture / écriture ----------------
+    def get_or_fetch(self, latitude: float, longitude: float, days: int,
+                     fetcher: Callable[[float, float], Optional[Dict]],
+                     variant: str = "default") -> Tuple[Optional[Dict], bool]:
+        """
+        Retourne (données, hit) pour la cellule du point.
+        `fetcher(lat, lon)` n'est appelé qu'en cas de miss, avec le centre de la cellule.
+        Les appels concurrents sur une même cellule (même processus) sont coalescés.
+        """
+        if not self.enabled:
+            return fetcher(latitude, longitude), False
+
+        cell, (center_lat, center_lon) = self.locate(latitude, longitude)
+        key = self._key(cell, days, variant)
+
+        data = cache.get(key)
+        if data is not None:
+            self._incr("hits")
+            return data, True
+
+        with self._lock_for(key):
+            # Un autre thread a pu remplir la cellule pendant l'attente du verrou
+            data = cache.get(key)
+            if data is not None:
+                self._incr("hits")
+                return data, True
+
+            self._incr("misses")
+            data = fetcher(center_lat, center_lon)
+            if data is not None:
+                cache.set(key, data, timeout=self.timeout)
+            return data, False
+
+    def invalidate(self, latitude: float, longitude: float, days: int, variant: str = "default"):
+        cell, _ = self.locate(latitude, longitude)
+        cache.delete(self._key(cell, days, variant))
+
+    # ---------------- Statistiques ----------------
+    def _incr(self, name: str):
+        key = f"{self.KEY_PREFIX}:stats:{name}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Clé absente (ou expirée) : add évite d'écraser un incr concurrent
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    def stats(self) -> Dict:
+        """Compteurs cumulés : hits, misses et appels API économisés"""
+        values = cache.get_many([f"{self.KEY_PREFIX}:stats:{name}" for name in self.STATS_KEYS])
+        hits = values.get(f"{self.KEY_PREFIX}:stats:hits", 0)
+        misses = values.get(f"{self.KEY_PREFIX}:stats:misses", 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'api_calls_saved': hits,
+            'hit_rate': round(hits / total, 3) if total else None,
+            'cell_degrees': self.cell_degrees,
+        }
+
+    def reset_stats(self):
+        cache.delete_many([f"{self.KEY_PREFIX}:stats:{name}" for name in self.STATS_KEYS])
+
+
+forecast_cell_cache = ForecastCellCache()
@@ -0,0 +1,56 @@
+# SmartSaha/services/geo.py
+"""Utilitaires géographiques partagés (grille régulière lat/lon)"""
+import math
+from typing import Tuple
+
+DEFAULT_CELL_DEGREES = 0.01  # ≈ 1,1 km à l'équateur
+
+
+def grid_cell(latitude: float, longitude: float, cell_degrees: float = DEFAULT_CELL_DEGREES) -> Tuple[int, int]:
+    """Indices (ligne, colonne) de la cellule de grille contenant le point"""
+    return (
+        math.floor(float(latitude) / cell_degrees),
+        math.floor(float(longitude) / cell_degrees),
+    )
+
+
+def cell_center(cell: Tuple[int, int], cell_degrees: float = DEFAULT_CELL_DEGREES) -> Tuple[float, float]:
+    """Coordonnées du centre d'une cellule (arrondies pour des clés stables)"""
+    row, col = cell
+    return (
+        round((row + 0.5) * cell_degrees, 6),
+        round((col + 0.5) * cell_degrees, 6),
+    )
+
+
+def cell_bounds(cell: Tuple[int, int], cell_degrees: float = DEFAULT_CELL_DEGREES) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) d'une cellule, bornes max exclues"""
+    row, col = cell
+    return row * cell_degrees, (row + 1) * cell_degrees, col * cell_degrees, (col + 1) * cell_degrees
+
+
+def cell_key(cell: Tuple[int, int], cell_degrees: float = DEFAULT_CELL_DEGREES) -> str:
+    """Identifiant texte d'une cellule, utilisable comme clé de cache"""
+    return f"{cell_degrees:g}:{cell[0]}:{cell[1]}"
+
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def polygon_area_hectares(points) -> float:
+    """
+    Surface approchée (ha) d'un polygone [{"lat":.., "lng":..}, ...]
+    (projection équirectangulaire locale, suffisante à l'échelle d'une parcelle).
+    """
+    if not points or len(points) < 3:
+        return 0.0
+
+    mean_lat = math.radians(sum(p["lat"] for p in points) / len(points))
+    xy = [
+        (math.radians(p["lng"]) * EARTH_RADIUS_M * math.cos(mean_lat), math.radians(p["lat"]) * EARTH_RADIUS_M)
+        for p in points
+    ]
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(xy, xy[1:] + xy[:1]):
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2 / 10000
@@ -0,0 +1,252 @@
+# SmartSaha/services/http_clients.py
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import h2  # noqa: F401  (HTTP/2 pour httpx : pip install httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "CONNECT_TIMEOUT": 5,
+    "READ_TIMEOUT": 20,
+    "POOL_MAXSIZE": 10,          # connexions gardées ouvertes par hôte
+    "RETRIES": 2,                # 429 / 5xx / erreurs de connexion (GET uniquement)
+    "BACKOFF": 0.5,              # secondes, doublé à chaque retry
+    "HTTP2": True,               # httpx uniquement, si h2 est installé
+}
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Bornes des buckets de latence (ms) ; le dernier bucket est "+inf"
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def host_of(url_or_host: str) -> str:
+    """Hôte (netloc, port inclus) d'une URL ; une valeur sans schéma est déjà un hôte"""
+    return urlparse(url_or_host).netloc if "://" in url_or_host else url_or_host
+
+
+class HostMetrics:
+    """Compteurs d'un hôte pour ce processus : requêtes, erreurs, histogramme de latence, saturation du pool"""
+
+    def __init__(self, pool_size: int):
+        self.pool_size = pool_size
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.saturated = 0       # requêtes démarrées pool plein (attente ou connexion hors pool)
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.in_flight >= self.pool_size:
+                self.saturated += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, elapsed_ms: float, status: Optional[int] = None):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_ms += elapsed_ms
+            self.buckets[bucket] += 1
+            if status is None or status >= 500:
+                self.errors += 1
+            label = str(status) if status is not None else "error"
+            self.statuses[label] = self.statuses.get(label, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + ["+inf"]
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "statuses": dict(self.statuses),
+                "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else None,
+                "latency_ms": dict(zip(labels, self.buckets)),
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "pool_size": self.pool_size,
+                "saturated": self.saturated,
+            }
+
+
+class InstrumentedSession(requests.Session):
+    """Session requests avec délai par défaut et mesures par hôte"""
+
+    def __init__(self, registry, timeout):
+        super().__init__()
+        self.registry = registry
+        self.default_timeout = timeout
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        metrics = self.registry.metrics_for(host_of(url))
+        metrics.start()
+        started, status = time.perf_counter(), None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            metrics.finish((time.perf_counter() - started) * 1000, status)
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Transport httpx mesuré par hôte (latence jusqu'aux en-têtes de réponse)"""
+
+    def __init__(self, registry, transport: httpx.BaseTransport):
+        self.registry = registry
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        metrics = self.registry.metrics_for(request.url.netloc.decode("ascii"))
+        metrics.start()
+        started, status = time.perf_counter(), None
+        try:
+            response = self.transport.handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.finish((time.perf_counter() - started) * 1000, status)
+
+    def close(self):
+        self.transport.close()
+
+
+class OutboundClients:
+    """
+    Registre des clients HTTP sortants, partagé par tout le processus.
+
+    - Une session requests par hôte (keep-alive, pool de POOL_MAXSIZE
+      connexions, retries avec backoff exponentiel sur 429/5xx pour les GET).
+    - Un client httpx par hôte pour les API LLM (HTTP/2 si h2 est installé).
+    - Délais et retries : settings.HTTP_CLIENTS["DEFAULT"], surchargés par
+      hôte dans HTTP_CLIENTS["HOSTS"] puis par appel (session(url, RETRIES=0)).
+    - Mesures par hôte en mémoire du processus (metrics()).
+    Les clients sont recréés après un fork (workers gunicorn / Celery).
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._httpx_clients = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    # ---------------- Configuration ----------------
+    @staticmethod
+    def config_for(host: str, overrides: Optional[Dict] = None) -> Dict:
+        config = getattr(settings, "HTTP_CLIENTS", {})
+        return {
+            **DEFAULT_CONFIG,
+            **config.get("DEFAULT", {}),
+            **config.get("HOSTS", {}).get(host, {}),
+            **(overrides or {}),
+        }
+
+    def _check_fork(self):
+        """Connexions héritées d'un processus parent : jamais partagées"""
+        if os.getpid() != self._pid:
+            self._sessions, self._httpx_clients, self._metrics = {}, {}, {}
+            self._pid = os.getpid()
+
+    def metrics_for(self, host: str) -> HostMetrics:
+        metrics = self._metrics.get(host)
+        if metrics is None:
+            with self._lock:
+                metrics = self._metrics.setdefault(host, HostMetrics(self.config_for(host)["POOL_MAXSIZE"]))
+        return metrics
+
+    # ---------------- Clients ----------------
+    def session(self, url_or_host: str, **overrides) -> requests.Session:
+        """Session requests poolée pour l'hôte de l'URL"""
+        host = host_of(url_or_host)
+        key = (host, tuple(sorted(overrides.items())))
+        with self._lock:
+            self._check_fork()
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = self._build_session(host, self.config_for(host, overrides))
+        return session
+
+    def _build_session(self, host: str, config: Dict) -> requests.Session:
+        session = InstrumentedSession(self, (config["CONNECT_TIMEOUT"], config["READ_TIMEOUT"]))
+        retry = Retry(
+            total=config["RETRIES"],
+            backoff_factor=config["BACKOFF"],
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config["POOL_MAXSIZE"], max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._metrics.setdefault(host, HostMetrics(config["POOL_MAXSIZE"]))
+        return session
+
+    def httpx_client(self, url_or_host: str, **overrides) -> httpx.Client:
+        """Client httpx poolé pour l'hôte de l'URL (ne pas utiliser en `with`)"""
+        host = host_of(url_or_host)
+        key = (host, tuple(sorted(overrides.items())))
+        with self._lock:
+            self._check_fork()
+            client = self._httpx_clients.get(key)
+            if client is None:
+                client = self._httpx_clients[key] = self._build_httpx_client(host, self.config_for(host, overrides))
+        return client
+
+    def _build_httpx_client(self, host: str, config: Dict) -> httpx.Client:
+        http2 = bool(config["HTTP2"]) and HTTP2_AVAILABLE
+        limits = httpx.Limits(max_connections=config["POOL_MAXSIZE"], max_keepalive_connections=config["POOL_MAXSIZE"])
+        # Retries httpx : erreurs de connexion uniquement (les POST LLM ne sont pas rejoués)
+        transport = httpx.HTTPTransport(http2=http2, limits=limits, retries=config["RETRIES"])
+        self._metrics.setdefault(host, HostMetrics(config["POOL_MAXSIZE"]))
+        return httpx.Client(
+            transport=InstrumentedTransport(self, transport),
+            timeout=httpx.Timeout(config["READ_TIMEOUT"], connect=config["CONNECT_TIMEOUT"]),
+        )
+
+    # ---------------- Raccourcis ----------------
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.session(url).get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.session(url).post(url, **kwargs)
+
+    # ---------------- Mesures ----------------
+    def metrics(self) -> Dict[str, Dict]:
+        """Mesures par hôte pour ce processus"""
+        with self._lock:
+            self._check_fork()
+            hosts = dict(self._metrics)
+        return {host: metrics.snapshot() for host, metrics in sorted(hosts.items())}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            for client in self._httpx_clients.values():
+                client.close()
+            self._sessions, self._httpx_clients, self._metrics = {}, {}, {}
+
+
+http_clients = OutboundClients()
@@ -0,0 +1,242 @@
+# SmartSaha/services/llm_router.py
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    "HEDGE_DELAY": 4.0,          # s avant de lancer le candidat suivant
+    "TIMEOUT": 60.0,             # délai total d'une question (s)
+    "MAX_PARALLEL": 2,           # tentatives simultanées par question
+    "ATTEMPT_TIMEOUT": 20.0,     # délai max d'une tentative (READ_TIMEOUT des clients HTTP)
+    "FAILURE_THRESHOLD": 3,      # échecs consécutifs avant ouverture du circuit
+    "COOLDOWN": 120,             # s de mise à l'écart après ouverture
+    "RATE_LIMIT_COOLDOWN": 60,   # 429 sans Retry-After
+    "WINDOW": 50,                # tentatives conservées pour les statistiques
+    "CONCURRENT_QUESTIONS": 8,   # questions simultanées attendues ; pool = MAX_PARALLEL × ce nombre
+}
+# Modèle absent ou clé refusée : inutile de réessayer à chaque question
+UNAVAILABLE_STATUS_CODES = {401, 402, 403, 404}
+
+
+class ProviderError(Exception):
+    """Échec d'un appel fournisseur (status HTTP si connu, Retry-After en secondes)"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ModelHealth:
+    """Latences et erreurs récentes d'un modèle, échecs consécutifs (processus courant)"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latence s, succès)
+        self.consecutive_failures = 0
+        self.lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> int:
+        with self.lock:
+            self.samples.append((latency, ok))
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            return self.consecutive_failures
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            samples = list(self.samples)
+            failures = self.consecutive_failures
+        latencies = sorted(latency for latency, ok in samples if ok)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else None
+
+        return {
+            "samples": len(samples),
+            "error_rate": round(sum(1 for _, ok in samples if not ok) / len(samples), 3) if samples else None,
+            "p50_s": percentile(0.5),
+            "p95_s": percentile(0.95),
+            "consecutive_failures": failures,
+        }
+
+
+class LLMRouter:
+    """
+    Routage des questions entre modèles candidats, dans l'ordre de préférence.
+
+    - Requêtes couvertes (hedging) : le premier candidat part seul ; si aucune
+      réponse après HEDGE_DELAY (ou dès qu'il échoue), le suivant est lancé,
+      au plus MAX_PARALLEL à la fois. La première réponse gagne ; les
+      tentatives pas encore démarrées sont annulées, celles en cours sont
+      abandonnées (leur résultat n'alimente plus que les statistiques).
+    - Disjoncteur par modèle : un 429 (Retry-After respecté), un modèle
+      indisponible (401/402/403/404) ou FAILURE_THRESHOLD échecs consécutifs
+      l'écartent pendant COOLDOWN. L'état ouvert est dans le cache Django,
+      partagé par tous les workers ; à l'expiration le modèle est réessayé.
+    - Chaque tentative reçoit son délai, call(model, timeout) avec
+      timeout = min(temps restant, ATTEMPT_TIMEOUT) : une tentative
+      abandonnée libère son thread au plus tard à l'échéance de la question.
+    - Latences et taux d'erreur glissants par modèle (stats()).
+    """
+    CIRCUIT_PREFIX = "llm_circuit"
+
+    def __init__(self, config: Optional[Dict] = None):
+        self._config = config
+        self._health = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def config(self) -> Dict:
+        return {**DEFAULT_CONFIG, **getattr(settings, 'LLM_ROUTER', {}), **(self._config or {})}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                config = self.config
+                self._executor = ThreadPoolExecutor(
+                    max_workers=config["MAX_PARALLEL"] * config["CONCURRENT_QUESTIONS"], thread_name_prefix="llm"
+                )
+            return self._executor
+
+    def health(self, model: str) -> ModelHealth:
+        with self._lock:
+            return self._health.setdefault(model, ModelHealth(self.config["WINDOW"]))
+
+    # ---------------- Disjoncteur ----------------
+    def _circuit_key(self, model: str) -> str:
+        return f"{self.CIRCUIT_PREFIX}:{model}"
+
+    def is_open(self, model: str) -> bool:
+        return cache.get(self._circuit_key(model)) is not None
+
+    def open(self, model: str, seconds: float, reason: str):
+        cache.set(self._circuit_key(model), reason, timeout=max(1, int(seconds)))
+        logger.warning("Modèle %s écarté %ss (%s)", model, int(seconds), reason)
+
+    def reset(self, model: str):
+        cache.delete(self._circuit_key(model))
+
+    def available(self, models: Sequence[str]) -> List[str]:
+        """Candidats dont le circuit est fermé, dans l'ordre de préférence"""
+        circuits = cache.get_many([self._circuit_key(model) for model in models])
+        return [model for model in models if self._circuit_key(model) not in circuits]
+
+    def _record(self, model: str, latency: float, error: Optional[Exception]):
+        config = self.config
+        failures = self.health(model).record(latency, error is None)
+        if error is None:
+            return
+        status = getattr(error, "status", None)
+        if status == 429:
+            self.open(model, getattr(error, "retry_after", None) or config["RATE_LIMIT_COOLDOWN"], "429")
+        elif status in UNAVAILABLE_STATUS_CODES:
+            self.open(model, config["COOLDOWN"], f"HTTP {status}")
+        elif failures >= config["FAILURE_THRESHOLD"]:
+            self.open(model, config["COOLDOWN"], f"{failures} échecs consécutifs")
+
+    def _attempt(self, model: str, call: Callable[[str, float], str], deadline: float) -> str:
+        # Délai calculé au démarrage effectif (la tentative a pu attendre un thread libre)
+        timeout = min(deadline - time.monotonic(), self.config["ATTEMPT_TIMEOUT"])
+        if timeout <= 0:
+            raise ProviderError(f"{model}: délai de la question dépassé avant l'appel")
+        started = time.perf_counter()
+        try:
+            result = call(model, timeout)
+        except Exception as e:
+            self._record(model, time.perf_counter() - started, e)
+            raise
+        self._record(model, time.perf_counter() - started, None)
+        return result
+
+    # ---------------- Routage ----------------
+    def route(self, models: Sequence[str], call: Callable[[str, float], str],
+              hedge_delay: Optional[float] = None, timeout: Optional[float] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Appelle call(model, timeout) sur les candidats disponibles.
+        Retourne (réponse, modèle gagnant) ou (None, None) si tous échouent.
+        """
+        config = self.config
+        hedge_delay = config["HEDGE_DELAY"] if hedge_delay is None else hedge_delay
+        deadline = time.monotonic() + (timeout or config["TIMEOUT"])
+        queue = deque(self.available(models))
+        if not queue:
+            logger.warning("Aucun modèle disponible (circuits ouverts) : %s", list(models))
+            return None, None
+
+        pool, running = self._pool(), {}
+
+        def launch():
+            model = queue.popleft()
+            running[pool.submit(self._attempt, model, call, deadline)] = model
+
+        launch()
+        try:
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("Délai dépassé, tentatives abandonnées : %s", list(running.values()))
+                    return None, None
+                can_hedge = queue and len(running) < config["MAX_PARALLEL"]
+                done, _ = wait(list(running), timeout=min(hedge_delay, remaining) if can_hedge else remaining,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    model = running.pop(future)
+                    try:
+                        return future.result(), model
+                    except Exception as e:
+                        logger.info("Modèle %s en échec : %s", model, e)
+                # Échec ou pas de réponse dans le délai de couverture : candidat suivant
+                if queue and len(running) < config["MAX_PARALLEL"]:
+                    launch()
+            return None, None
+        finally:
+            for future in running:
+                future.cancel()
+
+    def stream(self, models: Sequence[str], open_stream: Callable[[str], Iterator[str]]) -> Iterator[str]:
+        """
+        Version en flux : les candidats sont essayés l'un après l'autre jusqu'au
+        premier morceau reçu (pas de course, chaque flux occupe une connexion).
+        Un échec après le premier morceau est propagé ; la latence enregistrée
+        est le temps jusqu'au premier morceau.
+        """
+        for model in self.available(models):
+            started = time.perf_counter()
+            chunks = open_stream(model)
+            try:
+                first = next(chunks)
+            except StopIteration:
+                self._record(model, time.perf_counter() - started, ProviderError(f"{model}: réponse vide"))
+                continue
+            except Exception as e:
+                self._record(model, time.perf_counter() - started, e)
+                logger.info("Modèle %s en échec : %s", model, e)
+                continue
+            self._record(model, time.perf_counter() - started, None)
+            try:
+                yield first
+                yield from chunks
+            finally:
+                chunks.close()
+            return
+        raise ProviderError("Aucun modèle disponible pour le moment")
+
+    def stats(self) -> Dict[str, Dict]:
+        """Statistiques glissantes (processus courant) et état du circuit par modèle"""
+        with self._lock:
+            models = dict(self._health)
+        return {
+            model: {**health.snapshot(), "circuit": "open" if self.is_open(model) else "closed"}
+            for model, health in sorted(models.items())
+        }
+
+
+llm_router = LLMRouter()
@@ -0,0 +1,104 @@
+# SmartSaha/services/llm_stream.py
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def iter_sse_json(lines: Iterable[str]) -> Iterator[Dict]:
+    """Objets JSON des lignes `data:` d'un flux SSE amont (arrêt sur [DONE])"""
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class StreamStats:
+    """Temps jusqu'au premier morceau (TTFT) et durée des réponses en flux, par fournisseur (processus courant)"""
+
+    def __init__(self, window: int = 100):
+        self.window = window
+        self._samples = {}  # fournisseur -> deque[(ttft s | None, durée s, statut)]
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, ttft: Optional[float], duration: float, outcome: str):
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append((ttft, duration, outcome))
+        logger.info("Flux %s : %s, TTFT %s ms, %s ms", provider, outcome,
+                    round(ttft * 1000) if ttft is not None else None, round(duration * 1000))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            samples = {provider: list(values) for provider, values in self._samples.items()}
+        result = {}
+        for provider, values in sorted(samples.items()):
+            ttfts = sorted(ttft for ttft, _, _ in values if ttft is not None)
+            outcomes = {}
+            for _, _, outcome in values:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+            def percentile(p):
+                return round(ttfts[min(len(ttfts) - 1, int(p * len(ttfts)))] * 1000) if ttfts else None
+
+            result[provider] = {
+                "streams": len(values),
+                "outcomes": outcomes,
+                "ttft_p50_ms": percentile(0.5),
+                "ttft_p95_ms": percentile(0.95),
+                "avg_duration_ms": round(sum(d for _, d, _ in values) / len(values) * 1000) if values else None,
+            }
+        return result
+
+
+stream_stats = StreamStats()
+
+
+def sse_stream(chunks: Iterator[str], provider: str, meta: Optional[Dict] = None) -> Iterator[str]:
+    """
+    Relaye des morceaux de texte en événements SSE : `meta` (optionnel),
+    `token` pour chaque morceau, puis `done` (ttft_ms, duration_ms) ou `error`.
+    Si le client se déconnecte, le flux amont est fermé (connexion libérée).
+    """
+    started = time.perf_counter()
+    ttft, chars, outcome = None, 0, "aborted"
+    try:
+        if meta is not None:
+            yield sse_event("meta", meta)
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if ttft is None:
+                    ttft = time.perf_counter() - started
+                chars += len(chunk)
+                yield sse_event("token", {"text": chunk})
+        except Exception as e:
+            outcome = "error"
+            logger.warning("Flux %s interrompu : %s", provider, e)
+            yield sse_event("error", {"error": str(e)})
+            return
+        outcome = "ok"
+        yield sse_event("done", {
+            "ttft_ms": round(ttft * 1000) if ttft is not None else None,
+            "duration_ms": round((time.perf_counter() - started) * 1000),
+            "chars": chars,
+        })
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        stream_stats.record(provider, ttft, time.perf_counter() - started, outcome)
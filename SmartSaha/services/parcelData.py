@@ -1,7 +1,10 @@
 from functools import lru_cache
 import requests
+from django.db.models import Prefetch
 from django.utils import timezone
 from SmartSaha.models import Parcel, SoilData, WeatherData, YieldRecord, Task
+from SmartSaha.services.soilsGrids import get_soilgrids_data
+from SmartSaha.services.task_statistics import TaskStatisticsService
 
 
 class ParcelDataService:
@@ -13,6 +16,14 @@ class ParcelDataService:
         return parcel.points[0]
 
 
+    @staticmethod
+    def calculate_area(parcel: Parcel):
+        """Surface de la parcelle en hectares (None si le polygone est incomplet)"""
+        from SmartSaha.services.geo import polygon_area_hectares
+
+        area = polygon_area_hectares(parcel.points)
+        return round(area, 4) if area else None
+
     @staticmethod
     def fetch_soil(parcel: Parcel, force_refresh=False):
         """
@@ -20,41 +31,35 @@ class ParcelDataService:
         """
         # Vérifier si on a des données récentes (30 jours) et non-null
         if not force_refresh:
+            # Recherche indexée du dernier échantillon ayant au moins une valeur
             recent_soil = SoilData.objects.filter(
                 parcel=parcel,
-                created_at__gte=timezone.now() - timezone.timedelta(days=30)
+                created_at__gte=timezone.now() - timezone.timedelta(days=30),
+                property_values__mean__isnull=False
             ).order_by('-created_at').first()
 
-            if recent_soil and ParcelDataService.has_valid_soil_data(recent_soil):
+            if recent_soil:
                 print("✅ Utilisation des données sol existantes valides")
                 return recent_soil
 
-        # Si données inexistantes, nulles ou forcées, appeler l'API
-        print("🔄 Appel API SoilGrids pour nouvelles données...")
+        # Si données inexistantes, nulles ou forcées : cache par cellule puis API SoilGrids
+        print("🔄 Lecture SoilGrids (cache par cellule)...")
         point = ParcelDataService.get_first_point(parcel)
         lat, lon = point["lat"], point["lng"]
 
-        url = (
-            f"https://rest.isric.org/soilgrids/v2.0/properties/query?"
-            f"lon={lon}&lat={lat}&property=phh2o&property=soc&property=nitrogen"
-            f"&property=sand&property=clay&property=silt&depth=0-5cm&value=mean"
-        )
-
         try:
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                soil_data = resp.json()
-
-                # Vérifier si les données sont valides (pas toutes null)
-                if ParcelDataService.is_soil_data_valid(soil_data):
-                    return SoilData.objects.create(parcel=parcel, data=soil_data)
-                else:
-                    print("⚠️ Données sol invalides (toutes null), utilisation des valeurs par défaut")
-                    return ParcelDataService.create_default_soil_data(parcel, lat, lon)
+            soil_data = get_soilgrids_data(lon, lat, refresh=force_refresh)
+
+            # Vérifier si les données sont valides (pas toutes null)
+            if ParcelDataService.is_soil_data_valid(soil_data):
+                return SoilData.objects.create(parcel=parcel, data=soil_data)
             else:
-                print(f"❌ Erreur API SoilGrids: {resp.status_code}")
-                return ParcelDataService.get_fallback_soil_data(parcel)
+                print("⚠️ Données sol invalides (toutes null), utilisation des valeurs par défaut")
+                return ParcelDataService.create_default_soil_data(parcel, lat, lon)
 
+        except requests.exceptions.HTTPError as e:
+            print(f"❌ Erreur API SoilGrids: {e.response.status_code if e.response is not None else e}")
+            return ParcelDataService.get_fallback_soil_data(parcel)
         except requests.exceptions.Timeout:
             print("❌ Timeout API SoilGrids")
             return ParcelDataService.get_fallback_soil_data(parcel)
@@ -64,18 +69,10 @@ class ParcelDataService:
 
     @staticmethod
     def has_valid_soil_data(soil_data_obj):
-        """Vérifie si les données sol contiennent des valeurs non-null"""
-        if not soil_data_obj or not soil_data_obj.data:
+        """Vérifie si les données sol contiennent des valeurs non-null (lignes SoilProperty)"""
+        if not soil_data_obj:
             return False
-
-        layers = soil_data_obj.data.get('properties', {}).get('layers', [])
-        for layer in layers:
-            depths = layer.get('depths', [])
-            for depth in depths:
-                mean_value = depth.get('values', {}).get('mean')
-                if mean_value is not None:
-                    return True
-        return False
+        return soil_data_obj.has_values
 
     @staticmethod
     def is_soil_data_valid(soil_data):
@@ -258,8 +255,12 @@ class ParcelDataService:
     @staticmethod
     # @lru_cache(maxsize=128)
     def build_parcel_crops(parcel):
+        # Deux requêtes au total : cultures (culture, variété, statut), puis tâches (statut, priorité)
+        parcel_crops = parcel.parcel_crops.select_related('crop__variety', 'status').prefetch_related(
+            Prefetch('task_set', queryset=Task.objects.select_related('status', 'priority').order_by('due_date'))
+        )
         parcel_crops_info = []
-        for pc in parcel.parcel_crops.all():
+        for pc in parcel_crops:
             tasks_info = [
                 {
                     "id": task.id,
@@ -289,81 +290,85 @@ class ParcelDataService:
     @staticmethod
     # @lru_cache(maxsize=128)
     def build_yield_records(parcel):
-        yield_records = []
-        for pc in parcel.parcel_crops.all():
-            pc_yields = YieldRecord.objects.filter(parcelCrop=pc)
-            for yr in pc_yields:
-                yield_records.append({
-                    "parcel_crop_id": pc.id,
-                    "date": yr.date,
-                    "yield": yr.yield_amount,
-                    "notes": yr.notes
-                })
-        return yield_records
+        # Une seule requête pour toutes les cultures de la parcelle
+        records = YieldRecord.objects.filter(parcelCrop__parcel=parcel).select_related(
+            'parcelCrop__crop'
+        ).order_by('parcelCrop_id', 'date')
+        return [
+            {
+                "parcel_crop_id": yr.parcelCrop_id,
+                "crop": yr.parcelCrop.crop.name,
+                "date": yr.date,
+                "yield": yr.yield_amount,
+                "notes": yr.notes
+            }
+            for yr in records
+        ]
 
     @staticmethod
-    def build_parcel_tasks(parcel):
-        """Récupère toutes les tâches de la parcelle avec statistiques"""
-        tasks = Task.objects.filter(parcelCrop__parcel=parcel).select_related(
-            'parcelCrop', 'status', 'priority'
-        ).order_by('due_date')
-
-        tasks_info = []
-        for task in tasks:
-            tasks_info.append({
-                "id": task.id,
-                "name": task.name,
-                "description": task.description,
-                "due_date": task.due_date,
-                "completed_at": task.completed_at,
-                "created_at": task.created_at,
-                "updated_at": task.updated_at,
-                "status": {
-                    "id": task.status.id if task.status else None,
-                    "name": task.status.name if task.status else None
-                },
-                "priority": {
-                    "id": task.priority.id if task.priority else None,
-                    "name": task.priority.name if task.priority else None
-                },
-                "parcel_crop": {
-                    "id": task.parcelCrop.id,
-                    "crop_name": task.parcelCrop.crop.name if task.parcelCrop.crop else None,
-                    "parcel_name": parcel.parcel_name
-                }
-            })
+    def serialize_task(task, parcel_name):
+        return {
+            "id": task.id,
+            "name": task.name,
+            "description": task.description,
+            "due_date": task.due_date,
+            "completed_at": task.completed_at,
+            "created_at": task.created_at,
+            "updated_at": task.updated_at,
+            "status": {
+                "id": task.status.id if task.status else None,
+                "name": task.status.name if task.status else None
+            },
+            "priority": {
+                "id": task.priority.id if task.priority else None,
+                "name": task.priority.name if task.priority else None
+            },
+            "parcel_crop": {
+                "id": task.parcelCrop.id,
+                "crop_name": task.parcelCrop.crop.name if task.parcelCrop.crop else None,
+                "parcel_name": parcel_name
+            }
+        }
 
-        # Statistiques des tâches
-        task_stats = {
-            "total": tasks.count(),
-            "completed": tasks.filter(completed_at__isnull=False).count(),
-            "pending": tasks.filter(completed_at__isnull=True).count(),
-            "overdue": tasks.filter(
-                completed_at__isnull=True,
-                due_date__lt=timezone.now().date()
-            ).count(),
+    @staticmethod
+    def format_task_statistics(stats):
+        """Statistiques d'une parcelle au format historique de l'API"""
+        return {
+            "total": stats["total"],
+            "completed": stats["completed"],
+            "pending": stats["pending"],
+            "overdue": stats["overdue"],
             "by_priority": {
-                "HIGH": tasks.filter(priority__name="HIGH").count(),
-                "MEDIUM": tasks.filter(priority__name="MEDIUM").count(),
-                "LOW": tasks.filter(priority__name="LOW").count()
+                level: stats["by_priority"].get(level, 0) for level in ("HIGH", "MEDIUM", "LOW")
             }
         }
 
+    @staticmethod
+    def build_parcel_tasks(parcel):
+        """Récupère toutes les tâches de la parcelle avec statistiques"""
+        tasks = Task.objects.filter(parcelCrop__parcel=parcel).select_related(
+            'parcelCrop__crop', 'status', 'priority'
+        ).order_by('due_date')
+
         return {
-            "tasks": tasks_info,
-            "statistics": task_stats
+            "tasks": [ParcelDataService.serialize_task(task, parcel.parcel_name) for task in tasks],
+            "statistics": ParcelDataService.format_task_statistics(
+                TaskStatisticsService.for_parcel(parcel).compute()
+            )
         }
 
     @staticmethod
     def get_tasks_summary(parcel):
         """Version résumée des tâches pour le dashboard"""
-        tasks = Task.objects.filter(parcelCrop__parcel=parcel)
+        statistics = TaskStatisticsService.for_parcel(parcel)
+        today = statistics.today
 
         # Tâches urgentes (échéance dans les 3 jours)
-        urgent_tasks = tasks.filter(
+        urgent_tasks = Task.objects.filter(
+            parcelCrop__parcel=parcel,
             completed_at__isnull=True,
-            due_date__lte=timezone.now().date() + timezone.timedelta(days=3)
-        ).select_related('parcelCrop', 'priority').order_by('due_date')[:5]
+            due_date__lte=today + timezone.timedelta(days=TaskStatisticsService.URGENT_DAYS)
+        ).select_related('parcelCrop__crop', 'priority').order_by('due_date')[:5]
 
         urgent_tasks_list = []
         for task in urgent_tasks:
@@ -373,16 +378,14 @@ class ParcelDataService:
                 "due_date": task.due_date,
                 "priority": task.priority.name if task.priority else None,
                 "crop_name": task.parcelCrop.crop.name if task.parcelCrop.crop else None,
-                "is_overdue": task.due_date < timezone.now().date()
+                "is_overdue": task.due_date < today
             })
 
+        stats = statistics.compute()
         return {
             "urgent_tasks": urgent_tasks_list,
-            "total_pending": tasks.filter(completed_at__isnull=True).count(),
-            "total_overdue": tasks.filter(
-                completed_at__isnull=True,
-                due_date__lt=timezone.now().date()
-            ).count()
+            "total_pending": stats["pending"],
+            "total_overdue": stats["overdue"]
         }
 
     @staticmethod
@@ -411,20 +414,24 @@ class ParcelDataService:
     @staticmethod
     def get_user_parcels_tasks(user):
         """Récupère toutes les tâches de toutes les parcelles d'un utilisateur"""
-        parcels = Parcel.objects.filter(owner=user)
-        all_tasks = []
+        # Deux requêtes au total : les tâches (avec relations) et les statistiques groupées
+        tasks = Task.objects.filter(parcelCrop__parcel__owner=user).select_related(
+            'parcelCrop__parcel', 'parcelCrop__crop', 'status', 'priority'
+        ).order_by('due_date')
+        by_parcel = TaskStatisticsService.for_user(user).compute()["by_parcel"]
 
-        for parcel in parcels:
-            parcel_tasks = ParcelDataService.build_parcel_tasks(parcel)
-            if parcel_tasks["tasks"]:
-                all_tasks.append({
-                    "parcel_name": parcel.parcel_name,
-                    "parcel_uuid": str(parcel.uuid),
-                    "tasks": parcel_tasks["tasks"],
-                    "statistics": parcel_tasks["statistics"]
-                })
+        grouped = {}
+        for task in tasks:
+            parcel = task.parcelCrop.parcel
+            entry = grouped.setdefault(parcel.pk, {
+                "parcel_name": parcel.parcel_name,
+                "parcel_uuid": str(parcel.uuid),
+                "tasks": [],
+                "statistics": ParcelDataService.format_task_statistics(by_parcel[parcel.pk])
+            })
+            entry["tasks"].append(ParcelDataService.serialize_task(task, parcel.parcel_name))
 
-        return all_tasks
+        return list(grouped.values())
 
     @staticmethod
     def format_weather_for_agriculture(weather_data_dict):
@@ -543,27 +550,19 @@ class ParcelDataService:
         if not data:
             return None
 
-        # Calculer le pourcentage de données valides
-        layers = data.get('properties', {}).get('layers', [])
-        valid_data_count = 0
-        total_data_count = 0
-
-        formatted_layers = []
-        for layer in layers:
-            layer_name = layer.get('name')
-            depths = layer.get('depths', [])
-
-            for depth in depths:
-                mean_value = depth.get('values', {}).get('mean')
-                total_data_count += 1
-                if mean_value is not None:
-                    valid_data_count += 1
-
-            formatted_layers.append({
-                "name": layer_name,
-                "depths": depths,
+        # Couches transmises telles quelles (quantiles, incertitude, unités) ;
+        # pourcentage de données valides depuis les lignes normalisées
+        formatted_layers = [
+            {
+                "name": layer.get('name'),
+                "depths": layer.get('depths', []),
                 "unit_measure": layer.get('unit_measure', {})
-            })
+            }
+            for layer in data.get('properties', {}).get('layers', [])
+        ]
+        rows = soil_data_obj.property_rows
+        total_data_count = len(rows)
+        valid_data_count = sum(1 for row in rows if row.mean is not None)
 
         validity_percentage = (valid_data_count / total_data_count * 100) if total_data_count > 0 else 0
 
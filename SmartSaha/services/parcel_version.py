@@ -0,0 +1,38 @@
+# SmartSaha/services/parcel_version.py
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = "parcel_data_version"
+
+
+def _key(parcel_id) -> str:
+    return f"{KEY_PREFIX}:{parcel_id}"
+
+
+def _initial() -> int:
+    # Clé absente (jamais posée ou évincée) : repartir d'une valeur jamais servie
+    return int(time.time() * 1000)
+
+
+def parcel_data_version(parcel_id) -> int:
+    """
+    Version des données d'une parcelle (parcelle, cultures, tâches, rendements,
+    sol, météo, climat), incrémentée à chaque modification. Sert d'empreinte
+    aux caches qui dépendent de ces données (réponses de l'assistant, contexte).
+    """
+    key = _key(parcel_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_parcel_data_version(parcel_id):
+    key = _key(parcel_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, _initial(), timeout=None):
+            cache.incr(key)
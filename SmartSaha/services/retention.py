@@ -0,0 +1,160 @@
+# SmartSaha/services/retention.py
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from SmartSaha.models import ClimateData, SoilData, WeatherData
+from SmartSaha.services.Dashboard import DashboardService
+from SmartSaha.services.parcel_version import bump_parcel_data_version
+from SmartSaha.services.timeseries import TimeSeriesService
+from SmartSaha.signals.dashboard_cache import dashboard_invalidation_suppressed
+from SmartSaha.signals.parcel_version import parcel_version_suppressed
+
+logger = logging.getLogger(__name__)
+
+# Politique par défaut, surchargée par settings.DATA_RETENTION["POLICIES"]
+DEFAULT_POLICIES = {
+    "WeatherData": {"KEEP_LATEST": 5, "MAX_AGE_DAYS": 30, "PURGE_ERRORS": True, "DOWNSAMPLE": True},
+    "ClimateData": {"KEEP_LATEST": 3, "MAX_AGE_DAYS": 90, "PURGE_ERRORS": True, "DOWNSAMPLE": True},
+    "SoilData": {"KEEP_LATEST": 2, "MAX_AGE_DAYS": 180, "PURGE_ERRORS": True, "DOWNSAMPLE": False},
+}
+MODELS = {"WeatherData": WeatherData, "ClimateData": ClimateData, "SoilData": SoilData}
+
+
+class RetentionService:
+    """
+    Rétention des données externes (WeatherData, ClimateData, SoilData).
+
+    Par parcelle, les KEEP_LATEST lignes les plus récentes sont toujours
+    conservées ; au-delà, les lignes plus anciennes que MAX_AGE_DAYS sont
+    supprimées. Les lignes d'erreur (data = {"error": ...}) sont purgées.
+    Avant suppression, les prévisions anciennes sont réduites en valeurs
+    journalières (DailyObservation, via TimeSeriesService).
+    Les suppressions se font par lots d'identifiants (clé primaire), chacun
+    dans sa propre transaction courte, avec une pause entre les lots, sans
+    charger les payloads ni invalider ligne par ligne.
+    """
+
+    def __init__(self, policies: Optional[Dict] = None, batch_size: Optional[int] = None,
+                 pause: Optional[float] = None, now=None):
+        config = getattr(settings, 'DATA_RETENTION', {})
+        self.policies = {
+            name: {**policy, **config.get('POLICIES', {}).get(name, {}), **(policies or {}).get(name, {})}
+            for name, policy in DEFAULT_POLICIES.items()
+        }
+        self.batch_size = batch_size or config.get('BATCH_SIZE', 1000)
+        self.pause = config.get('BATCH_PAUSE', 0.05) if pause is None else pause
+        self.error_grace = timezone.timedelta(hours=config.get('ERROR_GRACE_HOURS', 1))
+        self.now = now or timezone.now()
+
+    # ---------------- Sélection ----------------
+    def error_ids(self, model) -> List[int]:
+        """Lignes d'erreur de collecte (après un délai de grâce)"""
+        return list(
+            model.objects
+            .filter(data__has_key='error', created_at__lt=self.now - self.error_grace)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def expired_ids(self, model, policy, exclude=()) -> List[int]:
+        """Au-delà des KEEP_LATEST plus récentes de chaque parcelle et plus anciennes que MAX_AGE_DAYS"""
+        ranked = model.objects.annotate(
+            keep_rank=Window(
+                RowNumber(),
+                partition_by=[F('parcel_id')],
+                order_by=[F('created_at').desc(), F('id').desc()],
+            )
+        ).filter(keep_rank__gt=policy['KEEP_LATEST']).values('id')
+        # Filtre d'âge hors de la requête fenêtrée : le rang porte sur toutes les lignes de la parcelle
+        queryset = model.objects.filter(id__in=ranked)
+        if policy.get('MAX_AGE_DAYS') is not None:
+            queryset = queryset.filter(created_at__lt=self.now - timezone.timedelta(days=policy['MAX_AGE_DAYS']))
+        excluded = set(exclude)
+        return sorted(pk for pk in queryset.values_list('id', flat=True) if pk not in excluded)
+
+    # ---------------- Mesure ----------------
+    @staticmethod
+    def payload_bytes(model, ids) -> int:
+        """Taille des payloads JSON (pg_column_size sous PostgreSQL, JSON sérialisé sinon)"""
+        if not ids:
+            return 0
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT COALESCE(SUM(pg_column_size(data)), 0) FROM {model._meta.db_table} WHERE id = ANY(%s)",
+                    [list(ids)]
+                )
+                return cursor.fetchone()[0]
+        return sum(len(json.dumps(data)) for data in model.objects.filter(id__in=ids).values_list('data', flat=True))
+
+    # ---------------- Suppression ----------------
+    def _downsample(self, model, ids):
+        """Prévisions / séries conservées en valeurs journalières avant suppression"""
+        rows = []
+        to_rows = (
+            TimeSeriesService.weather_observations if model is WeatherData
+            else TimeSeriesService.climate_observations
+        )
+        for instance in model.objects.filter(id__in=ids).select_related('parcel').order_by('created_at', 'id'):
+            rows.extend(to_rows(instance))
+        return TimeSeriesService.append(rows)
+
+    def _purge(self, model, ids, report, downsample=False, dry_run=False, affected=None):
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            report['bytes'] += self.payload_bytes(model, batch)
+            if dry_run:
+                continue
+            if downsample:
+                report['downsampled'] += self._downsample(model, batch)
+            if affected is not None:
+                affected.update(model.objects.filter(id__in=batch).values_list('parcel_id', 'parcel__owner_id'))
+            # Pas d'invalidation par ligne supprimée (signal + requête parcelle par objet),
+            # ni de chargement des payloads que la purge doit libérer
+            with dashboard_invalidation_suppressed(), parcel_version_suppressed(), transaction.atomic():
+                _, per_model = model.objects.filter(id__in=batch).only('id').delete()
+            for label, count in per_model.items():
+                report['deleted'][label] = report['deleted'].get(label, 0) + count
+            if self.pause:
+                time.sleep(self.pause)
+
+    def apply(self, model_names=None, dry_run=False) -> Dict:
+        """
+        Applique la politique et retourne un rapport par type de données :
+        {"error_rows", "expired_rows", "deleted" (cascade incluse), "bytes", "downsampled"}.
+        """
+        reports = {}
+        for name in model_names or self.policies:
+            model, policy = MODELS[name], self.policies[name]
+            started = time.perf_counter()
+            report = {'error_rows': 0, 'expired_rows': 0, 'deleted': {}, 'bytes': 0, 'downsampled': 0}
+
+            errors = self.error_ids(model) if policy.get('PURGE_ERRORS') else []
+            report['error_rows'] = len(errors)
+            # Une ligne d'erreur peut être la plus récente d'une parcelle : dashboards
+            # et version des données à invalider, une fois par propriétaire / parcelle.
+            # Les lignes expirées ne sont jamais les plus récentes (KEEP_LATEST >= 1).
+            affected = set()
+            self._purge(model, errors, report, dry_run=dry_run, affected=affected)
+            for owner_id in {owner_id for _, owner_id in affected}:
+                DashboardService.on_data_change(owner_id, name)
+            for parcel_id in {parcel_id for parcel_id, _ in affected}:
+                bump_parcel_data_version(parcel_id)
+
+            expired = self.expired_ids(model, policy, exclude=errors if dry_run else ())
+            report['expired_rows'] = len(expired)
+            downsample = policy.get('DOWNSAMPLE') and model is not SoilData
+            self._purge(model, expired, report, downsample=downsample, dry_run=dry_run)
+
+            report['duration_s'] = round(time.perf_counter() - started, 3)
+            logger.info("Rétention %s : %s", name, report)
+            reports[name] = report
+        return reports
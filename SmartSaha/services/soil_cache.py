@@ -0,0 +1,173 @@
+# SmartSaha/services/soil_cache.py
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from SmartSaha.services.geo import grid_cell, cell_center, cell_key
+
+logger = logging.getLogger(__name__)
+
+# Marqueur stocké pour un point connu sans données (océan, zone urbaine...)
+NULL_SOIL = {"__soil__": "null"}
+
+
+def soil_has_values(data: Optional[Dict]) -> bool:
+    """True si la réponse SoilGrids/OpenEPI contient au moins une moyenne non-null"""
+    if not data:
+        return False
+    for layer in data.get("properties", {}).get("layers", []):
+        for depth in layer.get("depths", []):
+            if depth.get("values", {}).get("mean") is not None:
+                return True
+    return False
+
+
+class SoilLookupService:
+    """
+    Cache partagé des propriétés du sol (0-5cm) par cellule de grille.
+
+    Les propriétés du sol ne changent pratiquement pas : une réponse amont
+    (SoilGrids ou OpenEPI) est conservée plusieurs mois pour toutes les
+    parcelles de la même cellule. L'appel amont est fait au centre de la cellule.
+    - Coalescence : les appels concurrents sur une cellule attendent un seul
+      appel amont (verrou par clé dans le processus, cache.add entre workers).
+    - Cache négatif : un point sans aucune valeur est mémorisé (TTL plus court)
+      pour ne pas réinterroger l'API à chaque demande.
+    Les erreurs amont (timeout, HTTP 5xx...) ne sont jamais mises en cache.
+    """
+    KEY_PREFIX = "soil_cell"
+    STATS_KEYS = ("hits", "misses", "negative_hits", "coalesced")
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, cell_degrees: Optional[float] = None, timeout: Optional[int] = None):
+        config = getattr(settings, 'SOIL_CACHE', {})
+        self.cell_degrees = cell_degrees or config.get('CELL_DEGREES', 0.0025)
+        self.timeout = timeout or config.get('TIMEOUT', 60 * 60 * 24 * 180)
+        self.negative_timeout = config.get('NEGATIVE_TIMEOUT', 60 * 60 * 24 * 30)
+        self.lock_timeout = config.get('LOCK_TIMEOUT', 30)
+        self.wait_timeout = config.get('WAIT_TIMEOUT', 20)
+        self.enabled = config.get('ENABLED', True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # ---------------- Cellules ----------------
+    def locate(self, latitude: float, longitude: float) -> Tuple[str, Tuple[float, float]]:
+        """Retourne (clé de cellule, centre de la cellule) pour un point"""
+        cell = grid_cell(latitude, longitude, self.cell_degrees)
+        return cell_key(cell, self.cell_degrees), cell_center(cell, self.cell_degrees)
+
+    def _key(self, cell: str, source: str) -> str:
+        return f"{self.KEY_PREFIX}:{source}:{cell}"
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # ---------------- Lecture / écriture ----------------
+    def _cached(self, key: str) -> Tuple[bool, Optional[Dict]]:
+        """(trouvé, données) ; données None pour un point connu sans valeurs"""
+        entry = cache.get(key)
+        if entry is None:
+            return False, None
+        if entry == NULL_SOIL:
+            self._incr("negative_hits")
+            return True, None
+        self._incr("hits")
+        return True, entry
+
+    def _wait_for_owner(self, key: str, lock_key: str) -> Tuple[bool, Optional[Dict]]:
+        """Attend la réponse d'un autre worker qui détient déjà l'appel amont"""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            found, data = self._cached(key)
+            if found:
+                self._incr("coalesced")
+                return True, data
+            if cache.get(lock_key) is None:
+                # Le détenteur a échoué (erreur amont non mise en cache)
+                break
+            time.sleep(self.POLL_INTERVAL)
+        return False, None
+
+    def lookup(self, latitude: float, longitude: float,
+               fetcher: Callable[[float, float], Optional[Dict]],
+               source: str = "soilgrids", refresh: bool = False) -> Tuple[Optional[Dict], bool]:
+        """
+        Retourne (données, hit) pour la cellule du point ; données None si le
+        point est connu sans valeurs. `fetcher(lat, lon)` n'est appelé qu'en cas
+        de miss (ou refresh=True), avec le centre de la cellule, et peut lever
+        une exception (propagée, rien n'est mis en cache).
+        """
+        if not self.enabled:
+            data = fetcher(latitude, longitude)
+            return (data if soil_has_values(data) else None), False
+
+        cell, (center_lat, center_lon) = self.locate(latitude, longitude)
+        key = self._key(cell, source)
+
+        if not refresh:
+            found, data = self._cached(key)
+            if found:
+                return data, True
+
+        with self._lock_for(key):
+            # Un autre thread a pu remplir la cellule pendant l'attente du verrou
+            if not refresh:
+                found, data = self._cached(key)
+                if found:
+                    self._incr("coalesced")
+                    return data, True
+
+            lock_key = f"{key}:lock"
+            if not cache.add(lock_key, 1, timeout=self.lock_timeout):
+                found, data = self._wait_for_owner(key, lock_key)
+                if found:
+                    return data, True
+
+            try:
+                self._incr("misses")
+                data = fetcher(center_lat, center_lon)
+                if soil_has_values(data):
+                    cache.set(key, data, timeout=self.timeout)
+                    return data, False
+                logger.info("Sol sans valeurs pour la cellule %s (%s), mis en cache négatif", cell, source)
+                cache.set(key, NULL_SOIL, timeout=self.negative_timeout)
+                return None, False
+            finally:
+                cache.delete(lock_key)
+
+    def invalidate(self, latitude: float, longitude: float, source: str = "soilgrids"):
+        cell, _ = self.locate(latitude, longitude)
+        cache.delete(self._key(cell, source))
+
+    # ---------------- Statistiques ----------------
+    def _incr(self, name: str):
+        key = f"{self.KEY_PREFIX}:stats:{name}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+
+    def stats(self) -> Dict:
+        """Compteurs cumulés : hits (dont négatifs), misses et appels coalescés"""
+        values = cache.get_many([f"{self.KEY_PREFIX}:stats:{name}" for name in self.STATS_KEYS])
+        counts = {name: values.get(f"{self.KEY_PREFIX}:stats:{name}", 0) for name in self.STATS_KEYS}
+        served = counts["hits"] + counts["negative_hits"]
+        total = served + counts["misses"]
+        return {
+            **counts,
+            'api_calls_saved': served,
+            'hit_rate': round(served / total, 3) if total else None,
+            'cell_degrees': self.cell_degrees,
+        }
+
+    def reset_stats(self):
+        cache.delete_many([f"{self.KEY_PREFIX}:stats:{name}" for name in self.STATS_KEYS])
+
+
+soil_lookup = SoilLookupService()
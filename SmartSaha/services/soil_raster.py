@@ -0,0 +1,165 @@
+# SmartSaha/services/soil_raster.py
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import rasterio
+    from rasterio.transform import rowcol
+    from rasterio.warp import transform as warp_transform
+    from rasterio.windows import Window
+except ImportError:  # backend optionnel : pip install rasterio
+    rasterio = None
+
+logger = logging.getLogger(__name__)
+
+# Emprise Madagascar (même bbox que fire/fireDetector.py) : lat_min, lat_max, lon_min, lon_max
+MADAGASCAR_BBOX = (-25.0, -12.0, 43.0, 51.0)
+
+# Unités des rasters SoilGrids (valeurs entières, mapped_units)
+SOILGRIDS_UNITS = {
+    "phh2o": {"d_factor": 10, "mapped_units": "pH*10", "target_units": "-"},
+    "soc": {"d_factor": 10, "mapped_units": "dg/kg", "target_units": "g/kg"},
+    "nitrogen": {"d_factor": 100, "mapped_units": "cg/kg", "target_units": "g/kg"},
+    "sand": {"d_factor": 10, "mapped_units": "g/kg", "target_units": "%"},
+    "clay": {"d_factor": 10, "mapped_units": "g/kg", "target_units": "%"},
+    "silt": {"d_factor": 10, "mapped_units": "g/kg", "target_units": "%"},
+}
+DEPTH_RANGES = {"0-5cm": (0, 5), "5-15cm": (5, 15), "15-30cm": (15, 30)}
+
+
+class SoilRasterBackend:
+    """
+    Lecture locale des tuiles SoilGrids pré-téléchargées (GeoTIFF/COG, une par
+    propriété : `<ROOT>/<propriété>_<profondeur>_mean.tif`).
+
+    Seules les fenêtres nécessaires sont lues (read par Window : GDAL ne charge
+    que les blocs concernés) ; en lot, une seule fenêtre englobante par
+    propriété, indexée ensuite avec numpy. Aucune requête réseau : quelques
+    millisecondes au lieu de 10-20 s vers rest.isric.org.
+    La réponse a la forme `properties.layers` de l'API SoilGrids attendue
+    par SoilData.data. Inactif si rasterio n'est pas installé ou si les
+    tuiles sont absentes.
+    """
+    MAX_WINDOW_PIXELS = 50_000_000  # au-delà, lecture point par point
+
+    def __init__(self, root: Optional[str] = None, properties: Optional[Iterable[str]] = None):
+        config = getattr(settings, 'SOIL_RASTER', {})
+        self.enabled = config.get('ENABLED', True)
+        self.root = root or config.get('ROOT', os.path.join(settings.BASE_DIR, 'data', 'soilgrids'))
+        self.bbox = tuple(config.get('BBOX', MADAGASCAR_BBOX))
+        self.depth = config.get('DEPTH', '0-5cm')
+        self.properties = list(properties or config.get('PROPERTIES', SOILGRIDS_UNITS.keys()))
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    # ---------------- Disponibilité ----------------
+    def path_for(self, prop: str) -> str:
+        return os.path.join(self.root, f"{prop}_{self.depth}_mean.tif")
+
+    @property
+    def available(self) -> bool:
+        if not self.enabled or rasterio is None:
+            return False
+        return all(os.path.exists(self.path_for(prop)) for prop in self.properties)
+
+    def covers(self, latitude: float, longitude: float) -> bool:
+        lat_min, lat_max, lon_min, lon_max = self.bbox
+        return self.available and lat_min <= latitude <= lat_max and lon_min <= longitude <= lon_max
+
+    def _dataset(self, prop: str):
+        if prop not in self._datasets:
+            self._datasets[prop] = rasterio.open(self.path_for(prop))
+        return self._datasets[prop]
+
+    def close(self):
+        with self._lock:
+            for dataset in self._datasets.values():
+                dataset.close()
+            self._datasets = {}
+
+    # ---------------- Lecture ----------------
+    @staticmethod
+    def _pixels(dataset, latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+        """(lignes, colonnes) des points dans la grille du raster"""
+        xs, ys = list(longitudes), list(latitudes)
+        if dataset.crs and not dataset.crs.is_geographic:
+            # Tuiles SoilGrids natives en Homolosine (ESRI:54052)
+            xs, ys = warp_transform("EPSG:4326", dataset.crs, xs, ys)
+        rows, cols = rowcol(dataset.transform, xs, ys)
+        return np.atleast_1d(np.asarray(rows)), np.atleast_1d(np.asarray(cols))
+
+    def _read_values(self, dataset, rows: np.ndarray, cols: np.ndarray) -> List[Optional[float]]:
+        inside = (rows >= 0) & (rows < dataset.height) & (cols >= 0) & (cols < dataset.width)
+        values = np.full(len(rows), np.nan)
+        if not inside.any():
+            return [None] * len(rows)
+
+        r, c = rows[inside], cols[inside]
+        r0, c0 = int(r.min()), int(c.min())
+        height, width = int(r.max()) - r0 + 1, int(c.max()) - c0 + 1
+        if height * width <= self.MAX_WINDOW_PIXELS:
+            block = dataset.read(1, window=Window(c0, r0, width, height), masked=True)
+            picked = block[r - r0, c - c0]
+            values[inside] = np.ma.filled(picked.astype(float), np.nan)
+        else:
+            picked = [
+                dataset.read(1, window=Window(int(ci), int(ri), 1, 1), masked=True)[0, 0]
+                for ri, ci in zip(r, c)
+            ]
+            values[inside] = [np.nan if v is np.ma.masked else float(v) for v in picked]
+
+        return [None if np.isnan(v) else float(v) for v in values]
+
+    def _layer(self, prop: str, mean: Optional[float]) -> Dict:
+        top, bottom = DEPTH_RANGES.get(self.depth, (None, None))
+        return {
+            "name": prop,
+            "unit_measure": dict(SOILGRIDS_UNITS.get(prop, {})),
+            "depths": [{
+                "label": self.depth,
+                "range": {"top_depth": top, "bottom_depth": bottom, "unit_depth": "cm"},
+                "values": {"mean": mean},
+            }],
+        }
+
+    def sample_many(self, points: List[Tuple[float, float]]) -> List[Optional[Dict]]:
+        """
+        Payloads SoilGrids pour une liste de (lat, lon), dans le même ordre.
+        None pour les points hors emprise.
+        """
+        if not points or not self.available:
+            return [None] * len(points)
+
+        latitudes = [lat for lat, _ in points]
+        longitudes = [lon for _, lon in points]
+        columns = {}
+        with self._lock:  # les datasets rasterio ne sont pas thread-safe
+            for prop in self.properties:
+                dataset = self._dataset(prop)
+                rows, cols = self._pixels(dataset, latitudes, longitudes)
+                columns[prop] = self._read_values(dataset, rows, cols)
+
+        payloads = []
+        for i, (lat, lon) in enumerate(points):
+            lat_min, lat_max, lon_min, lon_max = self.bbox
+            if not (lat_min <= lat <= lat_max and lon_min <= lon <= lon_max):
+                payloads.append(None)
+                continue
+            payloads.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"layers": [self._layer(prop, columns[prop][i]) for prop in self.properties]},
+                "metadata": {"source": "soilgrids_raster"},
+            })
+        return payloads
+
+    def sample(self, latitude: float, longitude: float) -> Optional[Dict]:
+        return self.sample_many([(latitude, longitude)])[0]
+
+
+soil_raster = SoilRasterBackend()
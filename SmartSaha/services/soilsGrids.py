@@ -1,9 +1,14 @@
 # SmartSaha/services/soil_service.py
-import requests
+from SmartSaha.services.http_clients import http_clients
+from SmartSaha.services.soil_cache import soil_lookup, soil_has_values
+from SmartSaha.services.soil_raster import soil_raster
 
 OPEN_EPI_URL = "https://api.openepi.io/soil/property"
+SOILGRIDS_URL = "https://rest.isric.org/soilgrids/v2.0/properties/query"
 
-def get_soil_data(longitude, latitude):
+
+def fetch_openepi_soil(latitude, longitude):
+    """Appel brut OpenEPI (sans cache)"""
     url = (
         f"{OPEN_EPI_URL}?lon={longitude}&lat={latitude}"
         "&depths=0-5cm"
@@ -18,6 +23,40 @@ def get_soil_data(longitude, latitude):
         "&properties=silt"
         "&values=mean"
     )
-    response = requests.get(url, timeout=20)
+    response = http_clients.get(url)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_soilgrids_soil(latitude, longitude):
+    """Appel brut SoilGrids (sans cache)"""
+    url = (
+        f"{SOILGRIDS_URL}?"
+        f"lon={longitude}&lat={latitude}&property=phh2o&property=soc&property=nitrogen"
+        f"&property=sand&property=clay&property=silt&depth=0-5cm&value=mean"
+    )
+    response = http_clients.get(url)
     response.raise_for_status()
     return response.json()
+
+
+def get_soil_data(longitude, latitude):
+    """Propriétés OpenEPI via le cache par cellule (None si le point n'a pas de données)"""
+    data, _ = soil_lookup.lookup(float(latitude), float(longitude), fetch_openepi_soil, source="openepi")
+    return data
+
+
+def get_soilgrids_data(longitude, latitude, refresh=False):
+    """
+    Propriétés SoilGrids (None si le point n'a pas de données) : tuiles locales
+    si elles couvrent le point, sinon API via le cache par cellule.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    if soil_raster.covers(latitude, longitude):
+        data = soil_raster.sample(latitude, longitude)
+        return data if soil_has_values(data) else None
+
+    data, _ = soil_lookup.lookup(
+        latitude, longitude, fetch_soilgrids_soil, source="soilgrids", refresh=refresh
+    )
+    return data
@@ -0,0 +1,74 @@
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from SmartSaha.models import Task
+
+
+class TaskStatisticsService:
+    """
+    Statistiques de tâches (par parcelle, statut, priorité, en retard, urgentes)
+    calculées en une seule requête groupée, quel que soit le nombre de parcelles.
+    """
+    URGENT_DAYS = 3  # échéance dans les 3 jours
+    DONE_STATUS = "Done"
+
+    def __init__(self, tasks, today=None):
+        self.tasks = tasks
+        self.today = today or timezone.now().date()
+
+    @classmethod
+    def for_user(cls, user, **kwargs):
+        return cls(Task.objects.filter(parcelCrop__parcel__owner=user), **kwargs)
+
+    @classmethod
+    def for_parcel(cls, parcel, **kwargs):
+        return cls(Task.objects.filter(parcelCrop__parcel=parcel), **kwargs)
+
+    def grouped_rows(self):
+        """Une ligne par (parcelle, statut, priorité) avec les compteurs conditionnels"""
+        open_tasks = Q(completed_at__isnull=True)
+        return (
+            self.tasks
+            .values("parcelCrop__parcel_id", "status__name", "priority__name")
+            .annotate(
+                total=Count("id"),
+                completed=Count("id", filter=Q(completed_at__isnull=False)),
+                overdue=Count("id", filter=open_tasks & Q(due_date__lt=self.today)),
+                urgent=Count(
+                    "id",
+                    filter=open_tasks & Q(due_date__lte=self.today + timezone.timedelta(days=self.URGENT_DAYS))
+                ),
+            )
+            .order_by()
+        )
+
+    @staticmethod
+    def empty_stats():
+        return {
+            "total": 0, "completed": 0, "pending": 0, "overdue": 0, "urgent": 0, "done_status": 0,
+            "by_status": {}, "by_priority": {},
+        }
+
+    @classmethod
+    def _add(cls, stats, row):
+        for field in ("total", "completed", "overdue", "urgent"):
+            stats[field] += row[field]
+        stats["pending"] += row["total"] - row["completed"]
+        if row["status__name"] == cls.DONE_STATUS:
+            stats["done_status"] += row["total"]
+        status, priority = row["status__name"], row["priority__name"]
+        stats["by_status"][status] = stats["by_status"].get(status, 0) + row["total"]
+        stats["by_priority"][priority] = stats["by_priority"].get(priority, 0) + row["total"]
+
+    def compute(self):
+        """
+        Retourne les totaux globaux et un détail "by_parcel" ({parcel_id: totaux}).
+        done_status compte les tâches au statut "Done" (completed se base sur completed_at).
+        """
+        stats = self.empty_stats()
+        stats["by_parcel"] = {}
+        for row in self.grouped_rows():
+            self._add(stats, row)
+            parcel_stats = stats["by_parcel"].setdefault(row["parcelCrop__parcel_id"], self.empty_stats())
+            self._add(parcel_stats, row)
+        return stats
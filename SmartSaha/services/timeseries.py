@@ -0,0 +1,167 @@
+# SmartSaha/services/timeseries.py
+import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from SmartSaha.models import ClimateData, DailyObservation, ForecastDay, WeatherData
+from SmartSaha.services.climate_store import ClimateStore, parse_power_date
+from SmartSaha.services.geo import grid_cell, cell_key
+
+try:
+    import pandas as pd
+except ImportError:  # DataFrame optionnel : les tableaux NumPy suffisent
+    pd = None
+
+WEATHER_SOURCE = "weatherapi"
+CLIMATE_SOURCE = ClimateStore.SOURCE
+# Variables météo : colonnes typées de ForecastDay (max_temp_c, total_precip_mm...)
+WEATHER_VARIABLES = tuple(ForecastDay.API_FIELDS)
+
+
+class TimeSeriesService:
+    """
+    Historique climat / météo au format long (DailyObservation) : une valeur
+    par (source, cellule, variable, jour) au lieu de payloads JSON complets.
+
+    - Météo (WeatherAPI) : cellule de WEATHER_GRID_CACHE, un jour déjà connu
+      est remplacé par la prévision la plus récente.
+    - Climat (NASA POWER) : cellule de CLIMATE_STORE (voir ClimateStore).
+    Les lectures renvoient un axe journalier dense et des tableaux NumPy
+    (NaN pour les jours absents), ou un DataFrame pandas.
+    """
+    UNIQUE_FIELDS = ['source', 'cell', 'variable', 'date']
+    WATERMARK_PREFIX = "timeseries_loaded"
+
+    # ---------------- Cellules ----------------
+    @staticmethod
+    def cell_degrees(source: str) -> float:
+        if source == WEATHER_SOURCE:
+            return getattr(settings, 'WEATHER_GRID_CACHE', {}).get('CELL_DEGREES', 0.01)
+        return getattr(settings, 'CLIMATE_STORE', {}).get('CELL_DEGREES', 0.5)
+
+    @classmethod
+    def cell_for(cls, latitude: float, longitude: float, source: str = WEATHER_SOURCE) -> str:
+        degrees = cls.cell_degrees(source)
+        return cell_key(grid_cell(latitude, longitude, degrees), degrees)
+
+    @classmethod
+    def parcel_cell(cls, parcel, source: str = WEATHER_SOURCE) -> Optional[str]:
+        if not parcel.points:
+            return None
+        point = parcel.points[0]
+        return cls.cell_for(point["lat"], point["lng"], source)
+
+    # ---------------- Ingestion ----------------
+    @classmethod
+    def weather_observations(cls, weather_data, cell: Optional[str] = None) -> List[DailyObservation]:
+        """Lignes d'un WeatherData (depuis ses jours de prévision typés)"""
+        cell = cell or cls.parcel_cell(weather_data.parcel, WEATHER_SOURCE)
+        if cell is None:
+            return []
+        return [
+            DailyObservation(source=WEATHER_SOURCE, cell=cell, variable=variable,
+                             date=day.date, value=getattr(day, variable))
+            for day in ForecastDay.build_for(weather_data)
+            for variable in WEATHER_VARIABLES
+            if getattr(day, variable) is not None
+        ]
+
+    @classmethod
+    def climate_observations(cls, climate_data, cell: Optional[str] = None) -> List[DailyObservation]:
+        """Lignes d'un ClimateData au format NASA POWER (properties.parameter)"""
+        cell = cell or cls.parcel_cell(climate_data.parcel, CLIMATE_SOURCE)
+        if cell is None or not isinstance(climate_data.data, dict):
+            return []
+        return ClimateStore.rows_from_payload(cell, climate_data.data)
+
+    @classmethod
+    def append(cls, rows: Iterable[DailyObservation], batch_size: int = 1000) -> int:
+        """Insertion groupée ; un jour déjà présent prend la valeur la plus récente"""
+        # Une même clé ne peut apparaître qu'une fois par INSERT ... ON CONFLICT
+        latest = {(row.source, row.cell, row.variable, row.date): row for row in rows}
+        if latest:
+            DailyObservation.objects.bulk_create(
+                list(latest.values()), batch_size=batch_size, update_conflicts=True,
+                unique_fields=cls.UNIQUE_FIELDS, update_fields=['value', 'fetched_at'],
+            )
+        return len(latest)
+
+    @classmethod
+    def load(cls, model, since=None, batch_size: int = 500) -> Tuple[int, Optional[datetime.datetime]]:
+        """
+        Charge les lignes JSON existantes (WeatherData ou ClimateData), des plus
+        anciennes aux plus récentes, créées après `since`.
+        Retourne (observations écrites, created_at de la dernière ligne lue).
+        """
+        to_rows = cls.weather_observations if model is WeatherData else cls.climate_observations
+        queryset = model.objects.select_related('parcel').order_by('created_at', 'id')
+        if since is not None:
+            queryset = queryset.filter(created_at__gt=since)
+
+        written, pending, last_seen = 0, [], since
+        for instance in queryset.iterator(chunk_size=batch_size):
+            pending.extend(to_rows(instance))
+            last_seen = instance.created_at
+            if len(pending) >= batch_size * 10:
+                written += cls.append(pending)
+                pending = []
+        written += cls.append(pending)
+        return written, last_seen
+
+    @classmethod
+    def load_new(cls) -> Dict[str, int]:
+        """Chargement incrémental (repère created_at conservé dans le cache)"""
+        written = {}
+        for model in (WeatherData, ClimateData):
+            key = f"{cls.WATERMARK_PREFIX}:{model.__name__.lower()}"
+            written[model.__name__], last_seen = cls.load(model, since=cache.get(key))
+            if last_seen is not None:
+                cache.set(key, last_seen, timeout=None)
+        return written
+
+    # ---------------- Lecture ----------------
+    @staticmethod
+    def _dates(start, end) -> Tuple[datetime.date, datetime.date]:
+        return parse_power_date(start), parse_power_date(end)
+
+    @classmethod
+    def arrays(cls, cell: str, start, end, variables: Optional[Sequence[str]] = None,
+               source: str = WEATHER_SOURCE) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        (dates datetime64[D], {variable: float64}) sur [start, end] ;
+        NaN pour les jours sans observation. Une seule requête.
+        """
+        start, end = cls._dates(start, end)
+        size = max((end - start).days + 1, 0)
+        dates = np.arange(np.datetime64(start, 'D'), np.datetime64(start, 'D') + size)
+
+        queryset = DailyObservation.objects.filter(source=source, cell=cell, date__range=(start, end))
+        if variables:
+            queryset = queryset.filter(variable__in=variables)
+        series = {variable: np.full(size, np.nan) for variable in (variables or [])}
+        for variable, day, value in queryset.values_list('variable', 'date', 'value').order_by():
+            values = series.get(variable)
+            if values is None:
+                values = series[variable] = np.full(size, np.nan)
+            values[(day - start).days] = np.nan if value is None else value
+        return dates, series
+
+    @classmethod
+    def frame(cls, cell: str, start, end, variables: Optional[Sequence[str]] = None,
+              source: str = WEATHER_SOURCE):
+        """Même série sous forme de DataFrame (index : dates, colonnes : variables)"""
+        if pd is None:
+            raise ImportError("pandas est requis pour TimeSeriesService.frame (pip install pandas)")
+        dates, series = cls.arrays(cell, start, end, variables, source)
+        return pd.DataFrame(series, index=pd.DatetimeIndex(dates, name='date'))
+
+    @classmethod
+    def parcel_arrays(cls, parcel, start, end, variables: Optional[Sequence[str]] = None,
+                      source: str = WEATHER_SOURCE):
+        cell = cls.parcel_cell(parcel, source)
+        if cell is None:
+            return np.array([], dtype='datetime64[D]'), {}
+        return cls.arrays(cell, start, end, variables, source)
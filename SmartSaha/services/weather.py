@@ -106,15 +106,6 @@ class WeatherDataService:
 class AgriculturalAnalyzer:
     """Analyseur agricole concret"""
 
-    def __init__(self):
-        self.risk_thresholds = {
-            'heavy_rain': 20.0,
-            'frost': 5.0,
-            'drought': {'precip': 0.0, 'temp': 30.0},
-            'strong_wind': 30.0,
-            'high_humidity': 85.0
-        }
-
     def analyze_weather_data(self, weather_data) -> Dict:
         """Analyse complète des données météo pour l'SmartSaha"""
         return {
@@ -127,42 +118,42 @@ class AgriculturalAnalyzer:
     def _find_optimal_planting_days(self, weather_data):
         """Trouve les jours optimaux pour les semis"""
         optimal_days = []
-        forecast_days = weather_data.data.get('forecast', {}).get('forecastday', [])
 
-        for day in forecast_days:
-            day_data = day['day']
-            if self._is_optimal_planting_day(day_data):
+        for row in weather_data.forecast_rows:
+            if self._is_optimal_planting_day(row):
                 optimal_days.append({
-                    'date': day['date'],
-                    'score': self._calculate_planting_score(day_data),
+                    'date': row.date.isoformat(),
+                    'score': self._calculate_planting_score(row),
                     'conditions': {
-                        'temperature': day_data['avgtemp_c'],
-                        'precipitation': day_data['totalprecip_mm'],
-                        'humidity': day_data['avghumidity']
+                        'temperature': row.avg_temp_c,
+                        'precipitation': row.total_precip_mm,
+                        'humidity': row.avg_humidity
                     }
                 })
 
         return sorted(optimal_days, key=lambda x: x['score'], reverse=True)[:3]
 
-    def _is_optimal_planting_day(self, day_data: Dict) -> bool:
+    def _is_optimal_planting_day(self, row) -> bool:
         """Détermine si c'est un bon jour pour planter"""
-        return (25 >= day_data['avgtemp_c'] >= 10 > day_data['totalprecip_mm'] and
-                day_data['maxwind_kph'] < 25 and
-                day_data['daily_chance_of_rain'] < 40)
+        if None in (row.avg_temp_c, row.total_precip_mm, row.max_wind_kph, row.chance_of_rain):
+            return False
+        return (25 >= row.avg_temp_c >= 10 > row.total_precip_mm and
+                row.max_wind_kph < 25 and
+                row.chance_of_rain < 40)
 
-    def _calculate_planting_score(self, day_data: Dict) -> int:
+    def _calculate_planting_score(self, row) -> int:
         """Calcule un score de pertinence pour la plantation"""
         score = 0
 
         # Température idéale = 20°C
-        temp_diff = abs(day_data['avgtemp_c'] - 20)
+        temp_diff = abs(row.avg_temp_c - 20)
         score += max(0, 30 - temp_diff * 3)
 
         # Peu de pluie = mieux
-        score += max(0, 25 - day_data['totalprecip_mm'])
+        score += max(0, 25 - row.total_precip_mm)
 
         # Vent modéré
-        score += max(0, 20 - day_data['maxwind_kph'] / 2)
+        score += max(0, 20 - row.max_wind_kph / 2)
 
         return min(100, score)
 
@@ -191,88 +182,11 @@ class AgriculturalAnalyzer:
 
     # AJOUT DE LA MÉTHODE MANQUANTE
     def analyze_risks(self, weather_data: Dict) -> List[Dict]:
-        """Analyse les risques agricoles - Méthode utilisée par le serializer"""
-        risks = []
-        forecast_days = weather_data.get('forecast', {}).get('forecastday', [])
+        """Analyse les risques agricoles - Méthode utilisée par le serializer (table RISK_RULES)"""
+        from SmartSaha.services.alert_rules import RuleFrame, days_from_api, risk_rule_engine
 
-        for day in forecast_days:
-            risks.extend(self._analyze_day_risks(day))
-
-        return risks
-
-    def _analyze_day_risks(self, day_data: Dict) -> List[Dict]:
-        """Analyse les risques pour une journée spécifique"""
-        risks = []
-        day_info = day_data['day']
-        date = day_data['date']
-
-        # Heavy Rain Risk
-        if day_info['totalprecip_mm'] > self.risk_thresholds['heavy_rain']:
-            risks.append({
-                'type': 'HEAVY_RAIN',
-                'date': date,
-                'severity': 'HIGH',
-                'message': f"🌧️ Pluie intense prévue: {day_info['totalprecip_mm']}mm",
-                'metrics': {
-                    'precipitation': day_info['totalprecip_mm'],
-                    'chance_of_rain': day_info.get('daily_chance_of_rain', 0)
-                }
-            })
-
-        # Frost Risk
-        if day_info['mintemp_c'] < self.risk_thresholds['frost']:
-            risks.append({
-                'type': 'FROST_RISK',
-                'date': date,
-                'severity': 'HIGH',
-                'message': f"❄️ Risque de gel: {day_info['mintemp_c']}°C",
-                'metrics': {
-                    'min_temperature': day_info['mintemp_c'],
-                    'avg_temperature': day_info['avgtemp_c']
-                }
-            })
-
-        # Drought Risk
-        if (day_info['totalprecip_mm'] <= self.risk_thresholds['drought']['precip'] and
-                day_info['avgtemp_c'] > self.risk_thresholds['drought']['temp']):
-            risks.append({
-                'type': 'DROUGHT_RISK',
-                'date': date,
-                'severity': 'MEDIUM',
-                'message': f"🌵 Risque de sécheresse: {day_info['avgtemp_c']}°C sans pluie",
-                'metrics': {
-                    'precipitation': day_info['totalprecip_mm'],
-                    'temperature': day_info['avgtemp_c']
-                }
-            })
-
-        # Strong Wind Risk
-        if day_info['maxwind_kph'] > self.risk_thresholds['strong_wind']:
-            risks.append({
-                'type': 'STRONG_WIND',
-                'date': date,
-                'severity': 'MEDIUM',
-                'message': f"💨 Vent fort: {day_info['maxwind_kph']} km/h",
-                'metrics': {
-                    'wind_speed': day_info['maxwind_kph'],
-                    'wind_direction': day_info.get('wind_dir', 'N/A')
-                }
-            })
-
-        # High Humidity Risk (maladies fongiques)
-        if day_info['avghumidity'] > self.risk_thresholds['high_humidity']:
-            risks.append({
-                'type': 'HIGH_HUMIDITY',
-                'date': date,
-                'severity': 'MEDIUM',
-                'message': f"💧 Humidité élevée: {day_info['avghumidity']}%",
-                'metrics': {
-                    'humidity': day_info['avghumidity'],
-                    'condition': day_info['condition']['text']
-                }
-            })
-
-        return risks
+        frame = RuleFrame.from_days([(None, days_from_api(weather_data), ())])
+        return risk_rule_engine.evaluate(frame)[0]
 
 # SmartSaha/services/weather_api_client.py
 import requests
@@ -281,6 +195,8 @@ from typing import Dict, Optional
 from django.conf import settings
 from django.utils import timezone
 
+from SmartSaha.services.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 
@@ -292,7 +208,18 @@ class WeatherAPIClient:
         self.base_url = "http://api.weatherapi.com/v1"
 
     def get_forecast(self, latitude: float, longitude: float, days: int = 3) -> Optional[Dict]:
-        """Récupère les prévisions météo pour une localisation"""
+        """Récupère les prévisions météo (partagées par cellule de grille)"""
+        from SmartSaha.services.forecast_cache import forecast_cell_cache
+
+        data, _ = forecast_cell_cache.get_or_fetch(
+            latitude, longitude, days,
+            lambda lat, lon: self._fetch_forecast(lat, lon, days),
+            variant='fr'
+        )
+        return data
+
+    def _fetch_forecast(self, latitude: float, longitude: float, days: int = 3) -> Optional[Dict]:
+        """Appel direct à l'API (sans cache)"""
         try:
             url = f"{self.base_url}/forecast.json"
             params = {
@@ -302,7 +229,7 @@ class WeatherAPIClient:
                 'lang': 'fr'
             }
 
-            response = requests.get(url, params=params, timeout=10)
+            response = http_clients.get(url, params=params)
             response.raise_for_status()
 
             return response.json()
@@ -324,8 +251,9 @@ class WeatherDataCollector:
 
     def __init__(self):
         self.api_client = WeatherAPIClient()
-        from SmartSaha.services import WeatherDataService
+        from SmartSaha.services import WeatherDataService, WeatherCollectionEngine
         self.weather_service = WeatherDataService()
+        self.engine = WeatherCollectionEngine(max_workers=1)
 
     def _extract_center_from_points(self, points_data) -> Tuple[Optional[float], Optional[float]]:
         """Extrait le centre du polygone de points"""
@@ -360,25 +288,12 @@ class WeatherDataCollector:
             point = ParcelDataService.get_first_point(parcel)
             lat, lon = point["lat"], point["lng"]
 
-            # Appel API avec 8 jours de prévision
-            url = "http://api.weatherapi.com/v1/forecast.json"
-            params = {
-                'key': settings.WEATHER_API_KEY,
-                'q': f"{lat},{lon}",
-                'days': forecast_days,  # 8 jours
-                'aqi': 'no',
-                'alerts': 'no'
-            }
-
-            if not include_hourly:
-                params['hour'] = '0'  # Exclure les données horaires
-
-            print(f"🔍 Appel API Weather avec params: {params}")  # Debug
-            response = requests.get(url, params=params)
+            # Appel API partagé par cellule (timeout + retries gérés par le moteur de collecte)
+            logger.debug("Appel API Weather pour (%s, %s) sur %s jours", lat, lon, forecast_days)
+            data, attempts, error, cache_hit = self.engine.fetch_cell_forecast(lat, lon, forecast_days, include_hourly)
 
-            if response.status_code == 200:
-                data = response.json()
-                print(f"📊 Données reçues: {len(data.get('forecast', {}).get('forecastday', []))} jours")  # Debug
+            if data is not None:
+                logger.debug("Données reçues: %s jours", len(data.get('forecast', {}).get('forecastday', [])))
 
                 # Créer l'objet WeatherData
                 weather_data = WeatherData.objects.create(
@@ -391,11 +306,11 @@ class WeatherDataCollector:
                     risk_level='LOW'
                 )
 
-                return {'success': True, 'weather_data': weather_data}
+                return {'success': True, 'weather_data': weather_data, 'attempts': attempts, 'cache_hit': cache_hit}
             else:
-                print(f"❌ Erreur API: {response.status_code} - {response.text}")  # Debug
-                return {'success': False, 'error': f"API error: {response.status_code}"}
+                logger.warning("Erreur API Weather pour la parcelle %s: %s", parcel.uuid, error)
+                return {'success': False, 'error': error, 'attempts': attempts}
 
         except Exception as e:
-            print(f"❌ Exception: {str(e)}")  # Debug
+            logger.warning("Collecte météo de la parcelle %s en échec: %s", getattr(parcel, 'uuid', None), e)
             return {'success': False, 'error': str(e)}
\ No newline at end of file
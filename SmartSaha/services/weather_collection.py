@@ -0,0 +1,291 @@
+# SmartSaha/services/weather_collection.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from SmartSaha.models import WeatherData, ForecastDay
+from SmartSaha.services import ParcelDataService, DashboardService
+from SmartSaha.services.forecast_cache import forecast_cell_cache
+from SmartSaha.services.http_clients import http_clients
+from SmartSaha.services.parcel_version import bump_parcel_data_version
+from SmartSaha.services.timeseries import TimeSeriesService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEATHER_API_BASE_URL = "http://api.weatherapi.com/v1"
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """
+    Limiteur de débit par hôte (token bucket), partagé entre les threads.
+    rate_per_second <= 0 désactive la limitation.
+    """
+
+    def __init__(self, rate_per_second: float, burst: Optional[int] = None):
+        self.rate = float(rate_per_second or 0)
+        self.capacity = float(burst or max(1, int(self.rate)))
+        self._buckets = {}  # host -> (tokens, dernier remplissage)
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str):
+        """Bloque jusqu'à ce qu'un jeton soit disponible pour l'hôte"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.capacity, now))
+                tokens = min(self.capacity, tokens + (now - last) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class WeatherCollectionEngine:
+    """
+    Moteur de collecte météo pour toute la flotte de parcelles :
+    - appels WeatherAPI concurrents (pool de threads borné),
+    - limitation de débit par hôte et retries avec backoff exponentiel,
+    - un seul appel par cellule de grille (ForecastCellCache), partagé par
+      toutes les parcelles de la cellule,
+    - écriture groupée des WeatherData (bulk_create),
+    - rapport par parcelle avec le débit obtenu (parcelles/minute).
+
+    Les appels HTTP sont faits dans les threads, les écritures en base restent
+    dans le thread appelant (une seule connexion DB).
+    """
+
+    def __init__(self, max_workers=None, rate_per_second=None, max_retries=None,
+                 timeout=None, backoff=None, batch_size=None, base_url=None, api_key=None,
+                 cell_cache=None):
+        config = getattr(settings, 'WEATHER_COLLECTION', {})
+
+        self.max_workers = max_workers or config.get('MAX_WORKERS', 8)
+        self.rate_per_second = rate_per_second if rate_per_second is not None else config.get('RATE_PER_SECOND', 10)
+        self.max_retries = max_retries if max_retries is not None else config.get('MAX_RETRIES', 3)
+        self.timeout = timeout or config.get('TIMEOUT', 10)
+        self.backoff = backoff if backoff is not None else config.get('BACKOFF', 0.5)
+        self.batch_size = batch_size or config.get('BATCH_SIZE', 500)
+
+        self.base_url = (base_url or getattr(settings, 'WEATHER_API_BASE_URL', DEFAULT_WEATHER_API_BASE_URL)).rstrip('/')
+        self.api_key = api_key or getattr(settings, 'WEATHER_API_KEY', None)
+        self.host = urlparse(self.base_url).netloc
+
+        self.cell_cache = cell_cache or forecast_cell_cache
+        self.rate_limiter = HostRateLimiter(self.rate_per_second)
+        # Session partagée du registre ; retries gérés ici (limiteur de débit entre deux essais)
+        self.session = http_clients.session(self.base_url, RETRIES=0, POOL_MAXSIZE=self.max_workers)
+
+    # ---------------- HTTP ----------------
+    def fetch_forecast(self, latitude: float, longitude: float, days: int = 3,
+                       include_hourly: bool = False) -> Tuple[Optional[Dict], int, Optional[str]]:
+        """
+        Récupère une prévision avec retries.
+        Retourne (données, nombre de tentatives, erreur).
+        """
+        params = {
+            'key': self.api_key,
+            'q': f"{latitude},{longitude}",
+            'days': days,
+            'aqi': 'no',
+            'alerts': 'no'
+        }
+        if not include_hourly:
+            params['hour'] = '0'  # Exclure les données horaires
+
+        error = None
+        attempts = 0
+        for attempt in range(self.max_retries + 1):
+            attempts = attempt + 1
+            self.rate_limiter.acquire(self.host)
+            retry_after = None
+            try:
+                response = self.session.get(f"{self.base_url}/forecast.json", params=params, timeout=self.timeout)
+                if response.status_code == 200:
+                    return response.json(), attempts, None
+
+                error = f"API error: {response.status_code}"
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+                retry_after = response.headers.get('Retry-After')
+
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = str(e)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                error = str(e)
+                break
+
+            if attempt < self.max_retries:
+                delay = self.backoff * (2 ** attempt)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                time.sleep(delay)
+
+        logger.warning(f"Échec collecte météo ({latitude},{longitude}) après {attempts} tentative(s): {error}")
+        return None, attempts, error
+
+    def fetch_cell_forecast(self, latitude: float, longitude: float, days: int = 3,
+                            include_hourly: bool = False) -> Tuple[Optional[Dict], int, Optional[str], bool]:
+        """
+        Prévision partagée par la cellule de grille du point.
+        Retourne (données, tentatives, erreur, hit cache) ; 0 tentative sur un hit.
+        """
+        outcome = {'attempts': 0, 'error': None}
+
+        def fetch(lat, lon):
+            data, outcome['attempts'], outcome['error'] = self.fetch_forecast(lat, lon, days, include_hourly)
+            return data
+
+        variant = 'hourly' if include_hourly else 'daily'
+        data, hit = self.cell_cache.get_or_fetch(latitude, longitude, days, fetch, variant=variant)
+        return data, outcome['attempts'], outcome['error'], hit
+
+    # ---------------- Collecte ----------------
+    def collect(self, parcels: Iterable, forecast_days: int = 3, include_hourly: bool = False) -> Dict:
+        """Collecte et enregistre les prévisions de toutes les parcelles fournies"""
+        started = time.perf_counter()
+        reports = []
+        targets = []
+
+        for parcel in parcels:
+            try:
+                point = ParcelDataService.get_first_point(parcel)
+                targets.append((parcel, point["lat"], point["lng"]))
+            except (ValueError, KeyError, TypeError) as e:
+                reports.append(self._report(parcel, success=False, error=f"Coordonnées invalides: {e}"))
+
+        # Regroupement par cellule : un seul appel amont pour les parcelles voisines
+        cells = {}
+        for parcel, lat, lon in targets:
+            cell, _ = self.cell_cache.locate(lat, lon)
+            cells.setdefault(cell, []).append((parcel, lat, lon))
+
+        fetched = []
+        api_calls = 0
+        if cells:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(cells))) as pool:
+                futures = {
+                    pool.submit(self.fetch_cell_forecast, members[0][1], members[0][2],
+                                forecast_days, include_hourly): (cell, members)
+                    for cell, members in cells.items()
+                }
+                for future in as_completed(futures):
+                    cell, members = futures[future]
+                    data, attempts, error, hit = future.result()
+                    if not hit:
+                        api_calls += 1
+                    for index, (parcel, lat, lon) in enumerate(members):
+                        # Seule la première parcelle de la cellule porte l'appel réel
+                        shared = hit or index > 0
+                        fetched.append((parcel, (lat, lon), data, 0 if shared else attempts, error, cell, shared))
+
+        instances = []
+        for parcel, coordinates, data, attempts, error, cell, shared in fetched:
+            if data is None:
+                reports.append(self._report(parcel, False, coordinates, attempts, error, cell=cell))
+                continue
+            weather_data = self.build_weather_data(parcel, data, forecast_days)
+            instances.append((parcel, coordinates, attempts, cell, shared, weather_data))
+
+        created = WeatherData.objects.bulk_create(
+            [weather_data for *_, weather_data in instances],
+            batch_size=self.batch_size
+        )
+        # Jours de prévision normalisés, également en une écriture groupée
+        forecast_rows = []
+        for weather_data in created:
+            weather_data._forecast_rows = ForecastDay.build_for(weather_data)
+            forecast_rows.extend(weather_data._forecast_rows)
+        ForecastDay.objects.bulk_create(forecast_rows, batch_size=self.batch_size)
+        # Série journalière (DailyObservation) alimentée dans la même passe : pas de signal post_save
+        TimeSeriesService.append(
+            [row for weather_data in created for row in TimeSeriesService.weather_observations(weather_data)],
+            batch_size=self.batch_size
+        )
+        # bulk_create n'émet pas de signaux : invalidation explicite des blocs météo
+        # et des versions de parcelle (réponses de l'assistant, contexte)
+        parcels_by_owner = {}
+        for weather_data in created:
+            parcels_by_owner.setdefault(weather_data.parcel.owner_id, set()).add(weather_data.parcel_id)
+        for owner_id, parcel_ids in parcels_by_owner.items():
+            transaction.on_commit(
+                lambda owner_id=owner_id, parcel_ids=parcel_ids: self._on_weather_written(owner_id, parcel_ids)
+            )
+        for (parcel, coordinates, attempts, cell, shared, _), weather_data in zip(instances, created):
+            reports.append(self._report(parcel, True, coordinates, attempts, weather_data=weather_data,
+                                        cell=cell, shared=shared))
+
+        duration = time.perf_counter() - started
+        success_count = sum(1 for r in reports if r['success'])
+
+        return {
+            'total': len(reports),
+            'success': success_count,
+            'failed': len(reports) - success_count,
+            'duration_s': round(duration, 3),
+            'parcels_per_minute': round(len(reports) / duration * 60, 1) if duration > 0 else None,
+            'api_calls': api_calls,
+            'api_calls_saved': len(targets) - api_calls,
+            'cells': len(cells),
+            'results': reports
+        }
+
+    @staticmethod
+    def _on_weather_written(owner_id, parcel_ids):
+        DashboardService.on_data_change(owner_id, "WeatherData")
+        for parcel_id in parcel_ids:
+            bump_parcel_data_version(parcel_id)
+
+    def build_weather_data(self, parcel, data: Dict, forecast_days: int = 3) -> WeatherData:
+        """Construit (sans sauvegarder) l'objet WeatherData d'une réponse API"""
+        today = timezone.now().date()
+        weather_data = WeatherData(
+            parcel=parcel,
+            data=data,
+            start=today,
+            end=today + timezone.timedelta(days=forecast_days - 1),
+            location_name=data.get('location', {}).get('name', 'Unknown'),
+            data_type='FORECAST'
+        )
+        # bulk_create n'appelle pas save() : calcul explicite des métadonnées
+        weather_data.prepare_metadata()
+        return weather_data
+
+    @staticmethod
+    def _report(parcel, success: bool, coordinates=None, attempts: int = 0,
+                error: Optional[str] = None, weather_data: Optional[WeatherData] = None,
+                cell: Optional[str] = None, shared: bool = False) -> Dict:
+        return {
+            'parcel_uuid': str(parcel.uuid),
+            'parcel_name': parcel.parcel_name,
+            'success': success,
+            'coordinates_used': coordinates,
+            'attempts': attempts,
+            'weather_data_id': weather_data.pk if weather_data else None,
+            'grid_cell': cell,
+            'shared_forecast': shared,
+            'error': error
+        }
+
+
+def collect_fleet_weather(parcels=None, **engine_options) -> Dict:
+    """Raccourci : collecte pour toutes les parcelles ayant des points GPS"""
+    from SmartSaha.models import Parcel
+
+    if parcels is None:
+        parcels = Parcel.objects.filter(points__isnull=False).exclude(points=[])
+    forecast_days = engine_options.pop('forecast_days', 3)
+    return WeatherCollectionEngine(**engine_options).collect(parcels, forecast_days=forecast_days)
@@ -1,52 +1,66 @@
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from SmartSaha.models import Parcel, ParcelCrop, YieldRecord, YieldForecast, Task, SoilData, ClimateData
+from SmartSaha.models import Parcel, ParcelCrop, YieldRecord, Task, SoilData, WeatherData
 
+# Chemin vers le propriétaire de chaque modèle suivi par DashboardService.BLOCKS
+OWNER_PATHS = {
+    Parcel: ("owner_id",),
+    ParcelCrop: ("parcel", "owner_id"),
+    SoilData: ("parcel", "owner_id"),
+    WeatherData: ("parcel", "owner_id"),
+    YieldRecord: ("parcelCrop", "parcel", "owner_id"),
+    Task: ("parcelCrop", "parcel", "owner_id"),
+}
 
-def invalidate_dashboard_cache(user_id):
-    cache_key = f"dashboard_full_{user_id}"
-    cache.delete(cache_key)
 
-@receiver([post_save, post_delete], sender=Parcel)
-def clear_dashboard_cache_parcel(sender, instance, **kwargs):
-    if instance.owner_id:
-        invalidate_dashboard_cache(instance.owner_id)
+def resolve_owner_id(instance):
+    value = instance
+    for attr in OWNER_PATHS[type(instance)]:
+        try:
+            value = getattr(value, attr)
+        except ObjectDoesNotExist:
+            # Parent déjà supprimé (cascade) : son propre signal a tout invalidé
+            return None
+        if value is None:
+            return None
+    return value
 
-@receiver([post_save, post_delete], sender=ParcelCrop)
-def clear_dashboard_cache_parcelcrop(sender, instance, **kwargs):
-    if instance.parcel.owner_id:
-        invalidate_dashboard_cache(instance.parcel.owner_id)
-
-@receiver([post_save, post_delete], sender=YieldRecord)
-def clear_dashboard_cache_yield(sender, instance, **kwargs):
-    if instance.parcelCrop.parcel.owner_id:
-        invalidate_dashboard_cache(instance.parcelCrop.parcel.owner_id)
 
-@receiver([post_save, post_delete], sender=YieldForecast)
-def clear_dashboard_cache_forecast(sender, instance, **kwargs):
-    if instance.parcelCrop.parcel.owner_id:
-        invalidate_dashboard_cache(instance.parcelCrop.parcel.owner_id)
+_suppressed = threading.local()
 
 
-def invalidate_user_dashboard(instance):
-    user = None
-    if hasattr(instance, "owner"):
-        user = instance.owner
-    elif hasattr(instance, "parcel") and instance.parcel.owner:
-        user = instance.parcel.owner
-    elif hasattr(instance, "parcelCrop") and instance.parcelCrop.parcel.owner:
-        user = instance.parcelCrop.parcel.owner
+@contextmanager
+def dashboard_invalidation_suppressed():
+    """
+    Ignore les signaux d'invalidation dans le thread courant (suppressions en
+    masse) : l'appelant invalide lui-même, une fois par propriétaire.
+    """
+    previous = getattr(_suppressed, "active", False)
+    _suppressed.active = True
+    try:
+        yield
+    finally:
+        _suppressed.active = previous
 
-    if user:
-        cache.delete(f"dashboard_{user.id}")
 
 @receiver([post_save, post_delete], sender=Parcel)
 @receiver([post_save, post_delete], sender=ParcelCrop)
 @receiver([post_save, post_delete], sender=YieldRecord)
 @receiver([post_save, post_delete], sender=Task)
 @receiver([post_save, post_delete], sender=SoilData)
-@receiver([post_save, post_delete], sender=ClimateData)
+@receiver([post_save, post_delete], sender=WeatherData)
+def invalidate_dashboard_blocks(sender, instance, **kwargs):
+    if getattr(_suppressed, "active", False):
+        return
+    owner_id = resolve_owner_id(instance)
+    if owner_id is None:
+        return
+    from SmartSaha.services.Dashboard import DashboardService
 
-def invalidate_cache_on_change(sender, instance, **kwargs):
-    invalidate_user_dashboard(instance)
\ No newline at end of file
+    # Après commit : un lecteur concurrent ne peut pas remettre en cache l'état précédent
+    transaction.on_commit(lambda: DashboardService.on_data_change(owner_id, sender.__name__))
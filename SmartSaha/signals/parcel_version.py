@@ -0,0 +1,66 @@
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from SmartSaha.models import ClimateData, Parcel, ParcelCrop, SoilData, Task, WeatherData, YieldRecord
+from SmartSaha.services.parcel_version import bump_parcel_data_version
+
+# Chemin vers la parcelle de chaque modèle lu par ContextBuilder
+PARCEL_PATHS = {
+    Parcel: ("pk",),
+    ParcelCrop: ("parcel_id",),
+    SoilData: ("parcel_id",),
+    WeatherData: ("parcel_id",),
+    ClimateData: ("parcel_id",),
+    YieldRecord: ("parcelCrop", "parcel_id"),
+    Task: ("parcelCrop", "parcel_id"),
+}
+
+
+def resolve_parcel_id(instance):
+    value = instance
+    for attr in PARCEL_PATHS[type(instance)]:
+        try:
+            value = getattr(value, attr)
+        except ObjectDoesNotExist:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+_suppressed = threading.local()
+
+
+@contextmanager
+def parcel_version_suppressed():
+    """
+    Ignore les incréments de version dans le thread courant (suppressions en
+    masse) : l'appelant incrémente lui-même, une fois par parcelle concernée.
+    """
+    previous = getattr(_suppressed, "active", False)
+    _suppressed.active = True
+    try:
+        yield
+    finally:
+        _suppressed.active = previous
+
+
+@receiver([post_save, post_delete], sender=Parcel)
+@receiver([post_save, post_delete], sender=ParcelCrop)
+@receiver([post_save, post_delete], sender=SoilData)
+@receiver([post_save, post_delete], sender=WeatherData)
+@receiver([post_save, post_delete], sender=ClimateData)
+@receiver([post_save, post_delete], sender=YieldRecord)
+@receiver([post_save, post_delete], sender=Task)
+def bump_version(sender, instance, **kwargs):
+    if getattr(_suppressed, "active", False):
+        return
+    parcel_id = resolve_parcel_id(instance)
+    if parcel_id is None:
+        return
+    transaction.on_commit(lambda: bump_parcel_data_version(parcel_id))
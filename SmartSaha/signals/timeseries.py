@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from SmartSaha.models import ClimateData, WeatherData
+from SmartSaha.services.timeseries import TimeSeriesService
+
+
+@receiver(post_save, sender=WeatherData)
+def append_weather_observations(sender, instance, created, **kwargs):
+    """Chaque WeatherData enregistré alimente la série journalière (jours déjà connus remplacés)"""
+    TimeSeriesService.append(TimeSeriesService.weather_observations(instance))
+
+
+@receiver(post_save, sender=ClimateData)
+def append_climate_observations(sender, instance, created, **kwargs):
+    TimeSeriesService.append(TimeSeriesService.climate_observations(instance))
@@ -0,0 +1,35 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def precompute_user_dashboard(user_id):
+    """Recalcule le dashboard d'un utilisateur et son snapshot BIReport"""
+    from SmartSaha.services import DashboardService
+
+    if not DashboardService.precompute_for_user(user_id):
+        logger.info(f"Précalcul dashboard {user_id} déjà en cours, passage regroupé")
+
+
+@shared_task
+def collect_weather_data(days=3):
+    """Collecte météo quotidienne de toutes les parcelles géolocalisées"""
+    from SmartSaha.models import Parcel
+    from SmartSaha.services import WeatherCollectionEngine
+
+    parcels = Parcel.objects.filter(points__isnull=False).exclude(points=[])
+    # collect() alimente aussi la série journalière (DailyObservation)
+    report = WeatherCollectionEngine().collect(parcels, forecast_days=days)
+    # Les dashboards des propriétaires sont précalculés via DashboardService.on_data_change
+    return {key: report[key] for key in ('total', 'success', 'failed', 'duration_s', 'api_calls')}
+
+
+@shared_task
+def apply_data_retention():
+    """Purge hebdomadaire des données externes (politique DATA_RETENTION)"""
+    from SmartSaha.services import RetentionService
+
+    return RetentionService().apply()
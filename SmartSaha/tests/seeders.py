@@ -1,3 +1,5 @@
+import datetime
+
 from SmartSaha.models import Organisation, GroupType, Group, GroupRole, MemberGroup
 
 def seed_organisation():
@@ -15,3 +17,48 @@ def seed_group_role():
 
 def seed_member(user, group, role):
     return MemberGroup.objects.create(user=user, group=group, role=role, status="ACTIVE")
+
+
+def forecast_payload(days=3, location="Antananarivo", **day_overrides):
+    """Réponse WeatherAPI minimale (forecast.json) pour les tests"""
+    forecast_days = []
+    for i in range(days):
+        day = {
+            "maxtemp_c": 27.0, "mintemp_c": 16.0, "avgtemp_c": 21.0,
+            "totalprecip_mm": 2.0, "maxwind_kph": 12.0, "avghumidity": 70,
+            "daily_chance_of_rain": 20, "condition": {"text": "Ensoleillé"},
+        }
+        day.update(day_overrides)
+        forecast_days.append({"date": f"2025-01-{i + 1:02d}", "day": day})
+
+    return {
+        "location": {"name": location},
+        "current": {"temp_c": 22.0, "humidity": 65, "precip_mm": 0.0, "condition": {"text": "Ensoleillé"}},
+        "forecast": {"forecastday": forecast_days},
+    }
+
+
+def power_payload(start, end, unpublished_after=None):
+    """Réponse NASA POWER simulée : T2M = jour du mois, PRECTOTCORR = 1.5"""
+    days = [start + datetime.timedelta(days=i) for i in range((end - start).days + 1)]
+    published = [d for d in days if unpublished_after is None or d <= unpublished_after]
+    return {
+        "header": {"fill_value": -999.0},
+        "properties": {"parameter": {
+            "T2M": {d.strftime("%Y%m%d"): float(d.day) if d in published else -999.0 for d in days},
+            "PRECTOTCORR": {d.strftime("%Y%m%d"): 1.5 if d in published else -999.0 for d in days},
+        }},
+    }
+
+
+def soil_payload(**means):
+    """Réponse SoilGrids simulée : une couche 0-5cm par propriété (moyenne brute, d_factor 10)"""
+    return {
+        "type": "Feature",
+        "properties": {"layers": [
+            {"name": name, "depths": [{"label": "0-5cm", "range": {"top_depth": 0, "bottom_depth": 5},
+                                       "values": {"mean": mean}}],
+             "unit_measure": {"d_factor": 10, "mapped_units": "g/kg", "target_units": "%"}}
+            for name, mean in means.items()
+        ]},
+    }
@@ -0,0 +1,118 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from SmartSaha.management.commands.benchmark_alert_rules import Command as BenchmarkCommand
+from SmartSaha.models import Alert, Parcel, WeatherData
+from SmartSaha.services import AlertService
+from SmartSaha.services.alert_rules import AlertRuleEngine, RuleFrame, WEATHER_RULES, PEST_RULES
+from SmartSaha.tests.seeders import forecast_payload
+
+User = get_user_model()
+
+
+class TestAlertRuleEngine:
+    def test_vectorized_matches_python_path(self):
+        """Le passage NumPy donne exactement les alertes du chemin Python parcelle par parcelle."""
+        entries = BenchmarkCommand._synthetic_entries(300, 7, seed=1)
+        engine = AlertRuleEngine(WEATHER_RULES + PEST_RULES)
+
+        assert engine.evaluate(RuleFrame.from_days(entries)) == engine.evaluate_python(entries)
+
+    def test_exclusive_group_and_crop_filter(self):
+        """Une seule alerte gel par jour, et la règle 'cultures sensibles' ne vise que ces cultures."""
+        day = {'date': '2025-01-01', 'min_temp': 8.0, 'max_temp': 20.0, 'avg_temp': 14.0, 'precip': 30.0}
+        frost_day = {**day, 'date': '2025-01-02', 'min_temp': 2.0}
+        entries = [("riz", [day, frost_day], ["riz"]), ("manioc", [day, frost_day], ["manioc"])]
+
+        rice, cassava = AlertRuleEngine(WEATHER_RULES).evaluate(RuleFrame.from_days(entries))
+
+        assert [a['type'] for a in rice if 'GEL' in a['type']] == ['❄️ RISQUE GEL', '❄️ GEL EXTRÊME']
+        assert [a['type'] for a in cassava if 'GEL' in a['type']] == ['❄️ GEL EXTRÊME']
+
+
+@pytest.mark.django_db
+class TestAlertService:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="alerts", email="alerts@test.com", password="pass123")
+        self.client.force_authenticate(user=self.user)
+        self.parcels = []
+        for i in range(3):
+            parcel = Parcel.objects.create(owner=self.user, parcel_name=f"P{i}", points=[{"lat": -18.9, "lng": 47.5}])
+            WeatherData.objects.create(
+                parcel=parcel, data=forecast_payload(days=3, mintemp_c=3.0, avghumidity=90, avgtemp_c=20.0),
+                start="2025-01-01", end="2025-01-03", data_type="FORECAST"
+            )
+            self.parcels.append(parcel)
+
+    def test_weather_alerts_from_analysis(self):
+        """generate_weather_alerts accepte le résultat de get_weather_analysis."""
+        weather = WeatherData.objects.get(parcel=self.parcels[0])
+        alerts = AlertService.generate_weather_alerts(self.parcels[0], {'weather_data': weather})
+
+        assert [a['severity'] for a in alerts if 'GEL' in a['type']] == ['CRITICAL'] * 3
+
+    def test_bulk_alerts_single_pass(self, django_assert_max_num_queries):
+        """Toutes les parcelles d'un utilisateur sont évaluées en un passage, à nombre de requêtes constant."""
+        with django_assert_max_num_queries(4):
+            alerts = AlertService.generate_bulk_weather_alerts(Parcel.objects.filter(owner=self.user))
+
+        assert set(alerts) == {str(p.uuid) for p in self.parcels}
+        for parcel_alerts in alerts.values():
+            assert sum(1 for a in parcel_alerts if a['type'] == '🦠 RISQUE MILDIU') == 3
+
+    def test_bulk_save_alerts_deduplicates(self, django_assert_max_num_queries):
+        """Les alertes sont écrites en lot ; les doublons sont comptés sans requête par ligne."""
+        parcel = self.parcels[0]
+        alerts = AlertService.generate_weather_alerts(parcel, WeatherData.objects.get(parcel=parcel))
+
+        # savepoint, verrou de la parcelle, clés existantes, insertion groupée, release
+        with django_assert_max_num_queries(5):
+            first = AlertService.bulk_save_alerts(parcel, alerts + alerts[:1])
+        second = AlertService.bulk_save_alerts(parcel, alerts)
+
+        assert first == {'created': len(alerts), 'skipped': 1}
+        assert second == {'created': 0, 'skipped': len(alerts)}
+        assert Alert.objects.filter(parcel=parcel).count() == len(alerts)
+
+    def _dashboard_stats(self):
+        response = self.client.get(reverse("alert-dashboard-stats"))
+        assert response.status_code == 200
+        return response.data
+
+    def test_dashboard_stats_constant_queries(self, django_assert_max_num_queries):
+        """dashboard_stats fait un nombre fixe de requêtes, quel que soit le nombre de parcelles."""
+        for parcel in self.parcels:
+            AlertService.bulk_save_alerts(parcel, AlertService.generate_weather_alerts(
+                parcel, WeatherData.objects.get(parcel=parcel)
+            ))
+        for i in range(10):
+            Parcel.objects.create(owner=self.user, parcel_name=f"Extra{i}", points=[])
+        cache.clear()
+
+        with django_assert_max_num_queries(6):
+            stats = self._dashboard_stats()
+
+        assert stats["unread_count"] == stats["total_alerts"] > 0
+        assert len(stats["parcel_breakdown"]) == 13
+        assert sum(p["alert_count"] for p in stats["parcel_breakdown"]) == stats["unread_count"]
+
+    def test_dashboard_stats_cache_invalidated_on_write(self, django_assert_num_queries):
+        """Le résumé est servi depuis le cache, puis recalculé après une écriture."""
+        assert self._dashboard_stats()["total_alerts"] == 0
+        with django_assert_num_queries(0):
+            self._dashboard_stats()
+
+        parcel = self.parcels[0]
+        AlertService.bulk_save_alerts(parcel, AlertService.generate_weather_alerts(
+            parcel, WeatherData.objects.get(parcel=parcel)
+        ))
+        assert self._dashboard_stats()["unread_count"] > 0
+
+        self.client.post(reverse("alert-mark-all-read"))
+        assert self._dashboard_stats()["unread_count"] == 0
@@ -0,0 +1,107 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from SmartSaha.models import Parcel, SoilData
+from SmartSaha.services import AnswerCache, ClimateStore, SimpleAIClient, WeatherCollectionEngine, chatbot
+from SmartSaha.tests.seeders import forecast_payload, power_payload
+
+User = get_user_model()
+
+
+class TestAnswerCache:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        self.cache = AnswerCache({"SEMANTIC": True})
+        self.fingerprint = AnswerCache.fingerprint("test")
+
+    def test_exact_and_semantic_tiers(self):
+        """Reformulation (accents, mots vides, ponctuation) servie ; autre culture non servie."""
+        self.cache.set("Quand planter du riz à Madagascar ?", self.fingerprint, "Novembre-décembre.")
+
+        assert self.cache.get("quand planter du riz a madagascar", self.fingerprint) == ("Novembre-décembre.", "exact")
+        assert self.cache.get("Quand faut-il planter le riz à Madagascar ?", self.fingerprint) == (
+            "Novembre-décembre.", "semantic"
+        )
+        assert self.cache.get("Quand planter du maïs à Madagascar ?", self.fingerprint) == (None, None)
+        assert self.cache.get("Quand planter du riz à Madagascar ?", AnswerCache.fingerprint("autre")) == (None, None)
+        stats = self.cache.stats()
+        assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+        assert stats["provider_calls_saved"] == 2 and stats["hit_rate"] == 0.5
+
+    def test_negated_question_misses(self):
+        """Une question niée n'est pas servie par la réponse de la question affirmative."""
+        self.cache.set("Faut-il irriguer le riz cette semaine ?", self.fingerprint, "Oui, 20 mm.")
+
+        assert self.cache.get("Ne faut-il pas irriguer le riz cette semaine ?", self.fingerprint) == (None, None)
+        assert self.cache.get("Faut-il irriguer le riz sans engrais cette semaine ?", self.fingerprint) == (None, None)
+
+    def test_different_numbers_miss(self):
+        """Deux questions qui ne diffèrent que par un nombre ne partagent pas la réponse."""
+        question = ("Combien de kilos d'engrais NPK et d'urée faut-il apporter pour {} hectares "
+                    "de riz irrigué à Marovoay ?")
+        self.cache.set(question.format(2), self.fingerprint, "300 kg de NPK, 200 kg d'urée.")
+
+        assert self.cache.get(question.format(8), self.fingerprint) == (None, None)
+        assert self.cache.get(question.format(2).replace("faut-il", "doit-on"), self.fingerprint) == (
+            "300 kg de NPK, 200 kg d'urée.", "semantic"
+        )
+        assert AnswerCache().get(question.format(2).replace("faut-il", "doit-on"), self.fingerprint) == (None, None)
+
+    def test_lru_eviction(self):
+        small = AnswerCache({"SEMANTIC": True, "MAX_ENTRIES": 2})
+        for crop in ("riz", "manioc", "haricot"):
+            small.set(f"Engrais pour le {crop}", self.fingerprint, crop)
+
+        assert small.stats()["semantic_entries"] == 2
+        cache.clear()  # niveau exact vidé : seul le niveau approché répond
+        assert small.get("Engrais pour le riz", self.fingerprint) == (None, None)
+        assert small.get("engrais pour haricot", self.fingerprint) == ("haricot", "semantic")
+
+
+@pytest.mark.django_db
+def test_parcel_data_change_changes_fingerprint(django_capture_on_commit_callbacks):
+    cache.clear()
+    user = User.objects.create_user(username="farmer", email="f@test.com", password="pass123")
+    parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[{"lat": -18.91, "lng": 47.52}])
+    before = AnswerCache.fingerprint("test", parcel.uuid, {"soil": True, "crops": False})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        SoilData.objects.create(parcel=parcel, data={"ph": 5.5})
+
+    assert AnswerCache.fingerprint("test", parcel.uuid, {"soil": True}) != before
+
+
+@pytest.mark.django_db
+def test_bulk_writes_change_fingerprint(django_capture_on_commit_callbacks, monkeypatch):
+    """Collecte météo et store climat (bulk_create, sans signaux) changent aussi l'empreinte."""
+    cache.clear()
+    user = User.objects.create_user(username="farmer", email="f@test.com", password="pass123")
+    parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[{"lat": -18.91, "lng": 47.52}])
+    engine = WeatherCollectionEngine(max_workers=1, rate_per_second=0, api_key="test")
+    monkeypatch.setattr(engine, "fetch_cell_forecast", lambda *args: (forecast_payload(), 1, None, False))
+    before = AnswerCache.fingerprint("test", parcel.uuid, {"weather": True})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert engine.collect([parcel])["success"] == 1
+    after_weather = AnswerCache.fingerprint("test", parcel.uuid, {"weather": True})
+    assert after_weather != before
+
+    store = ClimateStore(fetcher=lambda lat, lon, start, end: power_payload(start, end))
+    with django_capture_on_commit_callbacks(execute=True):
+        store.ensure(-18.91, 47.52, "20250101", "20250103")
+    assert AnswerCache.fingerprint("test", parcel.uuid, {"weather": True}) != after_weather
+
+
+@pytest.mark.django_db
+def test_simple_client_calls_provider_once(monkeypatch, settings):
+    cache.clear()
+    settings.ANSWER_CACHE = {"SEMANTIC": True}
+    calls = []
+    monkeypatch.setattr(chatbot, "openrouter_complete", lambda model, *args, **kwargs: calls.append(model) or "Réponse")
+    client = SimpleAIClient()
+
+    assert client.ask("Quand planter du riz ?") == "Réponse"
+    assert client.ask("Quand planter le riz") == "Réponse"
+    assert len(calls) == 1
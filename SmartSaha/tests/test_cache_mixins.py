@@ -0,0 +1,77 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from SmartSaha.models import Crop, Parcel, ParcelCrop, Task, TaskStatus
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCacheNamespaces:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        crop = Crop.objects.create(name="Riz")
+        self.clients, self.tasks = [], []
+        for name in ("alice", "bob"):
+            user = User.objects.create_user(username=name, email=f"{name}@test.com", password="pass123")
+            parcel = Parcel.objects.create(owner=user, parcel_name=f"P-{name}", points=[])
+            parcel_crop = ParcelCrop.objects.create(parcel=parcel, crop=crop, planting_date="2025-01-01", area=1.0)
+            self.tasks.append(Task.objects.create(
+                name=f"Sarclage {name}", description="", parcelCrop=parcel_crop, due_date="2025-02-01"
+            ))
+            client = APIClient()
+            client.force_authenticate(user=user)
+            self.clients.append(client)
+
+    def test_write_only_flushes_own_namespace(self, django_assert_num_queries):
+        """La suppression d'une tâche par un agriculteur ne vide pas la liste en cache d'un autre."""
+        alice, bob = self.clients
+        assert len(alice.get(reverse("task-list")).data) == 1
+        assert len(bob.get(reverse("task-list")).data) == 1
+
+        assert alice.delete(reverse("task-detail", args=[self.tasks[0].id])).status_code == 204
+
+        with django_assert_num_queries(0):
+            assert len(bob.get(reverse("task-list")).data) == 1
+        assert alice.get(reverse("task-list")).data == []
+
+    def test_global_scope_and_no_key_scan(self, monkeypatch):
+        """Référentiel partagé : une écriture invalide la liste de tous, sans cache.keys()."""
+        monkeypatch.setattr(cache, "keys", lambda *a, **k: pytest.fail("cache.keys() appelé"), raising=False)
+        alice, bob = self.clients
+        assert bob.get(reverse("taskstatus-list")).data == []
+
+        alice.post(reverse("taskstatus-list"), {"name": "En cours", "description": "-"}, format="json")
+
+        assert [s["name"] for s in bob.get(reverse("taskstatus-list")).data] == ["En cours"]
+        assert TaskStatus.objects.count() == 1
+
+    def test_query_params_in_key(self):
+        """Chaque combinaison de filtres a sa propre entrée ; l'ordre des paramètres est ignoré."""
+        alice = self.clients[0]
+        Task.objects.create(name="Récolte", description="", parcelCrop=self.tasks[0].parcelCrop, due_date="2025-03-01")
+        url = reverse("task-list")
+
+        assert len(alice.get(url).data) == 2
+        assert [t["name"] for t in alice.get(url, {"name": "Récolte"}).data] == ["Récolte"]
+        assert [t["name"] for t in alice.get(f"{url}?due_date=2025-03-01&name=R%C3%A9colte").data] == ["Récolte"]
+        assert [t["name"] for t in alice.get(f"{url}?name=R%C3%A9colte&due_date=2025-03-01").data] == ["Récolte"]
+
+    def test_etag_not_modified(self, django_assert_num_queries):
+        """If-None-Match sur une liste inchangée renvoie 304 sans corps, puis 200 après écriture."""
+        alice = self.clients[0]
+        etag = alice.get(reverse("task-list"))["ETag"]
+
+        with django_assert_num_queries(0):
+            response = alice.get(reverse("task-list"), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert not response.content
+
+        alice.delete(reverse("task-detail", args=[self.tasks[0].id]))
+        response = alice.get(reverse("task-list"), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
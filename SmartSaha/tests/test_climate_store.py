@@ -0,0 +1,114 @@
+import datetime
+import threading
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from SmartSaha.models import ClimateData, DailyObservation, Parcel
+from SmartSaha.services import ClimateStore, climate_store
+from SmartSaha.services.parcel_version import parcel_data_version
+from SmartSaha.tests.seeders import power_payload
+
+
+@pytest.mark.django_db
+class TestClimateStore:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.unpublished_after = None
+        self.store = ClimateStore(fetcher=self.fetch)
+
+    def fetch(self, lat, lon, start, end):
+        with self.lock:
+            self.calls.append((start, end))
+        return power_payload(start, end, self.unpublished_after)
+
+    def test_only_missing_subranges_fetched(self):
+        """Plages chevauchantes : seuls les jours absents sont demandés, puis service 100 % local."""
+        self.store.ensure(-18.9, 47.5, "20250110", "20250120")
+        self.store.ensure(-18.8, 47.6, "20250101", "20250131")  # même cellule 0.5°
+
+        assert self.calls == [
+            (datetime.date(2025, 1, 10), datetime.date(2025, 1, 20)),
+            (datetime.date(2025, 1, 1), datetime.date(2025, 1, 9)),
+            (datetime.date(2025, 1, 21), datetime.date(2025, 1, 31)),
+        ]
+        assert DailyObservation.objects.count() == 31 * 2
+
+        self.calls.clear()
+        payload = self.store.payload(-18.9, 47.5, "20250105", "20250107")
+        assert self.calls == []
+        assert payload["properties"]["parameter"]["T2M"] == {"20250105": 5.0, "20250106": 6.0, "20250107": 7.0}
+        assert payload["header"]["source"] == "local"
+
+    def test_parallel_chunks_and_unpublished_days(self, settings):
+        """Grande plage découpée en morceaux ; les jours non publiés (-999) restent à récupérer."""
+        settings.CLIMATE_STORE = {"CHUNK_DAYS": 30, "MAX_WORKERS": 4}
+        store = ClimateStore(fetcher=self.fetch)
+        self.unpublished_after = datetime.date(2025, 3, 25)
+
+        store.ensure(-18.9, 47.5, "20250101", "20250331")
+
+        assert len(self.calls) == 3  # 90 jours / 30
+        assert store.missing(-18.9, 47.5, "20250101", "20250331") == [
+            (datetime.date(2025, 3, 26), datetime.date(2025, 3, 31))
+        ]
+
+    def test_recent_unpublished_days_not_refetched(self):
+        """Jours récents non publiés : pas de nouvel appel NASA avant UNPUBLISHED_RETRY."""
+        cache.clear()
+        today = datetime.date.today()
+        self.unpublished_after = today - datetime.timedelta(days=3)
+        start = today - datetime.timedelta(days=10)
+
+        self.store.ensure(-18.9, 47.5, start, today)
+        payload = self.store.payload(-18.9, 47.5, start, today)
+
+        assert len(self.calls) == 1
+        assert payload["properties"]["parameter"]["T2M"][today.strftime("%Y%m%d")] == -999.0
+        cache.delete(ClimateStore.unpublished_key(payload["header"]["cell"]))
+        self.store.ensure(-18.9, 47.5, start, today)
+        assert self.calls[1] == (today - datetime.timedelta(days=2), today)
+
+    def test_bump_only_parcels_of_the_cell(self, django_assert_num_queries):
+        """Seules les parcelles de la cellule changent de version, en une requête filtrée."""
+        user = get_user_model().objects.create_user(username="cell", email="cell@test.com", password="pass123")
+        inside = Parcel.objects.create(owner=user, parcel_name="In", points=[{"lat": -18.9, "lng": 47.5}])
+        edge = Parcel.objects.create(owner=user, parcel_name="Bord", points=[{"lat": -19.0, "lng": 47.99}])
+        outside = Parcel.objects.create(owner=user, parcel_name="Out", points=[{"lat": -18.4, "lng": 47.5}])
+        Parcel.objects.create(owner=user, parcel_name="Vide", points=[])
+        before = {p.uuid: parcel_data_version(p.uuid) for p in (inside, edge, outside)}
+
+        with django_assert_num_queries(1):
+            assert self.store.bump_cell_parcels(-18.8, 47.6) == 2
+
+        assert parcel_data_version(inside.uuid) == before[inside.uuid] + 1
+        assert parcel_data_version(edge.uuid) == before[edge.uuid] + 1
+        assert parcel_data_version(outside.uuid) == before[outside.uuid]
+
+
+@pytest.mark.django_db
+def test_fetch_climate_response_keeps_id(monkeypatch):
+    """fetch_climate renvoie toujours l'id du ClimateData ; un second appel réutilise la même ligne."""
+    calls = []
+    monkeypatch.setattr(
+        climate_store, "_fetcher", lambda lat, lon, start, end: calls.append((start, end)) or power_payload(start, end)
+    )
+    user = get_user_model().objects.create_user(username="clim", email="clim@test.com", password="pass123")
+    parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[{"lat": -18.9, "lng": 47.5}])
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("external-data-fetch-climate", args=[parcel.uuid])
+
+    first = client.post(url, {"start": "20250101", "end": "20250103"}, format="json").data
+    second = client.post(url, {"start": "20250101", "end": "20250103"}, format="json").data
+
+    assert first["status"] == "climate stored" and first["id"] == second["id"]
+    assert first["stored_rows"] == 6 and second["fetched_ranges"] == []
+    assert len(calls) == 1
+    climate = ClimateData.objects.get()
+    assert climate.data["properties"]["parameter"]["T2M"]["20250102"] == 2.0
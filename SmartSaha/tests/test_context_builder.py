@@ -0,0 +1,116 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from SmartSaha.models import Crop, Parcel, ParcelCrop, SoilData, Task, WeatherData, YieldRecord
+from SmartSaha.services import MistralRAGClient, answer_cache
+from SmartSaha.services.context_builder import ContextBuilder, fit_to_budget
+from SmartSaha.tests.seeders import forecast_payload, soil_payload
+
+User = get_user_model()
+MODULES = {"parcel": True, "soil": True, "weather": True, "crops": True, "yield_records": True}
+
+
+@pytest.mark.django_db
+class TestContextBuilder:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        cache.clear()
+        settings.CONTEXT_BUILDER = {"PARALLEL": False}
+        user = User.objects.create_user(username="ctx", email="ctx@test.com", password="pass123")
+        self.parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[{"lat": -18.9, "lng": 47.5}])
+        SoilData.objects.create(parcel=self.parcel, data=soil_payload(clay=250.0, sand=400.0))
+        WeatherData.objects.create(
+            parcel=self.parcel, data=forecast_payload(days=3), start="2025-01-01", end="2025-01-03",
+            data_type="FORECAST"
+        )
+        for name in ("Riz", "Maïs", "Manioc"):
+            parcel_crop = ParcelCrop.objects.create(
+                parcel=self.parcel, crop=Crop.objects.create(name=name), planting_date="2025-01-01", area=1.0
+            )
+            for day in range(1, 4):
+                Task.objects.create(name=f"Sarclage {day}", description="", parcelCrop=parcel_crop,
+                                    due_date=f"2025-02-0{day}")
+                YieldRecord.objects.create(parcelCrop=parcel_crop, date=f"2024-0{day}-01",
+                                           yield_amount=2.0 + day, area=1.0)
+
+    def test_queries_bounded_and_memoized(self, django_assert_num_queries):
+        """Cultures, tâches et rendements sans N+1 (3 cultures) ; la seconde construction vient du cache."""
+        with django_assert_num_queries(9):
+            context, complete = ContextBuilder.build_context(self.parcel.uuid, MODULES)
+
+        assert complete
+        assert "clay: 25.0 % (0-5cm)" in context and "Riz" in context and "Sarclage 3" in context
+        assert "Prévisions" in context and "Moyennes: Riz: 3 relevés" in context
+
+        with django_assert_num_queries(0):
+            assert ContextBuilder.build_context(self.parcel.uuid, MODULES) == (context, True)
+
+    def test_data_change_invalidates(self, django_capture_on_commit_callbacks):
+        """Une nouvelle tâche change la version des données : le contexte est reconstruit."""
+        ContextBuilder.build_context(self.parcel.uuid, {"crops": True})
+        with django_capture_on_commit_callbacks(execute=True):
+            Task.objects.create(name="Récolte", description="", parcelCrop=self.parcel.parcel_crops.first(),
+                                due_date="2025-05-01")
+
+        assert "Récolte" in ContextBuilder.build_context(self.parcel.uuid, {"crops": True})[0]
+
+    def test_budget_prefers_summaries(self, settings):
+        """Budget serré : les sections passent à leur résumé avant toute troncature."""
+        settings.CONTEXT_BUILDER = {"PARALLEL": False, "MAX_TOKENS": 120}
+
+        context, _ = ContextBuilder.build_context(self.parcel.uuid, MODULES)
+
+        assert len(context) <= 120 * 4
+        assert "Sarclage" not in context and "Riz" in context
+        assert fit_to_budget([("a" * 50,)], max_tokens=5) == "a" * 19 + "…"
+
+
+@pytest.mark.django_db(transaction=True)
+class TestParallelContext:
+    def test_slow_module_skipped_not_memoized(self, settings, monkeypatch):
+        """Un module trop lent est signalé indisponible sans bloquer les autres, et rien n'est mis en cache."""
+        cache.clear()
+        settings.CONTEXT_BUILDER = {"PARALLEL": True, "MODULE_TIMEOUTS": {"soil": 0.1}}
+        user = User.objects.create_user(username="lent", email="lent@test.com", password="pass123")
+        parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[])
+
+        delay = {"soil": 0.5}
+
+        def soil_section(parcel, config):
+            time.sleep(delay["soil"])
+            return ("Sol: argileux",)
+
+        monkeypatch.setattr(ContextBuilder, "soil_section", staticmethod(soil_section))
+
+        started = time.perf_counter()
+        context = ContextBuilder.build_context(parcel.uuid, {"parcel": True, "soil": True})
+
+        assert time.perf_counter() - started < 0.4
+        assert context == ("Parcelle: P1\nSol: données indisponibles pour le moment", False)
+        delay["soil"] = 0
+        assert ContextBuilder.build_context(parcel.uuid, {"parcel": True, "soil": True}) == ("Parcelle: P1\nSol: argileux", True)
+
+
+def test_incomplete_context_answer_not_cached(monkeypatch):
+    """Réponse construite sur un contexte incomplet : servie mais pas mise en cache."""
+    cache.clear()
+    calls = []
+
+    def complete(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Réponse"))])
+
+    client = MistralRAGClient()
+    client.client = SimpleNamespace(chat=SimpleNamespace(complete=complete))
+    monkeypatch.setattr(ContextBuilder, "build_context", staticmethod(
+        lambda parcel_uuid, user_modules: ("Sol: données indisponibles pour le moment", False)
+    ))
+
+    assert client.ask("Quel engrais ?", "p1", {"soil": True}) == "Réponse"
+    assert answer_cache.get("Quel engrais ?", client._fingerprint("p1", {"soil": True})) == (None, None)
+    assert client.ask("Quel engrais ?", "p1", {"soil": True}) == "Réponse"
+    assert len(calls) == 2
@@ -0,0 +1,228 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from SmartSaha.models import BIReport, Crop, Parcel, ParcelCrop, SoilData, SoilProperty, Task, WeatherData
+from SmartSaha.services import Dashboard, DashboardService, ParcelDataService
+from SmartSaha.tests.seeders import forecast_payload, soil_payload
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestDashboardBlockInvalidation:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        cache.clear()
+        settings.DASHBOARD_CACHE = {**settings.DASHBOARD_CACHE, "PRECOMPUTE": False}
+        self.user = User.objects.create_user(username="dash", email="dash@test.com", password="pass123")
+        self.parcel = Parcel.objects.create(owner=self.user, parcel_name="P1", points=[{"lat": -18.9, "lng": 47.5}])
+        self.parcel_crop = ParcelCrop.objects.create(
+            parcel=self.parcel, crop=Crop.objects.create(name="Riz"), planting_date="2025-01-01", area=1.0
+        )
+        self.service = DashboardService(self.user)
+        self.service.rebuild_blocks()
+        cache.set(DashboardService.full_key(self.user.pk), {"stale": True})
+
+    def cached_blocks(self):
+        return {block for block in DashboardService.BLOCKS
+                if cache.get(DashboardService.block_key(self.user.pk, block)) is not None}
+
+    def test_task_change_only_drops_task_block(self, django_capture_on_commit_callbacks):
+        """Une nouvelle tâche n'invalide que le bloc tâches (et le dashboard assemblé)."""
+        with django_capture_on_commit_callbacks(execute=True):
+            Task.objects.create(name="Sarclage", description="", parcelCrop=self.parcel_crop, due_date="2025-02-01")
+
+        assert self.cached_blocks() == set(DashboardService.BLOCKS) - {"task"}
+        assert cache.get(DashboardService.full_key(self.user.pk)) is None
+        assert self.service.get_task_summary()[0]["task_summary"]["total_tasks"] == 1
+
+    def test_weather_change_drops_weather_blocks(self, django_capture_on_commit_callbacks):
+        """Un nouveau WeatherData invalide les trois blocs météo, pas les rendements ni les tâches."""
+        with django_capture_on_commit_callbacks(execute=True):
+            WeatherData.objects.create(
+                parcel=self.parcel, data=forecast_payload(days=3), start="2025-01-01", end="2025-01-03",
+                data_type="FORECAST"
+            )
+
+        assert self.cached_blocks() == {"parcels", "soil", "yield", "task"}
+        assert self.service.get_dashboard_weather_overview()["parcels_with_weather_data"] == 1
+
+
+@pytest.mark.django_db
+class TestLatestWeatherPerParcel:
+    def test_weather_blocks_constant_queries(self, django_assert_num_queries):
+        """Dernier relevé de chaque parcelle en 3 requêtes, quel que soit l'historique, sans charger le JSON."""
+        cache.clear()
+        user = User.objects.create_user(username="meteo", email="meteo@test.com", password="pass123")
+        for i in range(3):
+            parcel = Parcel.objects.create(owner=user, parcel_name=f"P{i}", points=[])
+            for temp in (10.0, 20.0 + i):
+                WeatherData.objects.create(
+                    parcel=parcel, data={**forecast_payload(days=3), "current": {"temp_c": temp}},
+                    start="2025-01-01", end="2025-01-03", data_type="FORECAST"
+                )
+        # Collecte en erreur (sans ForecastDay) : JSON différé non rechargé
+        WeatherData.objects.create(
+            parcel=Parcel.objects.create(owner=user, parcel_name="P3", points=[]), data={"error": "timeout"},
+            start="2025-01-01", end="2025-01-01"
+        )
+
+        with django_assert_num_queries(3):
+            summary = DashboardService(user).get_weather_summary()
+        with django_assert_num_queries(3):
+            DashboardService(user).get_enhanced_weather_summary()
+
+        assert [p["weather_summary"]["current_temperature"] for p in summary[:3]] == [20.0, 21.0, 22.0]
+        assert WeatherData.objects.latest_per_parcel().count() == 4
+
+
+@pytest.mark.django_db(transaction=True)
+class TestParallelFullDashboard:
+    def test_slow_block_degrades_to_marker(self, settings, monkeypatch):
+        """Un bloc trop lent est remplacé par un marqueur, les autres sont servis ; il finit en arrière-plan."""
+        cache.clear()
+        settings.DASHBOARD_CACHE = {"PARALLEL_BLOCKS": True, "BLOCK_TIMEOUT": 5, "BLOCK_TIMEOUTS": {"soil": 0.1}}
+        user = User.objects.create_user(username="lent", email="lent@test.com", password="pass123")
+        Parcel.objects.create(owner=user, parcel_name="P1", points=[])
+        slow_soil = DashboardService.get_soil_summary
+
+        def get_soil_summary(service):
+            time.sleep(0.5)
+            return slow_soil(service)
+
+        monkeypatch.setattr(DashboardService, "get_soil_summary", get_soil_summary)
+        service = DashboardService(user)
+
+        dashboard = service.get_full_dashboard()
+
+        assert dashboard["soil_summary"] == {"status": "pending", "reason": "timeout"}
+        assert dashboard["incomplete_blocks"] == ["soil"]
+        assert [p["name"] for p in dashboard["parcels"]] == ["P1"]
+        assert service.timings["soil"]["source"] == "timeout"
+
+        time.sleep(0.6)
+        dashboard = service.get_full_dashboard()
+        assert "incomplete_blocks" not in dashboard
+        assert service.timings["soil"]["source"] == "cache"
+
+    def test_single_missing_block_has_deadline(self, settings, monkeypatch):
+        """Un seul bloc invalidé garde son délai et sa dégradation (pas de calcul en ligne sans limite)."""
+        cache.clear()
+        settings.DASHBOARD_CACHE = {"PARALLEL_BLOCKS": True, "BLOCK_TIMEOUT": 5, "BLOCK_TIMEOUTS": {"soil": 0.1}}
+        user = User.objects.create_user(username="seul", email="seul@test.com", password="pass123")
+        Parcel.objects.create(owner=user, parcel_name="P1", points=[])
+        service = DashboardService(user)
+        service.get_full_dashboard()
+        cache.delete(DashboardService.block_key(user.pk, "soil"))
+        cache.delete(DashboardService.last_good_key(user.pk, "soil"))
+        slow_soil = DashboardService.get_soil_summary
+
+        def get_soil_summary(service):
+            time.sleep(0.5)
+            return slow_soil(service)
+
+        monkeypatch.setattr(DashboardService, "get_soil_summary", get_soil_summary)
+
+        dashboard = service.get_full_dashboard()
+
+        assert dashboard["soil_summary"] == {"status": "pending", "reason": "timeout"}
+        assert dashboard["incomplete_blocks"] == ["soil"]
+        time.sleep(0.6)
+
+
+@pytest.mark.django_db
+class TestDashboardPrecompute:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        cache.clear()
+        settings.DASHBOARD_CACHE = {**settings.DASHBOARD_CACHE, "PRECOMPUTE": False}
+        self.user = User.objects.create_user(username="bi", email="bi@test.com", password="pass123")
+        Parcel.objects.create(owner=self.user, parcel_name="P1", points=[])
+
+    def test_precompute_snapshot_and_lock(self):
+        """Le précalcul remplit le cache et un snapshot BIReport ; un second worker concurrent s'efface."""
+        assert DashboardService.precompute_for_user(self.user.pk)
+        assert DashboardService.precompute_for_user(self.user.pk)
+        assert BIReport.objects.filter(user=self.user, name=DashboardService.REPORT_NAME).count() == 1
+        assert cache.get(DashboardService.full_key(self.user.pk))["parcels"][0]["name"] == "P1"
+
+        cache.add(DashboardService.precompute_lock_key(self.user.pk), 1)
+        assert DashboardService.precompute_for_user(self.user.pk) is False
+        assert cache.get(DashboardService.precompute_dirty_key(self.user.pk)) == 1
+
+    def test_schedule_precompute_dedicated_pool_deduped(self, settings, monkeypatch):
+        """Précalculs hors du pool des blocs en direct, un seul en attente par utilisateur."""
+        settings.DASHBOARD_CACHE = {**settings.DASHBOARD_CACHE, "PRECOMPUTE": True, "PRECOMPUTE_BACKEND": "thread"}
+        submitted = []
+        monkeypatch.setattr(Dashboard, "_get_block_pool", lambda: pytest.fail("pool des blocs utilisé"))
+        monkeypatch.setattr(Dashboard, "_get_precompute_pool", lambda: SimpleNamespace(
+            submit=lambda fn, user_id: submitted.append((fn, user_id))
+        ))
+
+        for _ in range(3):
+            DashboardService.schedule_precompute(self.user.pk)
+        assert len(submitted) == 1
+
+        fn, user_id = submitted[0]
+        fn(user_id)
+        DashboardService.schedule_precompute(self.user.pk)
+        assert len(submitted) == 2
+        assert cache.get(DashboardService.full_key(self.user.pk))["parcels"][0]["name"] == "P1"
+
+    def test_full_dashboard_served_from_snapshot(self, django_assert_num_queries):
+        """Cache expiré : l'endpoint sert le snapshot sans recalculer les blocs."""
+        DashboardService.precompute_for_user(self.user.pk)
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        with django_assert_num_queries(1):
+            response = client.get(reverse("dashboard-full-dashboard"))
+
+        assert response.data["parcels"][0]["name"] == "P1"
+
+
+@pytest.mark.django_db
+class TestSoilSummary:
+    def test_latest_valid_sample_only(self, django_assert_num_queries):
+        """Le résumé sol moyenne en SQL le dernier échantillon valide, en 2 requêtes."""
+        cache.clear()
+        user = User.objects.create_user(username="sol", email="sol@test.com", password="pass123")
+        parcels = [Parcel.objects.create(owner=user, parcel_name=f"P{i}", points=[]) for i in range(3)]
+        for parcel in parcels[:2]:
+            SoilData.objects.create(parcel=parcel, data=soil_payload(clay=100.0, sand=300.0))
+            latest = SoilData.objects.create(parcel=parcel, data=soil_payload(clay=250.0, sand=400.0))
+            empty = SoilData.objects.create(parcel=parcel, data=soil_payload(clay=None, sand=None))
+
+        with django_assert_num_queries(2):
+            summary = DashboardService(user).get_soil_summary()
+
+        assert [s["soil_summary"] for s in summary] == [{"clay": 250.0, "sand": 400.0}] * 2 + [None]
+        assert ParcelDataService.has_valid_soil_data(latest) and not ParcelDataService.has_valid_soil_data(empty)
+        quality = ParcelDataService.serialize_soil_data(latest)["data"]["properties"]["data_quality"]
+        assert (quality["valid_count"], quality["total_count"]) == (2, 2)
+        assert SoilProperty.objects.filter(soil_data=latest, property="clay").get().mean == 250.0
+
+    def test_serialized_soil_keeps_full_depths(self):
+        """full_data garde quantiles, incertitude et unités du JSON SoilGrids ; qualité depuis les lignes."""
+        user = User.objects.create_user(username="sol2", email="sol2@test.com", password="pass123")
+        parcel = Parcel.objects.create(owner=user, parcel_name="P", points=[])
+        payload = soil_payload(clay=250.0, sand=None)
+        depth = payload["properties"]["layers"][0]["depths"][0]
+        depth["values"].update({"Q0.05": 180.0, "Q0.5": 245.0, "Q0.95": 320.0, "uncertainty": 12.0})
+        depth["range"]["unit_depth"] = "cm"
+        payload["properties"]["layers"][0]["unit_measure"]["uncertainty_unit"] = ""
+
+        serialized = ParcelDataService.serialize_soil_data(SoilData.objects.create(parcel=parcel, data=payload))
+
+        layer = serialized["data"]["properties"]["layers"][0]
+        assert layer["depths"][0] == depth
+        assert layer["unit_measure"]["uncertainty_unit"] == ""
+        quality = serialized["data"]["properties"]["data_quality"]
+        assert (quality["valid_count"], quality["total_count"]) == (1, 2)
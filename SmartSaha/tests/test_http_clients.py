@@ -0,0 +1,99 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from SmartSaha.services import OutboundClients
+
+User = get_user_model()
+
+
+class StubUpstream(BaseHTTPRequestHandler):
+    """Stub HTTP/1.1 keep-alive : note le port client de chaque requête, échoue au besoin"""
+    protocol_version = "HTTP/1.1"
+    failures_before_success = 0
+    calls = 0
+    client_ports = set()
+    lock = threading.Lock()
+
+    def _reply(self):
+        with self.lock:
+            type(self).calls += 1
+            type(self).client_ports.add(self.client_address[1])
+            fail = type(self).calls <= type(self).failures_before_success
+        body = json.dumps({"ok": not fail}).encode()
+        self.send_response(503 if fail else 200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestOutboundClients:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.HTTP_CLIENTS = {"DEFAULT": {"BACKOFF": 0}}
+        StubUpstream.calls = 0
+        StubUpstream.failures_before_success = 0
+        StubUpstream.client_ports = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubUpstream)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/data"
+        self.clients = OutboundClients()
+        yield
+        self.clients.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused_and_metrics(self):
+        """Requêtes successives (requests puis httpx) : une connexion par client, mesures par hôte."""
+        for _ in range(5):
+            assert self.clients.get(self.url).json() == {"ok": True}
+        assert self.clients.session(self.url) is self.clients.session(self.url)
+        for _ in range(3):
+            assert self.clients.httpx_client(self.url).post(self.url, json={}).status_code == 200
+
+        assert StubUpstream.calls == 8
+        assert len(StubUpstream.client_ports) == 2
+        metrics = self.clients.metrics()[self.url.split("/")[2]]
+        assert metrics["requests"] == 8
+        assert metrics["statuses"] == {"200": 8}
+        assert sum(metrics["latency_ms"].values()) == 8
+        assert metrics["in_flight"] == 0
+
+    def test_get_retried_on_503(self):
+        StubUpstream.failures_before_success = 2
+
+        response = self.clients.get(self.url)
+
+        assert response.status_code == 200
+        assert StubUpstream.calls == 3
+        # Sans retry pour ce client (le moteur de collecte gère les siens)
+        StubUpstream.calls, StubUpstream.failures_before_success = 0, 1
+        assert self.clients.session(self.url, RETRIES=0).get(self.url).status_code == 503
+
+
+@pytest.mark.django_db
+def test_metrics_view_admin_only():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="farmer", email="f@test.com", password="pass123"))
+    assert client.get(reverse("http-metrics")).status_code == 403
+
+    client.force_authenticate(User.objects.create_user(
+        username="admin", email="a@test.com", password="pass123", is_staff=True
+    ))
+    assert client.get(reverse("http-metrics")).status_code == 200
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+from django.core.cache import cache
+
+from SmartSaha.services import LLMRouter, ProviderError
+
+
+class TestLLMRouter:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        self.router = LLMRouter({"HEDGE_DELAY": 0.05, "TIMEOUT": 5, "FAILURE_THRESHOLD": 2, "COOLDOWN": 60})
+        self.calls = []
+        self.timeouts = []
+        self.lock = threading.Lock()
+
+    def provider(self, behaviours):
+        """behaviours : {modèle: (délai s, réponse ou exception)}"""
+        def call(model, timeout):
+            with self.lock:
+                self.calls.append(model)
+                self.timeouts.append(timeout)
+            delay, outcome = behaviours[model]
+            time.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return call
+
+    def test_slow_primary_is_hedged(self):
+        """Le premier modèle tarde : le suivant part après le délai de couverture et gagne."""
+        call = self.provider({"slow": (1.0, "lent"), "fast": (0.01, "rapide"), "spare": (0.01, "réserve")})
+
+        started = time.perf_counter()
+        answer, model = self.router.route(["slow", "fast", "spare"], call)
+
+        assert (answer, model) == ("rapide", "fast")
+        assert time.perf_counter() - started < 0.5
+        assert "spare" not in self.calls
+
+    def test_attempt_timeout_bounded_by_question_deadline(self):
+        """Chaque tentative reçoit min(temps restant, ATTEMPT_TIMEOUT) ; pool dimensionné sur MAX_PARALLEL."""
+        router = LLMRouter({"HEDGE_DELAY": 0.05, "TIMEOUT": 5, "ATTEMPT_TIMEOUT": 2,
+                            "MAX_PARALLEL": 3, "CONCURRENT_QUESTIONS": 4})
+        call = self.provider({"slow": (0.2, "lent"), "fast": (0.01, "rapide")})
+
+        assert router.route(["slow", "fast"], call) == ("rapide", "fast")
+        assert self.timeouts[0] == 2
+        assert router.route(["slow", "fast"], call, timeout=1) == ("rapide", "fast")
+        assert 0.9 < self.timeouts[2] <= 1 and self.timeouts[3] < self.timeouts[2]
+        assert router._pool()._max_workers == 12
+
+    def test_rate_limited_model_skipped_until_cooldown(self):
+        call = self.provider({"busy": (0, ProviderError("429", status=429, retry_after=30)), "ok": (0, "réponse")})
+
+        assert self.router.route(["busy", "ok"], call) == ("réponse", "ok")
+        assert self.router.is_open("busy")
+
+        self.calls.clear()
+        assert self.router.route(["busy", "ok"], call) == ("réponse", "ok")
+        assert self.calls == ["ok"]
+        stats = self.router.stats()
+        assert stats["busy"]["circuit"] == "open"
+        assert stats["ok"]["samples"] == 2 and stats["ok"]["error_rate"] == 0
+
+    def test_consecutive_failures_open_circuit(self):
+        call = self.provider({"flaky": (0, ProviderError("HTTP 502", status=502))})
+
+        assert self.router.route(["flaky"], call) == (None, None)
+        assert not self.router.is_open("flaky")
+        assert self.router.route(["flaky"], call) == (None, None)
+        assert self.router.is_open("flaky")
+        assert self.router.route(["flaky"], call) == (None, None)
+        assert self.calls == ["flaky", "flaky"]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from SmartSaha.services import LLMRouter, ProviderError, SimpleAIClient, stream_stats
+from SmartSaha.services.llm_stream import sse_stream
+from SmartSaha.views.streaming import _iterate_in_thread
+
+User = get_user_model()
+
+
+def parse_events(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestStreaming:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+
+    def test_router_stream_fails_over_before_first_chunk(self):
+        """Le premier modèle échoue avant tout morceau : le suivant sert le flux ; TTFT mesuré."""
+        router = LLMRouter()
+
+        def open_stream(model):
+            if model == "down":
+                raise ProviderError("HTTP 503", status=503)
+            yield from ["Plantez ", "en ", "novembre."]
+
+        events = parse_events("".join(
+            sse_stream(router.stream(["down", "up"], open_stream), provider="test-failover", meta={"q": 1})
+        ))
+
+        assert [name for name, _ in events] == ["meta", "token", "token", "token", "done"]
+        assert "".join(data["text"] for name, data in events if name == "token") == "Plantez en novembre."
+        assert events[-1][1]["ttft_ms"] is not None
+        assert router.stats()["down"]["error_rate"] == 1.0
+        assert stream_stats.snapshot()["test-failover"]["outcomes"] == {"ok": 1}
+
+    def test_all_models_down_ends_with_error_event(self):
+        router = LLMRouter()
+        router.open("only", 60, "test")
+
+        events = parse_events("".join(sse_stream(router.stream(["only"], lambda model: iter(["x"])), "test-down")))
+
+        assert [name for name, _ in events] == ["error"]
+
+
+@pytest.mark.django_db
+def test_assistant_endpoint_streams_sse(monkeypatch):
+    monkeypatch.setattr(SimpleAIClient, "stream_ask", lambda self, question: iter(["Riz : ", "novembre."]))
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="farmer", email="f@test.com", password="pass123"))
+
+    response = client.post(reverse("assistant-list"), {"question": "Quand planter le riz ?", "stream": True}, format="json")
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/event-stream")
+    events = parse_events(b"".join(response.streaming_content).decode())
+    assert events[0] == ("meta", {"id": events[0][1]["id"], "question": "Quand planter le riz ?"})
+    assert [data["text"] for name, data in events if name == "token"] == ["Riz : ", "novembre."]
+    assert events[-1][0] == "done"
+
+
+def test_disconnect_during_next_closes_upstream():
+    """Déconnexion pendant un next() bloqué : close() attend la fin du next() et ferme l'amont."""
+    release, closed, errors = threading.Event(), threading.Event(), []
+
+    def upstream():
+        try:
+            yield "a"
+            release.wait(2)
+            yield "b"
+        finally:
+            closed.set()
+
+    chunks = upstream()
+    original_close = chunks.close
+
+    class Tracked:
+        def __next__(self):
+            return next(chunks)
+
+        def close(self):
+            try:
+                original_close()
+            except ValueError as e:
+                errors.append(e)
+
+    async def consume():
+        events = _iterate_in_thread(Tracked())
+        assert await events.__anext__() == "a"
+        task = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.05)  # next() en cours dans le thread du flux
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await events.aclose()
+
+    asyncio.run(consume())
+    release.set()
+
+    assert closed.wait(2)
+    assert errors == []
@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from SmartSaha.models import DailyObservation, Parcel, WeatherData
+from SmartSaha.services import RetentionService
+from SmartSaha.services.parcel_version import parcel_data_version
+from SmartSaha.tests.seeders import forecast_payload
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestRetentionService:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        cache.clear()
+        settings.DASHBOARD_CACHE = {**settings.DASHBOARD_CACHE, "PRECOMPUTE": False}
+        user = User.objects.create_user(username="farmer", email="farmer@test.com", password="pass123")
+        self.parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[{"lat": -18.91, "lng": 47.52}])
+        now = timezone.now()
+        # 8 collectes, une par semaine (la plus récente : aujourd'hui), puis une ligne d'erreur
+        self.weather = []
+        for week in range(8):
+            weather = WeatherData.objects.create(
+                parcel=self.parcel, data=forecast_payload(days=3), start="2025-01-01", end="2025-01-03"
+            )
+            WeatherData.objects.filter(pk=weather.pk).update(created_at=now - timezone.timedelta(weeks=week))
+            self.weather.append(weather)
+        self.error = WeatherData.objects.create(
+            parcel=self.parcel, data={"error": "timeout"}, start="2025-01-01", end="2025-01-01"
+        )
+        WeatherData.objects.filter(pk=self.error.pk).update(created_at=now - timezone.timedelta(hours=2))
+        DailyObservation.objects.all().delete()
+
+    def test_keeps_latest_purges_old_and_errors(self):
+        """5 plus récentes conservées, plus anciennes que 30 jours supprimées, erreurs purgées, séries conservées."""
+        service = RetentionService(pause=0, batch_size=2)
+
+        report = service.apply(["WeatherData"])["WeatherData"]
+
+        # semaines 5, 6, 7 : au-delà des 5 plus récentes et > 30 jours
+        assert report["error_rows"] == 1
+        assert report["expired_rows"] == 3
+        assert report["deleted"]["SmartSaha.WeatherData"] == 4
+        assert report["deleted"]["SmartSaha.ForecastDay"] == 3 * 3
+        assert report["bytes"] > 0
+        assert set(WeatherData.objects.values_list("pk", flat=True)) == {w.pk for w in self.weather[:5]}
+        # Jours des prévisions supprimées conservés en valeurs journalières
+        assert report["downsampled"] > 0
+        assert DailyObservation.objects.filter(source="weatherapi").count() == 3 * 7
+
+    def test_dry_run_deletes_nothing(self):
+        report = RetentionService(pause=0).apply(["WeatherData"], dry_run=True)["WeatherData"]
+
+        assert (report["error_rows"], report["expired_rows"]) == (1, 3)
+        assert report["deleted"] == {}
+        assert WeatherData.objects.count() == 9
+
+    def test_purge_bumps_version_once_per_parcel(self, django_capture_on_commit_callbacks):
+        """Ni incrément par ligne supprimée, ni payload rechargé : une version de plus, pour les erreurs seules."""
+        before = parcel_data_version(self.parcel.uuid)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            RetentionService(pause=0, batch_size=2).apply(["WeatherData"])
+
+        assert callbacks == []
+        assert parcel_data_version(self.parcel.uuid) == before + 1
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from SmartSaha.models import Parcel, SoilData
+from SmartSaha.services import ParcelDataService, SoilLookupService
+from SmartSaha.services import soilsGrids
+from SmartSaha.tests.seeders import soil_payload
+
+User = get_user_model()
+
+
+class TestSoilLookupService:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        self.service = SoilLookupService()
+        self.calls = []
+
+    def fetcher(self, payload, delay=0.0):
+        def fetch(lat, lon):
+            self.calls.append((lat, lon))
+            time.sleep(delay)
+            return payload
+        return fetch
+
+    def test_concurrent_callers_share_one_upstream_call(self):
+        """Huit requêtes simultanées sur la même cellule : un seul appel amont."""
+        fetch = self.fetcher(soil_payload(phh2o=62), delay=0.2)
+        results = []
+        threads = [
+            threading.Thread(target=lambda i=i: results.append(
+                self.service.lookup(-18.9110 + i * 0.0001, 47.5201, fetch)
+            ))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(self.calls) == 1
+        assert all(data == soil_payload(phh2o=62) for data, _ in results)
+        assert sum(hit for _, hit in results) == 7
+        assert self.service.stats()["misses"] == 1
+
+    def test_negative_cache_for_null_points(self):
+        """Un point sans valeurs est mémorisé : pas de second appel amont."""
+        fetch = self.fetcher(soil_payload(phh2o=None))
+
+        assert self.service.lookup(-18.0, 44.0, fetch) == (None, False)
+        assert self.service.lookup(-18.0, 44.0, fetch) == (None, True)
+        assert len(self.calls) == 1
+        assert self.service.stats()["negative_hits"] == 1
+
+    def test_upstream_errors_not_cached(self):
+        def failing(lat, lon):
+            self.calls.append((lat, lon))
+            raise TimeoutError
+
+        with pytest.raises(TimeoutError):
+            self.service.lookup(-18.9, 47.5, failing)
+        assert self.service.lookup(-18.9, 47.5, self.fetcher(soil_payload(phh2o=62))) == (soil_payload(phh2o=62), False)
+        assert len(self.calls) == 2
+
+
+@pytest.mark.django_db
+class TestFetchSoilThroughCache:
+    def test_neighbour_parcels_share_cell(self, monkeypatch):
+        """Deux parcelles voisines : une seule requête SoilGrids, deux SoilData."""
+        cache.clear()
+        calls = []
+        monkeypatch.setattr(soilsGrids, "fetch_soilgrids_soil", lambda lat, lon: calls.append(1) or soil_payload(phh2o=62))
+        user = User.objects.create_user(username="farmer", email="farmer@test.com", password="pass123")
+        parcels = [
+            Parcel.objects.create(owner=user, parcel_name=f"P{i}", points=[{"lat": -18.911 + i * 0.0001, "lng": 47.52}])
+            for i in range(2)
+        ]
+
+        soils = [ParcelDataService.fetch_soil(parcel) for parcel in parcels]
+
+        assert len(calls) == 1
+        assert SoilData.objects.count() == 2
+        assert all(soil.has_values for soil in soils)
+
+
+class TestSoilRasterBackend:
+    def test_bulk_sampling_matches_api_shape(self, tmp_path):
+        """Tuiles locales : valeurs lues par fenêtre, nodata -> mean None, forme SoilGrids."""
+        rasterio = pytest.importorskip("rasterio")
+        import numpy as np
+        from rasterio.transform import from_origin
+
+        from SmartSaha.services.soil_raster import SoilRasterBackend
+
+        values = np.arange(100, dtype="int16").reshape(10, 10)
+        values[0, 0] = -32768
+        with rasterio.open(
+            tmp_path / "phh2o_0-5cm_mean.tif", "w", driver="GTiff", height=10, width=10, count=1,
+            dtype="int16", crs="EPSG:4326", transform=from_origin(47.0, -18.0, 0.1, 0.1), nodata=-32768,
+        ) as dataset:
+            dataset.write(values, 1)
+
+        backend = SoilRasterBackend(root=str(tmp_path), properties=["phh2o"])
+        payloads = backend.sample_many([(-18.05, 47.05), (-18.25, 47.35), (-30.0, 47.0)])
+        backend.close()
+
+        assert payloads[0]["properties"]["layers"][0]["depths"][0]["values"]["mean"] is None
+        layer = payloads[1]["properties"]["layers"][0]
+        assert layer["depths"][0]["values"]["mean"] == 23.0
+        assert layer["unit_measure"]["d_factor"] == 10
+        assert payloads[2] is None
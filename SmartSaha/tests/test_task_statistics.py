@@ -0,0 +1,64 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from SmartSaha.models import Crop, Parcel, ParcelCrop, Task, TaskPriority, TaskStatus
+from SmartSaha.services import DashboardService, TaskStatisticsService
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestTaskStatistics:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.user = User.objects.create_user(username="taches", email="taches@test.com", password="pass123")
+        self.crop = Crop.objects.create(name="Riz")
+        self.done = TaskStatus.objects.create(name="Done", description="")
+        self.todo = TaskStatus.objects.create(name="Todo", description="")
+        self.high = TaskPriority.objects.create(name="HIGH", description="")
+        self.today = timezone.now().date()
+
+    def add_parcels(self, count):
+        for i in range(count):
+            parcel = Parcel.objects.create(owner=self.user, parcel_name=f"P{i}", points=[])
+            parcel_crop = ParcelCrop.objects.create(parcel=parcel, crop=self.crop, planting_date=self.today, area=1.0)
+            Task.objects.create(name="Semis", description="", parcelCrop=parcel_crop, status=self.done,
+                                due_date=self.today, completed_at=timezone.now())
+            Task.objects.create(name="Sarclage", description="", parcelCrop=parcel_crop, status=self.todo,
+                                priority=self.high, due_date=self.today - timezone.timedelta(days=2))
+            Task.objects.create(name="Récolte", description="", parcelCrop=parcel_crop, status=self.todo,
+                                due_date=self.today + timezone.timedelta(days=2))
+
+    def test_counts(self):
+        """Totaux, statuts, priorités, retards et urgences d'une seule requête."""
+        self.add_parcels(2)
+
+        stats = TaskStatisticsService.for_user(self.user).compute()
+
+        assert (stats["total"], stats["completed"], stats["pending"]) == (6, 2, 4)
+        assert (stats["overdue"], stats["urgent"], stats["done_status"]) == (2, 4, 2)
+        assert stats["by_status"] == {"Done": 2, "Todo": 4}
+        assert stats["by_priority"] == {"HIGH": 2, None: 4}
+        assert [s["total"] for s in stats["by_parcel"].values()] == [3, 3]
+
+    @pytest.mark.parametrize("parcels", [2, 12])
+    def test_constant_queries(self, parcels, django_assert_num_queries):
+        """Le bloc tâches du dashboard coûte 2 requêtes quel que soit le nombre de parcelles."""
+        self.add_parcels(parcels)
+
+        with django_assert_num_queries(2):
+            summary = DashboardService(self.user).get_task_summary()
+
+        assert len(summary) == parcels
+        assert summary[0]["task_summary"]["completed_tasks"] == 1
+
+    def test_benchmark_command(self, capsys):
+        """Le benchmark compare les deux chemins sans laisser de données."""
+        call_command("benchmark_task_statistics", parcels=4, tasks=5)
+
+        output = capsys.readouterr().out
+        assert "Groupé       :" in output and "1 requête(s)" in output
+        assert "Résultats identiques: oui" in output
+        assert not Parcel.objects.filter(parcel_name__startswith="Bench").exists()
@@ -0,0 +1,57 @@
+import datetime
+
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from SmartSaha.models import DailyObservation, Parcel, WeatherData
+from SmartSaha.services import TimeSeriesService
+from SmartSaha.tests.seeders import forecast_payload
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestTimeSeriesService:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        user = User.objects.create_user(username="farmer", email="farmer@test.com", password="pass123")
+        self.parcel = Parcel.objects.create(owner=user, parcel_name="P1", points=[{"lat": -18.91, "lng": 47.52}])
+
+    def test_bulk_loader_latest_forecast_wins(self):
+        """Loader depuis les JSON existants : la prévision la plus récente remplace un jour déjà connu."""
+        WeatherData.objects.bulk_create([
+            WeatherData(parcel=self.parcel, data=forecast_payload(days=3, maxtemp_c=27.0),
+                        start="2025-01-01", end="2025-01-03"),
+        ])
+        WeatherData.objects.bulk_create([
+            WeatherData(parcel=self.parcel, data=forecast_payload(days=2, maxtemp_c=30.0),
+                        start="2025-01-01", end="2025-01-02"),
+        ])
+
+        written = TimeSeriesService.load_new()
+
+        assert written["WeatherData"] == 3 * 7  # 3 jours × 7 variables, doublons fusionnés
+        dates, series = TimeSeriesService.parcel_arrays(
+            self.parcel, datetime.date(2025, 1, 1), datetime.date(2025, 1, 4), variables=["max_temp_c"]
+        )
+        assert dates[0] == np.datetime64("2025-01-01")
+        np.testing.assert_array_equal(series["max_temp_c"], [30.0, 30.0, 27.0, np.nan])
+        # Incrémental : rien de nouveau
+        assert TimeSeriesService.load_new() == {"WeatherData": 0, "ClimateData": 0}
+
+    def test_saved_weather_appended_and_dataframe(self):
+        """Un WeatherData enregistré alimente la série ; lecture en DataFrame."""
+        pytest.importorskip("pandas")
+        WeatherData.objects.create(parcel=self.parcel, data=forecast_payload(days=3), start="2025-01-01", end="2025-01-03")
+
+        frame = TimeSeriesService.frame(
+            TimeSeriesService.parcel_cell(self.parcel), "20250101", "20250103",
+            variables=["max_temp_c", "total_precip_mm"]
+        )
+
+        assert DailyObservation.objects.filter(source="weatherapi").count() == 3 * 7
+        assert list(frame.columns) == ["max_temp_c", "total_precip_mm"]
+        assert frame["total_precip_mm"].tolist() == [2.0, 2.0, 2.0]
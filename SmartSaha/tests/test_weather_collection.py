@@ -0,0 +1,157 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from SmartSaha.models import DailyObservation, Parcel, WeatherData, ForecastDay, externalData
+from SmartSaha.services import WeatherCollectionEngine, ForecastCellCache
+from SmartSaha.tests.seeders import forecast_payload
+
+User = get_user_model()
+
+
+class StubWeatherAPI(BaseHTTPRequestHandler):
+    """Stub local de WeatherAPI.com : répond une prévision fixe, échoue au besoin"""
+    failures_before_success = 0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            type(self).calls += 1
+            fail = type(self).calls <= type(self).failures_before_success
+        if fail:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps(forecast_payload()).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.django_db
+class TestWeatherCollectionEngine:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        cache.clear()
+        StubWeatherAPI.calls = 0
+        StubWeatherAPI.failures_before_success = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeatherAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+        self.user = User.objects.create_user(username="farmer", email="farmer@test.com", password="pass123")
+        self.parcels = [
+            Parcel.objects.create(owner=self.user, parcel_name=f"P{i}", points=[{"lat": -18.9 + i, "lng": 47.5}])
+            for i in range(12)
+        ]
+        yield
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_collect_fleet_with_bulk_write(self, django_assert_max_num_queries):
+        """Toutes les parcelles sont collectées et écrites par bulk_create (météo, jours de prévision, série journalière)."""
+        engine = WeatherCollectionEngine(max_workers=4, rate_per_second=0, base_url=self.base_url, api_key="test")
+
+        with django_assert_max_num_queries(4):
+            report = engine.collect(self.parcels)
+
+        assert report["success"] == 12
+        assert report["failed"] == 0
+        assert report["parcels_per_minute"] > 0
+        assert WeatherData.objects.count() == 12
+        assert WeatherData.objects.filter(location_name="Antananarivo").count() == 12
+        assert ForecastDay.objects.count() == 12 * 3
+        # 12 cellules distinctes × 3 jours × 7 variables
+        assert DailyObservation.objects.filter(source="weatherapi").count() == 12 * 3 * 7
+
+    def test_retry_on_server_error(self):
+        """Un 503 transitoire est réessayé avec backoff."""
+        StubWeatherAPI.failures_before_success = 1
+        engine = WeatherCollectionEngine(max_workers=1, rate_per_second=0, backoff=0, base_url=self.base_url, api_key="test")
+
+        report = engine.collect(self.parcels[:1])
+
+        assert report["success"] == 1
+        assert report["results"][0]["attempts"] == 2
+
+    def test_parcels_in_same_cell_share_one_call(self):
+        """Les parcelles d'une même cellule de grille partagent un seul appel API."""
+        cluster = [
+            Parcel.objects.create(owner=self.user, parcel_name=f"C{i}", points=[{"lat": -18.9151 + i * 0.0005, "lng": 47.5201}])
+            for i in range(5)
+        ]
+        cell_cache = ForecastCellCache(cell_degrees=0.01)
+        cell_cache.reset_stats()
+        engine = WeatherCollectionEngine(max_workers=4, rate_per_second=0, base_url=self.base_url,
+                                         api_key="test", cell_cache=cell_cache)
+
+        report = engine.collect(cluster)
+        assert report["success"] == 5
+        assert report["api_calls"] == 1
+        assert report["api_calls_saved"] == 4
+        assert StubWeatherAPI.calls == 1
+
+        # Second passage dans la fenêtre de rafraîchissement : aucun appel amont
+        report = engine.collect(cluster)
+        assert report["api_calls"] == 0
+        assert StubWeatherAPI.calls == 1
+        assert cell_cache.stats()["hits"] == 1
+
+
+@pytest.mark.django_db
+class TestForecastDay:
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        self.user = User.objects.create_user(username="grower", email="grower@test.com", password="pass123")
+        self.parcel = Parcel.objects.create(owner=self.user, parcel_name="P", points=[{"lat": -18.9, "lng": 47.5}])
+
+    def test_save_fills_typed_forecast_days(self):
+        """Les jours de prévision sont extraits une fois, à l'enregistrement."""
+        weather = WeatherData.objects.create(
+            parcel=self.parcel, data=forecast_payload(days=3, totalprecip_mm=25.0, mintemp_c=3.0),
+            start="2025-01-01", end="2025-01-03", data_type="FORECAST"
+        )
+
+        assert weather.forecast_days.count() == 3
+        assert ForecastDay.objects.filter(parcel=self.parcel, total_precip_mm=25.0).count() == 3
+        assert weather.risk_level == "HIGH"
+
+    def test_properties_read_prefetched_rows(self, django_assert_num_queries):
+        """Les propriétés lisent les colonnes préchargées sans reparcourir le JSON."""
+        WeatherData.objects.create(
+            parcel=self.parcel, data=forecast_payload(days=3, totalprecip_mm=25.0),
+            start="2025-01-01", end="2025-01-03", data_type="FORECAST"
+        )
+        weather = WeatherData.objects.prefetch_related("forecast_days").get(parcel=self.parcel)
+
+        with django_assert_num_queries(0):
+            assert weather.total_precipitation == 75.0
+            assert len(weather.agricultural_alerts) == 3
+            assert weather.get_weather_summary()["forecast_stats"]["rainy_days"] == 3
+            assert weather.calculate_growing_degree_days() == 33.0
+
+    def test_alerts_snapshot_is_versioned(self, django_assert_num_queries, monkeypatch):
+        """Les alertes sont lues depuis le snapshot et recalculées au changement de version des règles."""
+        WeatherData.objects.create(
+            parcel=self.parcel, data=forecast_payload(days=2, mintemp_c=3.0),
+            start="2025-01-01", end="2025-01-02", data_type="FORECAST"
+        )
+        weather = WeatherData.objects.get(parcel=self.parcel)
+
+        with django_assert_num_queries(0):
+            assert [a["type"] for a in weather.agricultural_alerts] == ["FROST_RISK", "FROST_RISK"]
+
+        monkeypatch.setattr(externalData, "ALERT_RULES_VERSION", weather.alerts_version + 1)
+        weather.alerts_snapshot = []
+        assert len(weather.agricultural_alerts) == 2
+        assert WeatherData.objects.get(pk=weather.pk).alerts_version == weather.alerts_version
@@ -11,4 +11,5 @@ from .dashboard import DashboardViewSet
 from .groups import OrganisationViewSet, GroupTypeViewSet, GroupViewSet, GroupRoleViewSet, MemberGroupViewSet
 from .weather import WeatherDataViewSet, AgriculturalAlertViewSet, WeatherCollectionViewSet
 from .alerts import Alert
-from .chatbot import AgriAssistantViewSet,RobustGeminiClient, MistralAgentClient
\ No newline at end of file
+from .chatbot import AgriAssistantViewSet,RobustGeminiClient, MistralAgentClient
+from .monitoring import OutboundHttpMetricsView, LLMProviderStatsView
\ No newline at end of file
@@ -3,6 +3,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.core.cache import cache
 from django.utils import timezone
 from django.db.models import Count, Q
 
@@ -22,6 +23,18 @@ class AlertViewSet(viewsets.ModelViewSet):
         """Retourne uniquement les alertes de l'utilisateur connecté"""
         return Alert.objects.filter(parcel__owner=self.request.user).select_related('parcel').order_by('-created_at')
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        AlertService.invalidate_dashboard_stats(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        AlertService.invalidate_dashboard_stats(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        AlertService.invalidate_dashboard_stats(self.request.user.pk)
+
     def list(self, request, *args, **kwargs):
         """Liste des alertes avec filtres"""
         queryset = self.filter_queryset(self.get_queryset())
@@ -92,22 +105,8 @@ class AlertViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
 
-            # Sauvegarder en base (uniquement les nouvelles)
-            saved_count = 0
-            for alert_data in all_alerts:
-                _, created = Alert.objects.get_or_create(
-                    parcel=parcel,
-                    type=alert_data['type'],
-                    severity=alert_data['severity'],
-                    alert_date=alert_data['date'],
-                    defaults={
-                        'message': alert_data['message'],
-                        'action': alert_data.get('action', ''),
-                        'is_read': False
-                    }
-                )
-                if created:
-                    saved_count += 1
+            # Sauvegarder en base (uniquement les nouvelles, écriture groupée)
+            saved = AlertService.bulk_save_alerts(parcel, all_alerts)
 
             # Compter les priorités
             high_priority = len([a for a in all_alerts if a['severity'] in ['HIGH', 'CRITICAL']])
@@ -117,7 +116,8 @@ class AlertViewSet(viewsets.ModelViewSet):
             return Response({
                 'alerts': all_alerts,
                 'total_generated': len(all_alerts),
-                'saved_count': saved_count,
+                'saved_count': saved['created'],
+                'skipped_count': saved['skipped'],
                 'high_priority': high_priority,
                 'medium_priority': medium_priority,
                 'low_priority': low_priority,
@@ -142,45 +142,58 @@ class AlertViewSet(viewsets.ModelViewSet):
         """
         Statistiques des alertes pour le dashboard
         URL: /api/alerts/dashboard_stats/
+        Nombre de requêtes fixe (agrégations conditionnelles), résumé mis en cache
+        quelques secondes et invalidé à chaque écriture d'alerte.
         """
-        queryset = self.get_queryset()
+        cache_key = AlertService.dashboard_stats_cache_key(request.user.pk)
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return Response(stats)
 
-        stats = {
-            'total_alerts': queryset.count(),
-            'unread_count': queryset.filter(is_read=False).count(),
-            'high_priority_count': queryset.filter(severity__in=['HIGH', 'CRITICAL'], is_read=False).count(),
-            'medium_priority_count': queryset.filter(severity='MEDIUM', is_read=False).count(),
-            'low_priority_count': queryset.filter(severity='LOW', is_read=False).count(),
-            'recent_alerts': AlertSerializer(
-                queryset.filter(is_read=False).order_by('-created_at')[:5],
-                many=True
-            ).data
-        }
+        queryset = self.get_queryset()
+        unread = Q(is_read=False)
+        high = Q(severity__in=['HIGH', 'CRITICAL'])
+
+        stats = queryset.aggregate(
+            total_alerts=Count('id'),
+            unread_count=Count('id', filter=unread),
+            high_priority_count=Count('id', filter=unread & high),
+            medium_priority_count=Count('id', filter=unread & Q(severity='MEDIUM')),
+            low_priority_count=Count('id', filter=unread & Q(severity='LOW')),
+        )
+        stats['recent_alerts'] = AlertSerializer(
+            queryset.filter(is_read=False).order_by('-created_at')[:5],
+            many=True
+        ).data
 
         # Stats par type d'alerte
         type_stats = queryset.filter(is_read=False).values('type').annotate(
             count=Count('id'),
-            high_priority=Count('id', filter=Q(severity__in=['HIGH', 'CRITICAL']))
+            high_priority=Count('id', filter=high)
         ).order_by('-count')
 
         stats['alert_types'] = list(type_stats)
 
-        # Stats par parcelle
-        parcels = Parcel.objects.filter(owner=request.user)
-        parcel_stats = []
-
-        for parcel in parcels:
-            parcel_alerts = queryset.filter(parcel=parcel, is_read=False)
-            parcel_stats.append({
-                'parcel_name': parcel.parcel_name,
-                'parcel_uuid': str(parcel.uuid),
-                'alert_count': parcel_alerts.count(),
-                'high_priority': parcel_alerts.filter(severity__in=['HIGH', 'CRITICAL']).count(),
-                'medium_priority': parcel_alerts.filter(severity='MEDIUM').count()
-            })
-
-        stats['parcel_breakdown'] = parcel_stats
-
+        # Stats par parcelle (une seule requête groupée)
+        unread_alert = Q(alert__is_read=False)
+        parcels = Parcel.objects.filter(owner=request.user).annotate(
+            alert_count=Count('alert', filter=unread_alert),
+            high_priority=Count('alert', filter=unread_alert & Q(alert__severity__in=['HIGH', 'CRITICAL'])),
+            medium_priority=Count('alert', filter=unread_alert & Q(alert__severity='MEDIUM')),
+        ).values('parcel_name', 'uuid', 'alert_count', 'high_priority', 'medium_priority')
+
+        stats['parcel_breakdown'] = [
+            {
+                'parcel_name': parcel['parcel_name'],
+                'parcel_uuid': str(parcel['uuid']),
+                'alert_count': parcel['alert_count'],
+                'high_priority': parcel['high_priority'],
+                'medium_priority': parcel['medium_priority']
+            }
+            for parcel in parcels
+        ]
+
+        cache.set(cache_key, stats, timeout=AlertService.DASHBOARD_STATS_CACHE_TIMEOUT)
         return Response(stats)
 
     @action(detail=True, methods=['post'])
@@ -193,6 +206,7 @@ class AlertViewSet(viewsets.ModelViewSet):
             alert = self.get_object()
             alert.is_read = True
             alert.save()
+            AlertService.invalidate_dashboard_stats(request.user.pk)
 
             return Response({
                 "message": "Alerte marquée comme lue",
@@ -227,6 +241,7 @@ class AlertViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(type__icontains=alert_type)
 
             updated_count = queryset.update(is_read=True)
+            AlertService.invalidate_dashboard_stats(request.user.pk)
 
             return Response({
                 "message": f"{updated_count} alertes marquées comme lues",
@@ -315,27 +330,14 @@ class AlertViewSet(viewsets.ModelViewSet):
                     'low': len([a for a in all_alerts if a.get('severity') == 'LOW'])
                 }
 
-            # Sauvegarder les alertes générées
-            saved_count = 0
-            for alert_data in all_alerts:
-                _, created = Alert.objects.get_or_create(
-                    parcel=parcel,
-                    type=alert_data['type'],
-                    severity=alert_data['severity'],
-                    alert_date=alert_data['date'],
-                    defaults={
-                        'message': alert_data['message'],
-                        'action': alert_data.get('action', ''),
-                        'is_read': False
-                    }
-                )
-                if created:
-                    saved_count += 1
+            # Sauvegarder les alertes générées (écriture groupée, sans doublon)
+            saved = AlertService.bulk_save_alerts(parcel, all_alerts)
 
             return Response({
                 'alerts': all_alerts,
                 'statistics': stats,
-                'saved_count': saved_count,
+                'saved_count': saved['created'],
+                'skipped_count': saved['skipped'],
                 'parcel_name': parcel.parcel_name,
                 'parcel_uuid': str(parcel.uuid),
                 'generated_at': timezone.now().isoformat()
@@ -390,6 +392,7 @@ class AlertViewSet(viewsets.ModelViewSet):
 
             deleted_count = old_alerts.count()
             old_alerts.delete()
+            AlertService.invalidate_dashboard_stats(request.user.pk)
 
             return Response({
                 "message": f"{deleted_count} alertes anciennes supprimées",
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from django.utils import timezone
 
 from SmartSaha.services import SimpleAIClient
+from SmartSaha.views.streaming import event_stream_response, wants_stream
 from rest_framework.permissions import AllowAny
 
 class AgriAssistantViewSet(viewsets.ViewSet):
@@ -32,6 +33,12 @@ class AgriAssistantViewSet(viewsets.ViewSet):
         max_tokens = request.data.get('max_tokens', 1000)
         temperature = request.data.get('temperature', 0.7)
 
+        if wants_stream(request):
+            return event_stream_response(
+                request, self.ai_client.stream_ask(question), provider="openrouter",
+                meta={'id': f"chat_{int(timezone.now().timestamp())}", 'question': question}
+            )
+
         try:
             reponse = self.ai_client.ask(question)
 
@@ -144,6 +151,11 @@ class GeminiAssistantViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if wants_stream(request):
+            return event_stream_response(
+                request, self.ai_client.stream_ask(question), provider="gemini", meta={'question': question}
+            )
+
         try:
             reponse = self.ai_client.ask(question)
 
@@ -224,6 +236,12 @@ class MistralAssistantViewSet(viewsets.ViewSet):
                 'timestamp': timezone.now().isoformat()
             })
 
+        if wants_stream(request):
+            return event_stream_response(
+                request, self.agent_client.stream_ask(question), provider="mistral-agent",
+                meta={'question': question}
+            )
+
         try:
             reponse = self.agent_client.ask(question)
 
@@ -9,16 +9,19 @@ from SmartSaha.serializers import CropSerializer, StatusCropSerializer, VarietyS
 class CropViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = Crop.objects.all()
     serializer_class = CropSerializer
+    cache_scope = "global"
     permission_classes = [permissions.AllowAny]
 
 class StatusCropViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = StatusCrop.objects.all()
     serializer_class = StatusCropSerializer
+    cache_scope = "global"
     permission_classes = [permissions.AllowAny]
 
 class VarietyViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = Variety.objects.all()
     serializer_class = VarietySerializer
+    cache_scope = "global"
     permission_classes = [permissions.AllowAny]
 
 class ParcelCropViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
@@ -35,11 +38,11 @@ class ParcelCropViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
         parcel = serializer.validated_data['parcel']
         if parcel.owner != self.request.user:
             raise PermissionDenied("Vous ne pouvez pas ajouter de culture à cette parcelle")
-        serializer.save()
+        super().perform_create(serializer)
 
     def perform_update(self, serializer):
         # Vérifier que la parcelle appartient à l'utilisateur
         parcel = serializer.validated_data.get('parcel', serializer.instance.parcel)
         if parcel.owner != self.request.user:
             raise PermissionDenied("Vous ne pouvez pas modifier cette culture")
-        serializer.save()
\ No newline at end of file
+        super().perform_update(serializer)
\ No newline at end of file
@@ -1,17 +1,21 @@
+import json
+
+import numpy as np
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from django.db.models import Sum, Avg
 from django.db.models.functions import ExtractYear
 from django.utils import timezone
 from django.core.cache import cache
+from django.conf import settings
 
-from SmartSaha.models import Parcel, ParcelCrop, YieldRecord, YieldForecast, Crop, ClimateData
+from SmartSaha.models import Parcel, ParcelCrop, YieldRecord, YieldForecast, Crop
 
 from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
-from SmartSaha.services import DashboardService
+from SmartSaha.services import DashboardService, TimeSeriesService
 
 class DashboardViewSet(viewsets.ViewSet):
     """
@@ -26,13 +30,33 @@ class DashboardViewSet(viewsets.ViewSet):
         Retourne le dashboard complet pour l'utilisateur connecté.
         """
         user = request.user
-        cache_key = f"dashboard_full_{user.pk}"
+        cache_key = DashboardService.full_key(user.pk)
         data = cache.get(cache_key)
-        if not data:
-            dashboard_service = DashboardService(user)
-            data = dashboard_service.get_full_dashboard()
-            cache.set(cache_key, data, timeout=1800)
-        return Response(data)
+        if data:
+            response = Response(data)
+            if settings.DEBUG:
+                response["Server-Timing"] = 'dashboard;desc="cache"'
+            return response
+
+        # Cache expiré : dernier snapshot précalculé, rafraîchi en arrière-plan
+        snapshot = DashboardService.latest_snapshot(user)
+        if snapshot is not None:
+            DashboardService.schedule_precompute(user.pk)
+            response = Response(snapshot)
+            if settings.DEBUG:
+                response["Server-Timing"] = 'dashboard;desc="snapshot"'
+            return response
+
+        # Premier accès : calcul dans la requête
+        dashboard_service = DashboardService(user)
+        data = dashboard_service.get_full_dashboard()
+        # Un dashboard incomplet (blocs stale/pending) n'est pas mis en cache
+        if "incomplete_blocks" not in data:
+            cache.set(cache_key, data, timeout=DashboardService.FULL_CACHE_TIMEOUT)
+        response = Response(data)
+        if settings.DEBUG:
+            response["Server-Timing"] = dashboard_service.server_timing_header()
+        return response
 
 @login_required(login_url='login')
 def dashboard(request):
@@ -40,7 +64,7 @@ def dashboard(request):
     all_parcels = Parcel.objects.all()
 
     service = DashboardService(user=request.user)
-    dashboard_data = service.get_full_dashboard()
+    dashboard_data = service.get_full_dashboard(degrade=False)
 
     # Calcul du rendement total (toutes parcelles confondues)
     rendement_total = sum([y['summary']['total_yield'] for y in dashboard_data['yield_summary'] if y['summary']])
@@ -104,18 +128,27 @@ def dashboard(request):
         month_sum = YieldRecord.objects.filter(date__year=year, date__month=month).aggregate(s=Sum('yield_amount'))['s'] or 0
         month_values.append(month_sum)
 
-    # Données météo à partir de ClimateData si disponible (on prend la plus récente)
+    # Météo des 7 prochains jours depuis la série journalière (DailyObservation)
     temp_max = []
     temp_min = []
     precip = []
     days_labels = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
-    latest_climate = ClimateData.objects.order_by('-created_at').first()
-    if latest_climate and isinstance(latest_climate.data, dict):
-        # Essayer d'interpréter quelques formes communes {"temperature_max": [...], "temperature_min": [...], "precipitations": [...]}
-        data = latest_climate.data
-        temp_max = list(data.get('temperature_max', [])[:7])
-        temp_min = list(data.get('temperature_min', [])[:7])
-        precip = list(data.get('precipitations', [])[:7])
+    weather_parcel = (
+        Parcel.objects.filter(owner=request.user).exclude(points=[]).order_by('created_at').first()
+        if user else None
+    )
+    if weather_parcel:
+        dates, series = TimeSeriesService.parcel_arrays(
+            weather_parcel, today, today + timezone.timedelta(days=6),
+            variables=['max_temp_c', 'min_temp_c', 'total_precip_mm']
+        )
+        if series and not all(np.isnan(values).all() for values in series.values()):
+            days_labels = [days_labels[day.astype(object).weekday()] for day in dates]
+            # json : les jours sans valeur deviennent null (trous dans Chart.js)
+            temp_max, temp_min, precip = (
+                json.dumps([None if np.isnan(v) else round(float(v), 1) for v in series[variable]])
+                for variable in ('max_temp_c', 'min_temp_c', 'total_precip_mm')
+            )
     # si aucune donnée, laisser des tableaux vides -> Chart.js affichera un graphique vide plutôt que des données statiques
 
     context = {
@@ -12,6 +12,7 @@ from rest_framework import status
 from SmartSaha.services import DeepSeekClient, GeminiClient, WorkingAIClient, MistralRAGClient
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from SmartSaha.views.streaming import event_stream_response, wants_stream
 
 # deepseek = DeepSeekClient()
 # gemini = GeminiClient()
@@ -68,7 +69,19 @@ class AgronomyAssistantAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # 3. Appel avec WorkingAIClient (gère automatiquement les rate limits)
+            meta = {
+                "question_type": question_type,
+                "parcel_id": parcel_id,
+                "crop_name": crop_name,
+                "modules": user_modules
+            }
+
+            # 3. Réponse en flux (SSE) si demandée : les morceaux sont relayés dès leur arrivée
+            if wants_stream(request):
+                chunks = mistralai.stream_ask(question=question, parcel_uuid=parcel_id, user_modules=user_modules)
+                return event_stream_response(request, chunks, provider="mistral-rag", meta=meta)
+
+            # Appel avec WorkingAIClient (gère automatiquement les rate limits)
             answer = mistralai.ask(
                 question=question,
                 parcel_uuid=parcel_id,
@@ -78,12 +91,7 @@ class AgronomyAssistantAPIView(APIView):
             # 4. Réponse
             return Response({
                 "answer": answer,
-                "meta": {
-                    "question_type": question_type,
-                    "parcel_id": parcel_id,
-                    "crop_name": crop_name,
-                    "modules": user_modules
-                }
+                "meta": meta
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -5,9 +5,10 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 
-from SmartSaha.models import Parcel, SoilData, ClimateData
+from SmartSaha.models import ClimateData, Parcel, SoilData
 from SmartSaha.services.climate import get_climate_data
-from SmartSaha.services.soilsGrids import get_soil_data
+from SmartSaha.services.climate_store import climate_store, parse_power_date
+from SmartSaha.services.soilsGrids import get_soil_data, get_soilgrids_data
 import requests
 
 
@@ -18,12 +19,20 @@ class SoilDataView(APIView):
         if not lon or not lat:
             return Response({"error": "Missing lon/lat"}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            lon, lat = float(lon), float(lat)
+        except ValueError:
+            return Response({"error": "Invalid lon/lat"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
             data = get_soil_data(lon, lat)
-            return Response(data)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        if data is None:
+            return Response({"error": "No soil data at this location"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
 
 class ClimateDataView(APIView):
     def get(self, request):
@@ -35,7 +44,15 @@ class ClimateDataView(APIView):
             return Response({"error": "Missing lon/lat/start/end"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            data = get_climate_data(lon, lat, start, end)
+            lon, lat = float(lon), float(lat)
+            start_date, end_date = parse_power_date(start), parse_power_date(end)
+        except ValueError:
+            return Response({"error": "Invalid lon/lat/start/end"}, status=status.HTTP_400_BAD_REQUEST)
+        if start_date > end_date:
+            return Response({"error": "start must be before end"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            data = get_climate_data(lon, lat, start_date, end_date)
             return Response(data)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -48,12 +65,17 @@ class DataViewSet(viewsets.ViewSet):
         # Récupère le premier point du JSON
         first_point = parcel.points[0]  # si points est une liste
         lat, lon = first_point["lat"], first_point["lng"]
-        url = f"https://rest.isric.org/soilgrids/v2.0/properties/query?lon={lon}&lat={lat}&property=phh2o&property=soc&property=nitrogen&property=sand&property=clay&property=silt&depth=0-5cm&value=mean"
-        resp = requests.get(url)
-        if resp.status_code == 200:
-            soil = SoilData.objects.create(parcel=parcel, data=resp.json())
-            return Response({"status": "soil stored", "id": soil.id})
-        return Response({"error": "soil api failed"}, status=resp.status_code)
+        try:
+            soil_data = get_soilgrids_data(lon, lat)
+        except requests.exceptions.HTTPError as e:
+            code = e.response.status_code if e.response is not None else status.HTTP_502_BAD_GATEWAY
+            return Response({"error": "soil api failed"}, status=code)
+        except requests.exceptions.RequestException:
+            return Response({"error": "soil api failed"}, status=status.HTTP_502_BAD_GATEWAY)
+        if soil_data is None:
+            return Response({"error": "No soil data at this location"}, status=status.HTTP_404_NOT_FOUND)
+        soil = SoilData.objects.create(parcel=parcel, data=soil_data)
+        return Response({"status": "soil stored", "id": soil.id})
 
     @action(detail=True, methods=["post"])
     def fetch_climate(self, request, pk=None):
@@ -65,9 +87,24 @@ class DataViewSet(viewsets.ViewSet):
         start = request.data.get("start", "20250101")
         end = request.data.get("end", "20250107")
 
-        url = f"https://power.larc.nasa.gov/api/temporal/daily/point?parameters=T2M,PRECTOTCORR&community=AG&longitude={lon}&latitude={lat}&start={start}&end={end}&format=JSON"
-        resp = requests.get(url)
-        if resp.status_code == 200:
-            climate = ClimateData.objects.create(parcel=parcel, data=resp.json(), start=start, end=end)
-            return Response({"status": "climate stored", "id": climate.id})
-        return Response({"error": "climate api failed"}, status=resp.status_code)
\ No newline at end of file
+        # Seuls les jours absents de la cellule sont demandés à NASA POWER
+        try:
+            summary = climate_store.ensure(lat, lon, start, end)
+            start, end = parse_power_date(start), parse_power_date(end)
+        except requests.exceptions.HTTPError as e:
+            code = e.response.status_code if e.response is not None else status.HTTP_502_BAD_GATEWAY
+            return Response({"error": "climate api failed"}, status=code)
+        except requests.exceptions.RequestException:
+            return Response({"error": "climate api failed"}, status=status.HTTP_502_BAD_GATEWAY)
+        except ValueError:
+            return Response({"error": "Invalid start/end (YYYYMMDD)"}, status=status.HTTP_400_BAD_REQUEST)
+        # Réponse inchangée pour les clients ("id" du ClimateData) : une ligne par
+        # (parcelle, plage), réécrite depuis le store au lieu d'un blob par appel
+        payload = climate_store.payload(lat, lon, start, end, summary=summary)
+        climate = ClimateData.objects.filter(parcel=parcel, start=start, end=end).order_by('-created_at').first()
+        if climate is None:
+            climate = ClimateData.objects.create(parcel=parcel, data=payload, start=start, end=end)
+        else:
+            climate.data = payload
+            climate.save(update_fields=['data'])
+        return Response({"status": "climate stored", "id": climate.id, **summary})
\ No newline at end of file
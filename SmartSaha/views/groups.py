@@ -38,6 +38,7 @@ class BaseModelViewSet(viewsets.ModelViewSet):
 class OrganisationViewSet(CacheInvalidationMixin, BaseModelViewSet):
     print("OrganisationViewSet")
     cache_prefix = "organisation"
+    cache_scope = "global"
     queryset = Organisation.objects.all().order_by("-created_at")
     # print(queryset)
     serializer_class = OrganisationSerializer
@@ -49,6 +50,7 @@ class OrganisationViewSet(CacheInvalidationMixin, BaseModelViewSet):
 # --- TYPES DE GROUPES ---
 class GroupTypeViewSet(CacheInvalidationMixin, BaseModelViewSet):
     cache_prefix = "group-types"
+    cache_scope = "global"
     queryset = GroupType.objects.all().order_by("name")
     serializer_class = GroupTypeSerializer
     search_fields = ["name"]
@@ -58,6 +60,7 @@ class GroupTypeViewSet(CacheInvalidationMixin, BaseModelViewSet):
 # --- GROUPES ---
 class GroupViewSet(CacheInvalidationMixin, BaseModelViewSet):
     cache_prefix = "groups"
+    cache_scope = "global"
     queryset = (
         Group.objects.select_related("organisation", "type", "created_by", "updated_by")
         .prefetch_related(
@@ -88,11 +91,13 @@ class GroupViewSet(CacheInvalidationMixin, BaseModelViewSet):
             role=leader_role,
             defaults={"status": "ACTIVE"}
         )
+        self.invalidate_cache(group)
         return group
 
 # --- ROLES DE GROUPES ---
 class GroupRoleViewSet(CacheInvalidationMixin, BaseModelViewSet):
     cache_prefix = "group-roles"
+    cache_scope = "global"
     queryset = GroupRole.objects.all().order_by("name")
     serializer_class = GroupRoleSerializer
     search_fields = ["name", "role_type"]
@@ -102,6 +107,7 @@ class GroupRoleViewSet(CacheInvalidationMixin, BaseModelViewSet):
 # --- MEMBRES DE GROUPES ---
 class MemberGroupViewSet(CacheInvalidationMixin, BaseModelViewSet):
     cache_prefix = "member-groups"
+    cache_scope = "global"
     queryset = (
         MemberGroup.objects
         .select_related("user", "group", "role")
@@ -0,0 +1,35 @@
+# SmartSaha/views/monitoring.py
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from SmartSaha.services import answer_cache, http_clients, llm_router
+from SmartSaha.services.llm_stream import stream_stats
+
+
+class OutboundHttpMetricsView(APIView):
+    """
+    Mesures des appels HTTP sortants par hôte (processus courant) :
+    latences, statuts, connexions en cours et saturation du pool.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(http_clients.metrics())
+
+
+class LLMProviderStatsView(APIView):
+    """
+    État des modèles LLM : latences et taux d'erreur glissants (processus
+    courant), circuit ouvert ou fermé (partagé entre workers), et temps
+    jusqu'au premier morceau des réponses en flux par fournisseur, et
+    efficacité du cache des réponses (appels fournisseur économisés).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "models": llm_router.stats(),
+            "streams": stream_stats.snapshot(),
+            "answer_cache": answer_cache.stats(),
+        })
@@ -75,6 +75,7 @@ class ParcelPointViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = ParcelPoint.objects.all()
     serializer_class = ParcelPointSerializer
     cache_prefix = "parcel_point"
+    cache_scope = "global"
     use_object_cache = True
 
     # Exemple dans ParcelPointViewSet
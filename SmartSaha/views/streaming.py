@@ -0,0 +1,53 @@
+# SmartSaha/views/streaming.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from SmartSaha.services.llm_stream import sse_stream
+
+_END = object()
+
+
+def wants_stream(request) -> bool:
+    """Flux demandé par `stream` (corps ou paramètre d'URL) ou Accept: text/event-stream"""
+    flag = request.data.get("stream") if hasattr(request.data, "get") else None
+    if flag is None:
+        flag = request.query_params.get("stream")
+    if str(flag).lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.META.get("HTTP_ACCEPT", "")
+
+
+async def _iterate_in_thread(iterator):
+    """
+    Itérateur synchrone consommé hors de la boucle ASGI : l'attente de l'amont
+    occupe un thread, pas le worker qui sert les autres requêtes.
+    next() et close() passent par un même thread dédié au flux : si le client
+    se déconnecte pendant un next(), close() s'exécute après lui (jamais sur
+    un générateur en cours d'exécution) et ferme bien le flux amont.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sse")
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, _END)
+            if chunk is _END:
+                return
+            yield chunk
+    finally:
+        # Sans attendre : le next() en cours peut encore bloquer sur l'amont
+        executor.submit(iterator.close)
+        executor.shutdown(wait=False)
+
+
+def event_stream_response(request, chunks, provider: str, meta=None) -> StreamingHttpResponse:
+    """Réponse SSE (text/event-stream) relayant les morceaux ; asynchrone sous ASGI"""
+    events = sse_stream(chunks, provider, meta)
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        events = _iterate_in_thread(events)
+    response = StreamingHttpResponse(events, content_type="text/event-stream; charset=utf-8")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # pas de mise en tampon par nginx
+    return response
@@ -11,6 +11,7 @@ from rest_framework.response import Response
 from SmartSaha.mixins.cache_mixins import CacheInvalidationMixin
 from SmartSaha.models import Task, TaskPriority, TaskStatus, ParcelCrop
 from SmartSaha.serializers import TaskSerializer, TaskPrioritySerializer, TaskStatusSerializer
+from SmartSaha.services.task_statistics import TaskStatisticsService
 
 
 class TaskViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
@@ -46,26 +47,31 @@ class TaskViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def dashboard(self, request):
-        """Résumé par status et priorité"""
-        tasks = Task.objects.filter(parcelCrop__parcel__owner=request.user)
+        """Résumé par status et priorité (une requête groupée)"""
+        stats = TaskStatisticsService.for_user(request.user).compute()
         summary = {
             "by_status": {},
-            "by_priority": {}
+            "by_priority": {},
+            "total": stats["total"],
+            "overdue": stats["overdue"],
+            "urgent": stats["urgent"]
         }
-        for status in TaskStatus.objects.all():
-            summary["by_status"][status.name] = tasks.filter(status=status).count()
-        for priority in TaskPriority.objects.all():
-            summary["by_priority"][priority.name] = tasks.filter(priority=priority).count()
+        for name in TaskStatus.objects.values_list("name", flat=True):
+            summary["by_status"][name] = stats["by_status"].get(name, 0)
+        for name in TaskPriority.objects.values_list("name", flat=True):
+            summary["by_priority"][name] = stats["by_priority"].get(name, 0)
         return Response(summary)
 
 class TaskStatusViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = TaskStatus.objects.all()
     serializer_class = TaskStatusSerializer
+    cache_scope = "global"
     permission_classes = [permissions.AllowAny]
 
 class TaskPriorityViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = TaskPriority.objects.all()
     serializer_class = TaskPrioritySerializer
+    cache_scope = "global"
     permission_classes = [permissions.AllowAny]
 
 
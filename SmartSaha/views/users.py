@@ -28,6 +28,7 @@ def send_test_email():
 class UserViewSet(CacheInvalidationMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    cache_scope = "global"
     permission_classes = [permissions.IsAuthenticated]  # protégé
 
 class SignupView(generics.CreateAPIView):
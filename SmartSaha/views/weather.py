@@ -132,7 +132,7 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 
 from SmartSaha.models import Parcel
-from SmartSaha.services import WeatherDataCollector
+from SmartSaha.services import WeatherDataCollector, WeatherCollectionEngine
 
 
 class WeatherCollectionViewSet(viewsets.ViewSet):
@@ -195,33 +195,23 @@ class WeatherCollectionViewSet(viewsets.ViewSet):
         """Collecte les données météo pour toutes les parcelles avec points"""
         try:
             parcels = Parcel.objects.filter(points__isnull=False).exclude(points=[])
+            forecast_days = int(request.data.get('forecast_days', 3))
 
-            results = []
-            total_success = 0
-
-            for parcel in parcels:
-                result = self.weather_collector.collect_and_save_weather_data(parcel)
-
-                results.append({
-                    'parcel_uuid': str(parcel.uuid),
-                    'parcel_name': parcel.parcel_name,
-                    'success': result['success'],
-                    'alerts_generated': result.get('alerts_generated', 0),
-                    'coordinates_used': result.get('coordinates_used'),
-                    'error': result.get('error')
-                })
-
-                if result['success']:
-                    total_success += 1
+            # Collecte concurrente + écriture groupée
+            report = WeatherCollectionEngine().collect(parcels, forecast_days=forecast_days)
 
             return Response({
                 'success': True,
-                'message': f'Collecte terminée: {total_success}/{len(parcels)} réussites',
-                'results': results
+                'message': f"Collecte terminée: {report['success']}/{report['total']} réussites",
+                'duration_s': report['duration_s'],
+                'parcels_per_minute': report['parcels_per_minute'],
+                'api_calls': report['api_calls'],
+                'api_calls_saved': report['api_calls_saved'],
+                'results': report['results']
             })
 
         except Exception as e:
             return Response({
                 'success': False,
                 'error': f'Erreur lors de la collecte globale: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)